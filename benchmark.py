@@ -0,0 +1,244 @@
+"""
+Benchmark dos caminhos de dados do dashboard com datasets sintéticos.
+
+Para cada tamanho, mede separadamente:
+
+- load:   CSV -> cache colunar, leitura do frame, cubo, índice dos
+          filtros, sketches e o `Dataset` completo já com cache quente
+- filter: `FilterIndex.select` para algumas seleções típicas da sidebar
+- tab:    agregações de cada aba (KPIs + dados de todos os gráficos)
+- render: desenho + PNG de cada gráfico (o custo de um miss no cache)
+
+Os resultados vão para um JSON (tempo mínimo e mediano de cada etapa),
+e `--compare` aponta as etapas que ficaram mais lentas que uma execução
+anterior.
+
+Uso:
+    python benchmark.py --sizes 10000 100000 1000000 --output bench.json
+    python benchmark.py --compare bench.json --output bench_novo.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import data_cache
+import synthetic
+import views
+from count_sketches import CountSketches
+from cube import AggregateCube
+from dataset import Dataset
+from figure_cache import MAX_WIDTH, render_figure
+from filter_index import FilterIndex
+from sketches import CellDigests
+
+SIZES = [10_000, 100_000, 1_000_000]
+WORKDIR = '.bench'
+
+# Diferenças menores que isso são ruído, qualquer que seja a razão
+MIN_REGRESSION_SECONDS = 0.001
+
+# Seleções da sidebar medidas em filter e tab; None = todos os valores (padrão do dashboard)
+SELECTIONS = {
+    'all': None,
+    'one_genre': {'genre': ['rock']},
+    'two_decades_two_moods': {'decade': [1970, 1980],
+                              'mood_category': ['Happy/Energetic', 'Sad/Calm']},
+    'narrow': {'decade': [2010], 'genre': ['pop'], 'mood_category': ['Sad/Calm']},
+}
+
+
+def measure(func, repeat):
+    """
+    Roda `func` `repeat` vezes. Retorna (tempos em segundos, último resultado)
+    """
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return times, result
+
+
+def full_selection(dataset, selection=None):
+    """
+    Seleção como o dashboard monta: listas explícitas em todas as dimensões
+    """
+    full = {dim: list(dataset.filter_index.categories[d])
+            for d, dim in enumerate(dataset.filter_index.dims)}
+    full.update(selection or {})
+    return full
+
+
+def dataset_csv(n_rows, workdir, seed=0):
+    """
+    CSV sintético do tamanho pedido, gerado uma vez e reaproveitado
+    """
+    path = os.path.join(workdir, f'synthetic_{n_rows}_{seed}.csv')
+    if not os.path.exists(path):
+        os.makedirs(workdir, exist_ok=True)
+        synthetic.write_csv(n_rows, path + '.tmp', seed)
+        os.replace(path + '.tmp', path)
+    return path
+
+
+def run_size(n_rows, workdir=WORKDIR, repeat=3, seed=0, log=print):
+    """
+    Mede todas as etapas para um dataset de `n_rows` linhas. Retorna a
+    lista de resultados (um dict por etapa)
+    """
+    csv_path = dataset_csv(n_rows, workdir, seed)
+    cache_dir = os.path.join(workdir, f'cache_{n_rows}_{seed}')
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    results = []
+
+    def record(stage, name, times, selection=None):
+        results.append({
+            'size': n_rows, 'stage': stage, 'name': name, 'selection': selection,
+            'min': min(times), 'median': statistics.median(times), 'runs': len(times),
+        })
+        label = f"{stage}.{name}" + (f"[{selection}]" if selection else '')
+        log(f"{n_rows:>12,}  {label:<45} {statistics.median(times) * 1000:10.2f} ms")
+
+    # Carga. O CSV -> cache só acontece uma vez por versão do arquivo
+    times, _ = measure(lambda: data_cache.ensure_cache(csv_path, cache_dir), 1)
+    record('load', 'csv_to_cache', times)
+    times, df = measure(lambda: data_cache.load_frame(csv_path, cache_dir=cache_dir), repeat)
+    record('load', 'frame', times)
+    times, _ = measure(lambda: AggregateCube.from_frame(df), repeat)
+    record('load', 'cube', times)
+    times, _ = measure(lambda: FilterIndex.from_frame(df), repeat)
+    record('load', 'filter_index', times)
+    times, _ = measure(lambda: CellDigests.from_frame(df), repeat)
+    record('load', 'digests', times)
+    times, _ = measure(lambda: CountSketches.from_frame(df), repeat)
+    record('load', 'counts', times)
+    del df
+    # Primeira carga persiste o cubo; as seguintes são o caso normal
+    Dataset(csv_path, cache_dir)
+    times, dataset = measure(lambda: Dataset(csv_path, cache_dir), repeat)
+    record('load', 'dataset', times)
+
+    selections = {name: full_selection(dataset, sel) for name, sel in SELECTIONS.items()}
+    rows = {}
+    for name, selection in selections.items():
+        times, rows[name] = measure(lambda: dataset.filter_index.select(selection), repeat)
+        record('filter', 'select', times, name)
+
+    for name, selection in selections.items():
+        row_ids = rows[name]
+        if len(row_ids) == 0:
+            continue
+        for tab, chart_ids in views.TABS.items():
+            def tab_data():
+                if tab == 'overview':
+                    views.overview_metrics(dataset, selection, row_ids)
+                return [views.chart_data(c, dataset, selection, row_ids) for c in chart_ids]
+            times, _ = measure(tab_data, repeat)
+            record('tab', tab, times, name)
+
+    # Renderização com todos os filtros (o caso mais pesado do scatter)
+    selection, row_ids = selections['all'], rows['all']
+    for chart_id, (draw, data) in views.CHARTS.items():
+        args = data(dataset, selection, row_ids)
+        times, _ = measure(lambda: render_figure(draw(*args), max_width=MAX_WIDTH), repeat)
+        record('render', chart_id, times)
+    return results
+
+
+def metadata(repeat):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    import matplotlib
+    import pyarrow
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'pyarrow': pyarrow.__version__,
+        'matplotlib': matplotlib.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'repeat': repeat,
+    }
+
+
+def _key(result):
+    return result['size'], result['stage'], result['name'], result['selection']
+
+
+def compare(baseline, current, threshold=1.25):
+    """
+    Compara as medianas de duas execuções. Retorna um DataFrame com a
+    razão atual / base de cada etapa presente nas duas e se é regressão
+    (mais lenta que `threshold` vezes a base e por mais de 1 ms).
+    """
+    base = {_key(r): r['median'] for r in baseline['results']}
+    rows = []
+    for result in current['results']:
+        if _key(result) not in base:
+            continue
+        before, after = base[_key(result)], result['median']
+        ratio = after / before if before else float('inf')
+        rows.append({
+            'size': result['size'], 'stage': result['stage'], 'name': result['name'],
+            'selection': result['selection'] or '', 'base_ms': before * 1000,
+            'atual_ms': after * 1000, 'razao': ratio,
+            'regressao': ratio > threshold and after - before > MIN_REGRESSION_SECONDS,
+        })
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos caminhos de dados do dashboard")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES,
+                        help="Tamanhos dos datasets sintéticos (ex.: 10000 ... 10000000)")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', default=WORKDIR,
+                        help="Onde ficam os CSVs sintéticos (reaproveitados entre execuções)")
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--compare', metavar='BASE_JSON',
+                        help="Execução anterior para comparar; sai com erro se houver regressão")
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help="Razão atual/base a partir da qual uma etapa é regressão")
+    args = parser.parse_args()
+
+    report = {'meta': metadata(args.repeat), 'results': []}
+    for n_rows in args.sizes:
+        report['results'].extend(run_size(n_rows, args.workdir, args.repeat, args.seed))
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"\n✅ Resultados em {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        comparison = compare(baseline, report, args.threshold)
+        regressions = comparison[comparison['regressao']] if len(comparison) else comparison
+        print(f"\nComparação com {args.compare} ({baseline['meta'].get('commit')}):")
+        with pd.option_context('display.max_rows', None, 'display.width', 160):
+            print(comparison.round(3).to_string(index=False))
+        if len(regressions):
+            print(f"\n⚠️  {len(regressions)} etapa(s) mais de {args.threshold:.2f}x mais lentas")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,319 @@
+"""
+Gráficos do dashboard.
+
+Cada função recebe dados já agregados e devolve uma `matplotlib.figure.Figure`
+criada sem pyplot, então as figuras não ficam registradas no estado global
+do matplotlib e podem ser liberadas assim que são renderizadas.
+"""
+import matplotlib
+import numpy as np
+from matplotlib.colors import to_rgb
+from matplotlib.figure import Figure
+
+COLORS_MOOD = {
+    'Happy/Energetic': '#FFD700',
+    'Angry/Tense': '#FF4444',
+    'Sad/Calm': '#4169E1',
+    'Peaceful/Content': '#90EE90'
+}
+
+CORES_TEMAS = {
+    'romantic': '#FF69B4',
+    'obscene': '#DC143C',
+    'violence': '#8B0000',
+    'sadness': '#4169E1',
+    'family/spiritual': '#9370DB'
+}
+
+# Acima deste número de pontos o scatter vira um mapa de densidade por humor
+SCATTER_MAX_POINTS = 20_000
+DENSITY_BINS = 200
+SCATTER_EXTENT = (-0.05, 1.05)
+
+COLORS_FEATURES = ['#FF6B6B', '#4ECDC4', '#FFE66D', "#B28CE3"]
+MARKERS_FEATURES = ['o', 's', '^', 'D']
+
+
+def decade_distribution(decade_counts):
+    """
+    Barras com o número de músicas por década
+    """
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    bars = ax.bar(decade_counts.index, decade_counts.values,
+                  color='#667eea', edgecolor='black', linewidth=1.5, alpha=0.8)
+
+    # Adicionar valores nas barras
+    for bar in bars:
+        height = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width()/2., height,
+               f'{int(height)}',
+               ha='center', va='bottom', fontweight='bold', fontsize=10)
+
+    ax.set_xlabel('Década', fontsize=12, fontweight='bold')
+    ax.set_ylabel('Número de Músicas', fontsize=12, fontweight='bold')
+    ax.grid(True, alpha=0.3, axis='y')
+    fig.tight_layout()
+    return fig
+
+
+def top_genres(top_genres):
+    """
+    Barras horizontais com os gêneros mais frequentes
+    """
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    colors = matplotlib.colormaps['Spectral'](np.linspace(0, 1, len(top_genres)))
+    bars = ax.barh(range(len(top_genres)), top_genres.values, color=colors,
+                   edgecolor='black', linewidth=1.5)
+
+    ax.set_yticks(range(len(top_genres)))
+    ax.set_yticklabels(top_genres.index, fontsize=11)
+    ax.set_xlabel('Número de Músicas', fontsize=12, fontweight='bold')
+    ax.invert_yaxis()
+    ax.grid(True, alpha=0.3, axis='x')
+
+    # Adicionar valores
+    for i, (bar, val) in enumerate(zip(bars, top_genres.values)):
+        ax.text(val + 5, i, f'{val}', va='center', fontweight='bold', fontsize=10)
+
+    fig.tight_layout()
+    return fig
+
+
+def _marker_size(n_points, size):
+    # Com muitos pontos (ex.: série por ano) os marcadores encolhem
+    return min(size, size * 15 / max(n_points, 1))
+
+
+def features_evolution(features_by_decade, xlabel='Década'):
+    """
+    Linhas com a média de cada característica de áudio por período
+    (década por padrão)
+    """
+    fig = Figure(figsize=(14, 7))
+    ax = fig.subplots()
+
+    markersize = _marker_size(len(features_by_decade), 10)
+    for feature, color, marker in zip(features_by_decade.columns, COLORS_FEATURES,
+                                      MARKERS_FEATURES):
+        ax.plot(features_by_decade.index, features_by_decade[feature],
+               marker=marker, linewidth=3, markersize=markersize, label=feature.capitalize(),
+               color=color, alpha=0.8)
+
+    ax.set_xlabel(xlabel, fontsize=13, fontweight='bold')
+    ax.set_ylabel('Valor Médio (0-1)', fontsize=13, fontweight='bold')
+    ax.legend(loc='best', fontsize=12, frameon=True, shadow=True)
+    ax.grid(True, alpha=0.3)
+    ax.set_ylim(0, 1)
+    fig.tight_layout()
+    return fig
+
+
+def density_layers(points_by_mood, bins=DENSITY_BINS):
+    """
+    Histograma 2D (valence × energy) de cada humor: {humor: contagens},
+    com energy nas linhas e valence nas colunas
+    """
+    lo, hi = SCATTER_EXTENT
+    layers = {}
+    for mood, (valence, energy) in points_by_mood.items():
+        counts, _, _ = np.histogram2d(energy, valence, bins=bins, range=[[lo, hi], [lo, hi]])
+        layers[mood] = counts
+    return layers
+
+
+def _draw_density(ax, points_by_mood):
+    # Uma camada RGBA por humor; a opacidade segue o log da contagem no bin
+    layers = density_layers(points_by_mood)
+    peak = max((layer.max() for layer in layers.values()), default=0)
+    for mood, color in COLORS_MOOD.items():
+        layer = layers.get(mood)
+        if layer is None or peak == 0:
+            continue
+        image = np.zeros(layer.shape + (4,))
+        image[..., :3] = to_rgb(color)
+        image[..., 3] = 0.9 * np.log1p(layer) / np.log1p(peak)
+        ax.imshow(image, origin='lower', extent=SCATTER_EXTENT * 2,
+                  interpolation='nearest', aspect='auto')
+        # Marcador vazio só para a legenda
+        ax.scatter([], [], c=color, label=mood, alpha=0.6, s=30,
+                  edgecolors='black', linewidth=0.5)
+
+
+def mood_scatter(points_by_mood, valence_median, energy_median,
+                 max_points=SCATTER_MAX_POINTS):
+    """
+    Valence × Energy com os quatro quadrantes emocionais.
+    `points_by_mood` mapeia humor -> (valence, energy). Com mais de
+    `max_points` pontos, desenha a densidade de cada humor em vez dos
+    pontos, com custo de renderização constante.
+    """
+    fig = Figure(figsize=(12, 10))
+    ax = fig.subplots()
+
+    n_points = sum(len(valence) for valence, _ in points_by_mood.values())
+    if n_points > max_points:
+        _draw_density(ax, points_by_mood)
+    else:
+        empty = np.empty(0)
+        for mood, color in COLORS_MOOD.items():
+            valence, energy = points_by_mood.get(mood, (empty, empty))
+            ax.scatter(valence, energy,
+                      c=color, label=mood, alpha=0.6, s=30,
+                      edgecolors='black', linewidth=0.5)
+
+    # Linhas de divisão
+    ax.axhline(y=energy_median, color='black', linestyle='--', linewidth=2, alpha=0.5)
+    ax.axvline(x=valence_median, color='black', linestyle='--', linewidth=2, alpha=0.5)
+
+    # Labels dos quadrantes
+    ax.text(0.75, 0.75, 'Happy/Energetic', fontsize=12, fontweight='bold',
+           ha='center', bbox=dict(boxstyle='round', facecolor='#FFD700', alpha=0.7))
+    ax.text(0.25, 0.75, 'Angry/Tense', fontsize=12, fontweight='bold',
+           ha='center', bbox=dict(boxstyle='round', facecolor='#FF4444', alpha=0.7))
+    ax.text(0.25, 0.25, 'Sad/Calm', fontsize=12, fontweight='bold',
+           ha='center', bbox=dict(boxstyle='round', facecolor='#4169E1', alpha=0.7))
+    ax.text(0.75, 0.25, 'Peaceful/Content', fontsize=12, fontweight='bold',
+           ha='center', bbox=dict(boxstyle='round', facecolor='#90EE90', alpha=0.7))
+
+    ax.set_xlabel('Valence (Triste ← → Feliz)', fontsize=13, fontweight='bold')
+    ax.set_ylabel('Energy (Calmo ← → Energético)', fontsize=13, fontweight='bold')
+    ax.set_xlim(-0.05, 1.05)
+    ax.set_ylim(-0.05, 1.05)
+    ax.legend(loc='upper left', fontsize=11, frameon=True, shadow=True)
+    ax.grid(True, alpha=0.3)
+    fig.tight_layout()
+    return fig
+
+
+def mood_pie(mood_dist):
+    """
+    Pizza com a distribuição de humores
+    """
+    fig = Figure(figsize=(8, 8))
+    ax = fig.subplots()
+
+    colors_pie = [COLORS_MOOD[mood] for mood in mood_dist.index]
+    explode = [0.05] * len(mood_dist)
+
+    wedges, texts, autotexts = ax.pie(
+        mood_dist,
+        labels=[f"{mood}\n({count:,})" for mood, count in mood_dist.items()],
+        autopct='%1.1f%%',
+        colors=colors_pie,
+        startangle=90,
+        explode=explode,
+        shadow=True,
+        textprops={'fontsize': 10, 'fontweight': 'bold'}
+    )
+
+    for autotext in autotexts:
+        autotext.set_color('white')
+        autotext.set_fontsize(12)
+        autotext.set_fontweight('bold')
+
+    fig.tight_layout()
+    return fig
+
+
+def mood_by_decade(mood_by_decade):
+    """
+    Barras empilhadas com o percentual de cada humor por década
+    """
+    fig = Figure(figsize=(14, 7))
+    ax = fig.subplots()
+
+    mood_by_decade.plot(kind='bar', stacked=True, ax=ax,
+                       color=[COLORS_MOOD[m] for m in mood_by_decade.columns],
+                       edgecolor='black', linewidth=1.5, width=0.7)
+
+    ax.set_xlabel('Década', fontsize=13, fontweight='bold')
+    ax.set_ylabel('Percentual (%)', fontsize=13, fontweight='bold')
+    ax.set_xticklabels(ax.get_xticklabels(), rotation=45, ha='right')
+    ax.legend(title='Mood Category', fontsize=11, title_fontsize=12)
+    ax.set_ylim(0, 100)
+    ax.grid(True, alpha=0.3, axis='y')
+    fig.tight_layout()
+    return fig
+
+
+def theme_timeline(temas_por_decada, variacao, xlabel='Década'):
+    """
+    Linha do tempo dos temas, anotada com a variação total de cada um
+    """
+    fig = Figure(figsize=(14, 8))
+    ax = fig.subplots()
+
+    markersize = _marker_size(len(temas_por_decada), 9)
+    for tema in temas_por_decada.columns:
+        ax.plot(temas_por_decada.index, temas_por_decada[tema],
+               marker='o', linewidth=3, markersize=markersize,
+               label=tema.upper(), color=CORES_TEMAS[tema], alpha=0.8)
+
+        # Anotação no último ponto
+        ultimo_valor = temas_por_decada[tema].iloc[-1]
+        var_pct = variacao[tema]
+        ax.annotate(f'{var_pct:+.0f}%',
+                   xy=(temas_por_decada.index[-1], ultimo_valor),
+                   xytext=(10, 0), textcoords='offset points',
+                   fontsize=10, fontweight='bold',
+                   color=CORES_TEMAS[tema],
+                   bbox=dict(boxstyle='round', facecolor='white',
+                            edgecolor=CORES_TEMAS[tema], linewidth=2))
+
+    ax.set_xlabel(xlabel, fontsize=13, fontweight='bold')
+    ax.set_ylabel('Intensidade Média', fontsize=13, fontweight='bold')
+    ax.legend(loc='best', fontsize=11, frameon=True, shadow=True)
+    ax.grid(True, alpha=0.3)
+    fig.tight_layout()
+    return fig
+
+
+def theme_variation(variacao):
+    """
+    Barras horizontais com a variação percentual de cada tema
+    """
+    fig = Figure(figsize=(8, 8))
+    ax = fig.subplots()
+
+    cores_var = ['green' if x > 0 else 'red' for x in variacao]
+    bars = ax.barh(range(len(variacao)), variacao.values,
+                  color=cores_var, alpha=0.7,
+                  edgecolor='black', linewidth=2)
+
+    ax.set_yticks(range(len(variacao)))
+    ax.set_yticklabels(variacao.index, fontsize=11, fontweight='bold')
+    ax.set_xlabel('Variação (%)', fontsize=12, fontweight='bold')
+    ax.axvline(x=0, color='black', linewidth=2)
+    ax.grid(True, alpha=0.3, axis='x')
+
+    # Adicionar valores
+    for i, (val, bar) in enumerate(zip(variacao.values, bars)):
+        ax.text(val + (5 if val > 0 else -5), i, f'{val:+.0f}%',
+               va='center', ha='left' if val > 0 else 'right',
+               fontweight='bold', fontsize=10)
+
+    fig.tight_layout()
+    return fig
+
+
+def theme_heatmap(temas_por_decada):
+    """
+    Heatmap da intensidade média de cada tema por década
+    """
+    # O seaborn só serve para este gráfico: importado no primeiro uso, fora
+    # da subida do dashboard
+    import seaborn as sns
+
+    fig = Figure(figsize=(14, 8))
+    ax = fig.subplots()
+
+    sns.heatmap(temas_por_decada.T, annot=True, fmt='.3f',
+               cmap='YlOrRd', linewidths=2, linecolor='white',
+               cbar_kws={'label': 'Intensidade Média'}, ax=ax)
+
+    ax.set_xlabel('Década', fontsize=13, fontweight='bold')
+    ax.set_ylabel('Tema', fontsize=13, fontweight='bold')
+    fig.tight_layout()
+    return fig
@@ -0,0 +1,79 @@
+"""
+Quanto o layout compacto do cache (`data_cache.compact_table` e
+`data_cache.load_frame`) economiza e se os agregados continuam iguais.
+
+Compara o frame carregado do cache com o que `pd.read_csv` devolve
+(float64 e strings em todas as colunas): memória por coluna e o cubo
+década × gênero × humor.
+
+Uso:
+    python compact.py music_com_decade.csv
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import data_cache
+from cube import AggregateCube
+
+# Tolerância dos agregados em relação ao frame float64
+RTOL = 1e-6
+
+
+def memory_report(reference, compact):
+    """
+    Bytes por coluna nos dois frames (strings contadas por completo) e a
+    economia, com uma linha de total
+    """
+    before = reference.memory_usage(deep=True, index=False)
+    after = compact.memory_usage(deep=True, index=False).reindex(before.index)
+    report = pd.DataFrame({
+        'tipo_antes': reference.dtypes.astype(str),
+        'tipo_depois': compact.dtypes.reindex(before.index).astype(str),
+        'antes (MB)': before / 1e6,
+        'depois (MB)': after / 1e6,
+    })
+    report.loc['total'] = ['', '', before.sum() / 1e6, after.sum() / 1e6]
+    report['economia'] = 1 - report['depois (MB)'] / report['antes (MB)']
+    return report
+
+
+def check_equivalence(reference, compact, rtol=RTOL):
+    """
+    Levanta AssertionError se o cubo do frame compacto difere do cubo do
+    frame de referência: contagens iguais, somas dentro de `rtol`
+    """
+    expected = AggregateCube.from_frame(reference)
+    result = AggregateCube.from_frame(compact)
+    for mine, theirs in zip(result.categories, expected.categories):
+        np.testing.assert_array_equal(mine.astype(theirs.dtype), theirs)
+    assert result.features == expected.features
+    np.testing.assert_array_equal(result.counts, expected.counts)
+    np.testing.assert_array_equal(result.nonnull, expected.nonnull)
+    np.testing.assert_allclose(result.sums, expected.sums, rtol=rtol, atol=0)
+    np.testing.assert_allclose(result.sumsq, expected.sumsq, rtol=rtol, atol=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memória e agregados do frame compacto")
+    parser.add_argument('csv', nargs='?', default='music_com_decade.csv')
+    args = parser.parse_args()
+
+    reference = data_cache.add_derived_columns(pd.read_csv(args.csv))
+    # Só as linhas do CSV (a base vem antes dos segmentos acrescentados)
+    compact = data_cache.load_frame(args.csv).iloc[:len(reference)]
+
+    report = memory_report(reference, compact)
+    with pd.option_context('display.max_rows', None, 'display.width', 160):
+        print(report.round(3).to_string())
+    total = report.loc['total']
+    print(f"\n{total['antes (MB)']:.1f} MB -> {total['depois (MB)']:.1f} MB "
+          f"({total['economia']:.0%} menos)")
+
+    check_equivalence(reference, compact)
+    print(f"✅ Cubo igual ao do frame float64 (contagens exatas, somas com rtol={RTOL:g})")
+
+
+if __name__ == '__main__':
+    main()
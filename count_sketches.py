@@ -0,0 +1,283 @@
+"""
+Contagens de valores distintos e top-k por célula década × gênero × humor.
+
+Para cada coluna (ex.: `artist_name`, `topic`) cada célula guarda:
+
+- distintos: os hashes de 64 bits dos valores, quando são no máximo
+  `EXACT_LIMIT` (o mesmo espaço dos registradores), ou um HyperLogLog de
+  precisão p = `PRECISION`. Juntar células é unir os hashes ou tirar o
+  máximo dos registradores; enquanto só há células exatas, a contagem é
+  exata. O erro padrão do HyperLogLog é 1,04 / sqrt(2^p) (0,8% com p = 14).
+- top-k: as contagens exatas dos `capacity` valores mais frequentes e um
+  piso, o quanto a contagem guardada de qualquer valor pode estar abaixo
+  da real. Juntar células é somar as contagens; a soma dos pisos das
+  células selecionadas limita o erro (zero quando nenhuma célula cortou
+  valores, o que torna o top-k exato). Os valores ficam como códigos de
+  um vocabulário por coluna, então somar é um `bincount`.
+
+Gênero não precisa disso: é dimensão do cubo, que já responde contagens e
+top de gêneros de forma exata.
+"""
+import numpy as np
+import pandas as pd
+
+from cube import DIMS, cell_codes, merge_categories
+
+COLUMNS = ('artist_name', 'topic')
+PRECISION = 14
+# Células com até tantos valores distintos guardam os hashes (8 bytes cada)
+EXACT_LIMIT = 2 ** PRECISION // 8
+# Valores guardados por célula no top-k (acima disso só os mais frequentes)
+DEFAULT_CAPACITY = 1024
+
+
+def hash_values(values):
+    """
+    Hash de 64 bits de cada valor, igual entre processos e entre dtypes
+    (str, object e category)
+    """
+    return pd.util.hash_pandas_object(pd.Series(values), index=False).to_numpy()
+
+
+def _registers(rows, hashes, n_rows, precision=PRECISION):
+    """
+    Registradores HyperLogLog (n_rows, 2^p): a linha r junta os hashes com
+    `rows == r`
+    """
+    bucket = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    rest = hashes & np.uint64((1 << (64 - precision)) - 1)
+    # Posição do primeiro bit 1 (rest < 2^53 é exato em float64)
+    rank = (64 - precision) - np.frexp(rest.astype(np.float64))[1] + 1
+    registers = np.zeros(n_rows * 2 ** precision, dtype=np.uint8)
+    np.maximum.at(registers, rows * 2 ** precision + bucket, rank.astype(np.uint8))
+    return registers.reshape(n_rows, 2 ** precision)
+
+
+def estimate(registers):
+    """
+    Estimativa do HyperLogLog, com contagem linear para conjuntos pequenos
+    """
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)))
+    zeros = np.count_nonzero(registers == 0)
+    if raw <= 2.5 * m and zeros:
+        return m * np.log(m / zeros)
+    return raw
+
+
+def _top_table(cells, items, weights, n_cells, capacity):
+    """
+    Contagens por (célula, valor) cortadas nos `capacity` maiores de cada
+    célula. Retorna (offsets, codes, counts, floors, items): os códigos
+    (em `items`) da célula c em offsets[c]:offsets[c+1], em ordem
+    decrescente de contagem, e a maior contagem cortada de cada célula.
+    """
+    codes, uniques = pd.factorize(items)
+    keys = cells * len(uniques) + codes
+    keys, inverse = np.unique(keys, return_inverse=True)
+    counts = np.bincount(inverse, weights=weights).astype(np.int64)
+    key_cells, key_items = keys // max(len(uniques), 1), keys % max(len(uniques), 1)
+
+    order = np.lexsort((key_items, -counts, key_cells))
+    key_cells, key_items, counts = key_cells[order], key_items[order], counts[order]
+    starts = np.searchsorted(key_cells, np.arange(n_cells))
+    rank = np.arange(len(key_cells)) - starts[key_cells]
+
+    floors = np.zeros(n_cells, dtype=np.int64)
+    cut = rank == capacity
+    floors[key_cells[cut]] = counts[cut]
+    keep = rank < capacity
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(key_cells[keep], minlength=n_cells))])
+    # Vocabulário só com os valores que ficaram
+    used, codes = np.unique(key_items[keep], return_inverse=True)
+    return offsets, codes.astype(np.int64), counts[keep], floors, np.asarray(uniques, dtype=object)[used]
+
+
+class CountSketches:
+    """
+    Distintos e top-k de algumas colunas por célula, no mesmo grid do cubo
+    """
+
+    def __init__(self, dims, categories, columns, distinct, tops,
+                 precision=PRECISION, capacity=DEFAULT_CAPACITY):
+        self.dims = tuple(dims)
+        self.categories = [np.asarray(c) for c in categories]
+        self.columns = list(columns)
+        # coluna -> (offsets, hashes, hll_cells, registers): hashes exatos em
+        # CSR por célula; células em `hll_cells` usam a linha de `registers`
+        self.distinct = distinct
+        # coluna -> (offsets, codes, counts, floors, items)
+        self.tops = tops
+        self.precision = precision
+        self.capacity = capacity
+
+    @property
+    def shape(self):
+        return tuple(len(c) for c in self.categories)
+
+    @classmethod
+    def from_frame(cls, df, columns=COLUMNS, dims=DIMS, precision=PRECISION,
+                   capacity=DEFAULT_CAPACITY):
+        categories = [np.sort(df[dim].dropna().unique()) for dim in dims]
+        sketches = cls(dims, categories, [c for c in columns if c in df.columns], {}, {},
+                       precision, capacity)
+        n_cells = int(np.prod(sketches.shape))
+        empty = (np.zeros(n_cells + 1, dtype=np.int64), np.empty(0, dtype=np.uint64),
+                 np.empty(0, dtype=np.int64), np.empty((0, 2 ** precision), dtype=np.uint8))
+        for column in sketches.columns:
+            sketches.distinct[column] = empty
+            sketches.tops[column] = (np.zeros(n_cells + 1, dtype=np.int64), np.empty(0, dtype=np.int64),
+                                     np.empty(0, dtype=np.int64), np.zeros(n_cells, dtype=np.int64),
+                                     np.empty(0, dtype=object))
+        sketches._add(df, np.arange(n_cells))
+        return sketches
+
+    def _add(self, df, old_cells):
+        # Soma as linhas de `df`; `old_cells` leva cada célula guardada para
+        # a sua posição no grid atual (que pode ter crescido)
+        n_cells = int(np.prod(self.shape))
+        cells = cell_codes(df, self.dims, self.categories)
+        for column in self.columns:
+            values = df[column]
+            keep = (cells >= 0) & values.notna().to_numpy()
+            new_cells, new_values = cells[keep], values.to_numpy()[keep]
+
+            offsets, hashes, hll_cells, registers = self.distinct[column]
+            self.distinct[column] = self._merge_distinct(
+                np.concatenate([old_cells[np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))],
+                                new_cells]),
+                np.concatenate([hashes, hash_values(new_values)]),
+                old_cells[hll_cells], registers, n_cells)
+
+            offsets, codes, counts, floors, items = self.tops[column]
+            table = _top_table(
+                np.concatenate([old_cells[np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))],
+                                new_cells]),
+                np.concatenate([items[codes], new_values.astype(object)]),
+                np.concatenate([counts, np.ones(len(new_cells), dtype=np.int64)]),
+                n_cells, self.capacity)
+            merged_floors = np.zeros(n_cells, dtype=np.int64)
+            merged_floors[old_cells] = floors
+            self.tops[column] = table[:3] + (merged_floors + table[3], table[4])
+
+    def _merge_distinct(self, cells, hashes, hll_cells, registers, n_cells):
+        # Hashes únicos por célula; células acima do limite (ou que já eram
+        # HyperLogLog) passam para registradores
+        order = np.lexsort((hashes, cells))
+        cells, hashes = cells[order], hashes[order]
+        first = np.ones(len(cells), dtype=bool)
+        first[1:] = (cells[1:] != cells[:-1]) | (hashes[1:] != hashes[:-1])
+        cells, hashes = cells[first], hashes[first]
+        sizes = np.bincount(cells, minlength=n_cells)
+        sketch = np.zeros(n_cells, dtype=bool)
+        sketch[hll_cells] = True
+        sketch |= sizes > EXACT_LIMIT
+
+        # Registradores só das células em HyperLogLog, uma linha por célula
+        sketched_cells = np.flatnonzero(sketch)
+        row_of = np.full(n_cells, -1, dtype=np.int64)
+        row_of[sketched_cells] = np.arange(len(sketched_cells))
+        to_sketch = sketch[cells]
+        merged = _registers(row_of[cells[to_sketch]], hashes[to_sketch], len(sketched_cells),
+                            self.precision)
+        rows = row_of[hll_cells]
+        merged[rows] = np.maximum(merged[rows], registers)
+        exact = ~to_sketch
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(cells[exact], minlength=n_cells))])
+        return offsets, hashes[exact], sketched_cells, merged
+
+    def append(self, batch):
+        """
+        Junta um lote de músicas: O(lote + tamanho dos sketches). Uma cópia
+        rasa recebe o lote sem mudar os sketches do original.
+        """
+        self.distinct, self.tops = dict(self.distinct), dict(self.tops)
+        merged = [merge_categories(cats, batch[dim])
+                  for dim, cats in zip(self.dims, self.categories)]
+        old_shape = self.shape
+        self.categories = [cats for cats, _ in merged]
+        old_index = np.unravel_index(np.arange(int(np.prod(old_shape))), old_shape)
+        old_cells = np.ravel_multi_index([pos[i] for (_, pos), i in zip(merged, old_index)],
+                                         self.shape)
+        self._add(batch, old_cells)
+
+    def save(self, path):
+        arrays = {}
+        for i, column in enumerate(self.columns):
+            for name, array in zip(('offsets', 'hashes', 'hll_cells', 'registers'),
+                                   self.distinct[column]):
+                arrays[f'{name}_{i}'] = array
+            for name, array in zip(('top_offsets', 'codes', 'counts', 'floors', 'items'), self.tops[column]):
+                arrays[f'{name}_{i}'] = array
+        with open(path, 'wb') as f:
+            np.savez(f, dims=np.array(self.dims), columns=np.array(self.columns),
+                     precision=self.precision, capacity=self.capacity, **arrays,
+                     **{f'categories_{i}': cats for i, cats in enumerate(self.categories)})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=True) as data:
+            dims = [str(d) for d in data['dims']]
+            columns = [str(c) for c in data['columns']]
+            categories = [data[f'categories_{i}'] for i in range(len(dims))]
+            distinct = {column: tuple(data[f'{name}_{i}'] for name in
+                                      ('offsets', 'hashes', 'hll_cells', 'registers'))
+                        for i, column in enumerate(columns)}
+            tops = {column: tuple(data[f'{name}_{i}'] for name in
+                                  ('top_offsets', 'codes', 'counts', 'floors', 'items'))
+                    for i, column in enumerate(columns)}
+            return cls(dims, categories, columns, distinct, tops,
+                       int(data['precision']), int(data['capacity']))
+
+    def _selected_cells(self, selection):
+        masks = []
+        for dim, cats in zip(self.dims, self.categories):
+            values = (selection or {}).get(dim)
+            masks.append(np.ones(len(cats), dtype=bool) if values is None
+                         else np.isin(cats, list(values)))
+        grid = np.zeros(self.shape, dtype=bool)
+        grid[np.ix_(*masks)] = True
+        return grid.ravel()
+
+    @staticmethod
+    def _entries(offsets, selected):
+        # Máscara das entradas (CSR) das células selecionadas
+        return np.repeat(selected, np.diff(offsets))
+
+    def n_distinct(self, column, selection=None):
+        """
+        Número de valores distintos de `column` na seleção: exato enquanto
+        as células selecionadas guardam hashes, estimado pelo HyperLogLog
+        quando alguma passou do limite
+        """
+        offsets, hashes, hll_cells, registers = self.distinct[column]
+        selected = self._selected_cells(selection)
+        hashes = np.unique(hashes[self._entries(offsets, selected)])
+        sketched = selected[hll_cells]
+        if not sketched.any():
+            return len(hashes)
+        merged = registers[sketched].max(axis=0)
+        merged = np.maximum(merged, _registers(np.zeros(len(hashes), dtype=np.int64), hashes, 1,
+                                               self.precision)[0])
+        return int(round(estimate(merged)))
+
+    def top(self, column, n=None, selection=None):
+        """
+        Equivalente a `value_counts().head(n)` da coluna na seleção. As
+        contagens podem estar abaixo das reais em até `top_error`.
+        """
+        offsets, codes, counts, _, items = self.tops[column]
+        entries = self._entries(offsets, self._selected_cells(selection))
+        totals = np.bincount(codes[entries], weights=counts[entries], minlength=len(items)).astype(np.int64)
+        present = np.flatnonzero(totals)
+        # Empates em ordem alfabética, como o `top` do cubo
+        order = present[np.lexsort((items[present].astype(str), -totals[present]))][:n]
+        return pd.Series(totals[order], index=pd.Index(items[order], name=column), name='count')
+
+    def top_error(self, column, selection=None):
+        """
+        Quanto a contagem de qualquer valor em `top` pode estar abaixo da
+        real (0 = exato)
+        """
+        return int(self.tops[column][3][self._selected_cells(selection)].sum())
@@ -0,0 +1,219 @@
+"""
+Cubo pré-agregado década × gênero × humor.
+
+Cada célula guarda a contagem de músicas e, para cada feature numérica,
+a soma, a soma dos quadrados e o número de valores não nulos. Qualquer
+combinação dos filtros da sidebar é respondida fatiando e somando o cubo,
+com custo proporcional ao número de células e não ao número de músicas.
+"""
+import numpy as np
+import pandas as pd
+
+from data_cache import AUDIO_FEATURES, TEMAS
+
+DIMS = ('decade', 'genre', 'mood_category')
+
+
+def merge_categories(categories, values):
+    """
+    Junta os valores novos de uma dimensão às categorias (ordenadas).
+    Retorna (novas categorias, posição de cada categoria antiga nelas)
+    """
+    new_values = pd.unique(pd.Series(values).dropna())
+    merged = np.sort(np.concatenate([categories, new_values[~np.isin(new_values, categories)]]))
+    return merged, np.searchsorted(merged, categories)
+
+
+def cell_codes(df, dims, categories):
+    """
+    Índice plano da célula de cada linha (-1 se alguma dimensão é nula)
+    """
+    shape = tuple(len(c) for c in categories)
+    codes = [pd.Categorical(df[dim], categories=cats).codes
+             for dim, cats in zip(dims, categories)]
+    valid = np.logical_and.reduce([c >= 0 for c in codes])
+    cells = np.full(len(df), -1, dtype=np.int64)
+    cells[valid] = np.ravel_multi_index([c[valid] for c in codes], shape)
+    return cells
+
+
+class AggregateCube:
+    """
+    Contagens e somas por célula (uma célula por combinação dos valores
+    das dimensões). Linhas com alguma dimensão nula ficam fora do cubo.
+    """
+
+    def __init__(self, dims, categories, features, counts, sums, sumsq, nonnull):
+        self.dims = tuple(dims)
+        self.categories = [np.asarray(c) for c in categories]
+        self.features = list(features)
+        self.counts = counts
+        self.sums = sums
+        self.sumsq = sumsq
+        self.nonnull = nonnull
+
+    @property
+    def shape(self):
+        return tuple(len(c) for c in self.categories)
+
+    @classmethod
+    def empty(cls, dims, categories, features):
+        shape = tuple(len(c) for c in categories)
+        return cls(dims, categories, features, np.zeros(shape, dtype=np.int64),
+                   np.zeros(shape + (len(features),)), np.zeros(shape + (len(features),)),
+                   np.zeros(shape + (len(features),)))
+
+    @classmethod
+    def from_frame(cls, df, dims=DIMS, features=None):
+        if features is None:
+            features = [c for c in AUDIO_FEATURES + TEMAS if c in df.columns]
+        categories = [np.sort(df[dim].dropna().unique()) for dim in dims]
+        cube = cls.empty(dims, categories, features)
+        cube._accumulate(df)
+        return cube
+
+    def _accumulate(self, df):
+        # Soma as linhas de `df` nas células (categorias já precisam existir)
+        shape = self.shape
+        size = int(np.prod(shape))
+        cells = cell_codes(df, self.dims, self.categories)
+        valid = cells >= 0
+        flat = cells[valid]
+
+        self.counts += np.bincount(flat, minlength=size).reshape(shape)
+        for i, feature in enumerate(self.features):
+            values = df[feature].to_numpy(dtype=np.float64)[valid]
+            present = ~np.isnan(values)
+            values = np.where(present, values, 0.0)
+            self.sums[..., i] += np.bincount(flat, weights=values, minlength=size).reshape(shape)
+            self.sumsq[..., i] += np.bincount(flat, weights=values * values, minlength=size).reshape(shape)
+            self.nonnull[..., i] += np.bincount(flat, weights=present, minlength=size).reshape(shape)
+
+    def append(self, batch):
+        """
+        Acrescenta um lote de músicas ao cubo. O custo é O(lote + células):
+        valores novos de uma dimensão só realocam o grid, sem reler linhas.
+        """
+        merged = [merge_categories(cats, batch[dim])
+                  for dim, cats in zip(self.dims, self.categories)]
+        if any(len(cats) != len(old) for (cats, _), old in zip(merged, self.categories)):
+            grown = AggregateCube.empty(self.dims, [cats for cats, _ in merged], self.features)
+            positions = np.ix_(*[pos for _, pos in merged])
+            grown.counts[positions] = self.counts
+            grown.sums[positions] = self.sums
+            grown.sumsq[positions] = self.sumsq
+            grown.nonnull[positions] = self.nonnull
+            self.categories = grown.categories
+            self.counts, self.sums = grown.counts, grown.sums
+            self.sumsq, self.nonnull = grown.sumsq, grown.nonnull
+        self._accumulate(batch)
+
+    def save(self, path):
+        np.savez(path, dims=np.array(self.dims), features=np.array(self.features),
+                 counts=self.counts, sums=self.sums, sumsq=self.sumsq, nonnull=self.nonnull,
+                 **{f'categories_{i}': cats for i, cats in enumerate(self.categories)})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=True) as data:
+            dims = [str(d) for d in data['dims']]
+            categories = [data[f'categories_{i}'] for i in range(len(dims))]
+            return cls(dims, categories, [str(f) for f in data['features']], data['counts'],
+                       data['sums'], data['sumsq'], data['nonnull'])
+
+    def _masks(self, selection):
+        # Um vetor booleano por dimensão; None significa "todos os valores"
+        masks = []
+        for dim, cats in zip(self.dims, self.categories):
+            selected = (selection or {}).get(dim)
+            if selected is None:
+                masks.append(np.ones(len(cats), dtype=bool))
+            else:
+                masks.append(np.isin(cats, list(selected)))
+        return masks
+
+    def _reduce(self, array, selection, keep):
+        # Fatia as células selecionadas e soma os eixos que não estão em `keep`
+        masks = self._masks(selection)
+        sliced = array[np.ix_(*masks)]
+        axes = tuple(i for i, dim in enumerate(self.dims) if dim not in keep)
+        labels = [cats[mask] for dim, cats, mask in zip(self.dims, self.categories, masks)
+                  if dim in keep]
+        return sliced.sum(axis=axes), labels
+
+    def total(self, selection=None):
+        """
+        Número de músicas na seleção
+        """
+        counts, _ = self._reduce(self.counts, selection, ())
+        return int(counts)
+
+    def counts_by(self, dim, selection=None):
+        """
+        Equivalente a `value_counts().sort_index()` na coluna `dim`
+        """
+        counts, (labels,) = self._reduce(self.counts, selection, (dim,))
+        present = counts > 0
+        return pd.Series(counts[present], index=pd.Index(labels[present], name=dim),
+                         name='count')
+
+    def top(self, dim, n=None, selection=None):
+        """
+        Equivalente a `value_counts().head(n)` na coluna `dim`
+        """
+        counts = self.counts_by(dim, selection)
+        order = np.argsort(-counts.to_numpy(), kind='stable')
+        return counts.iloc[order[:n]]
+
+    def means_by(self, dim, features, selection=None):
+        """
+        Equivalente a `groupby(dim)[features].mean()`
+        """
+        idx = [self.features.index(f) for f in features]
+        counts, (labels,) = self._reduce(self.counts, selection, (dim,))
+        sums, _ = self._reduce(self.sums[..., idx], selection, (dim,))
+        nonnull, _ = self._reduce(self.nonnull[..., idx], selection, (dim,))
+        present = counts > 0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums[present] / nonnull[present]
+        return pd.DataFrame(means, index=pd.Index(labels[present], name=dim),
+                            columns=pd.Index(features))
+
+    def std_by(self, dim, features, selection=None):
+        """
+        Desvio padrão amostral (ddof=1) por valor de `dim`
+        """
+        idx = [self.features.index(f) for f in features]
+        counts, (labels,) = self._reduce(self.counts, selection, (dim,))
+        sums, _ = self._reduce(self.sums[..., idx], selection, (dim,))
+        sumsq, _ = self._reduce(self.sumsq[..., idx], selection, (dim,))
+        n, _ = self._reduce(self.nonnull[..., idx], selection, (dim,))
+        present = counts > 0
+        sums, sumsq, n = sums[present], sumsq[present], n[present]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            var = (sumsq - sums * sums / n) / (n - 1)
+        return pd.DataFrame(np.sqrt(np.clip(var, 0, None)),
+                            index=pd.Index(labels[present], name=dim),
+                            columns=pd.Index(features))
+
+    def crosstab(self, index, columns, selection=None, normalize=False):
+        """
+        Equivalente a `pd.crosstab(df[index], df[columns], normalize=...)`
+        com normalize em (False, 'index', 'columns', 'all')
+        """
+        counts, labels = self._reduce(self.counts, selection, (index, columns))
+        if self.dims.index(index) > self.dims.index(columns):
+            counts = counts.T
+            labels = labels[::-1]
+        rows = counts.sum(axis=1) > 0
+        cols = counts.sum(axis=0) > 0
+        table = pd.DataFrame(counts[np.ix_(rows, cols)],
+                             index=pd.Index(labels[0][rows], name=index),
+                             columns=pd.Index(labels[1][cols], name=columns))
+        if normalize == 'index':
+            table = table.div(table.sum(axis=1), axis=0)
+        elif normalize == 'columns':
+            table = table.div(table.sum(axis=0), axis=1)
+        elif normalize in (True, 'all'):
+            table = table / table.to_numpy().sum()
+        return table
@@ -1,9 +1,13 @@
+import time
+
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import numpy as np
-from matplotlib import patches
+
+# Só módulos leves antes do header e da sidebar: pandas, matplotlib, altair
+# e o dataset são carregados depois que a página já apareceu
+from metadata import read_metadata, write_metadata
+from profiling import Profiler, is_enabled
+
+DATA_PATH = 'music_com_decade.csv'
 
 # Configuração da página
 st.set_page_config(
@@ -13,6 +17,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Medição por etapa (DASHBOARD_PROFILE=1 ou ?profile=1); desligada não custa nada
+profiler = Profiler(is_enabled(st.query_params))
+
 # CSS customizado
 st.markdown("""
 <style>
@@ -58,520 +65,479 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Função para carregar e preparar dados
-@st.cache_data
-def load_data():
-    # Carregar dados
-    df = pd.read_csv('music_com_decade.csv')
-    
-    # Verificar se já tem decade
-    if 'decade' not in df.columns:
-        if 'release_date' in df.columns:
-            df['release_date'] = pd.to_datetime(df['release_date'], errors='coerce')
-            df['decade'] = (df['release_date'].dt.year // 10) * 10
-        elif 'year' in df.columns:
-            df['decade'] = (df['year'] // 10) * 10
-        else:
-            st.error("❌ Dataset não tem coluna de data/ano!")
-            st.stop()
-    
-    # Criar mood_category se não existir
-    if 'mood_category' not in df.columns:
-        valence_median = df['valence'].median()
-        energy_median = df['energy'].median()
-        
-        conditions = [
-            (df['valence'] >= valence_median) & (df['energy'] >= energy_median),
-            (df['valence'] < valence_median) & (df['energy'] >= energy_median),
-            (df['valence'] < valence_median) & (df['energy'] < energy_median),
-            (df['valence'] >= valence_median) & (df['energy'] < energy_median)
-        ]
-        categories = ['Happy/Energetic', 'Angry/Tense', 'Sad/Calm', 'Peaceful/Content']
-        
-        # CORREÇÃO DO ERRO: Especificar default como string
-        df['mood_category'] = np.select(conditions, categories, default='Unknown')
-    
-    return df
-
-# Carregar dados
-df = load_data()
-
 # HEADER
 st.markdown('<div class="main-header">🎵 70 Anos de Evolução Musical (1950-2019)</div>', unsafe_allow_html=True)
 
-# SIDEBAR - Filtros
-st.sidebar.header("🎛️ Filtros")
-st.sidebar.markdown("---")
+# Opções dos filtros, total de músicas e granularidades gravados na última
+# carga desta versão dos dados (None na primeira)
+with profiler.stage('metadata'):
+    startup = read_metadata(DATA_PATH)
 
-# Filtro de década
-decades_options = sorted(df['decade'].unique())
-selected_decades = st.sidebar.multiselect(
-    "📅 Selecione as Décadas",
-    options=decades_options,
-    default=decades_options
-)
+def sidebar_filters(startup):
+    # SIDEBAR - Filtros
+    st.sidebar.header("🎛️ Filtros")
+    st.sidebar.markdown("---")
 
-# Filtro de gênero
-genres = sorted(df['genre'].unique())
-selected_genres = st.sidebar.multiselect(
-    "🎸 Selecione os Gêneros",
-    options=genres,
-    default=genres
-)
+    # Filtro de década
+    options = startup['options']
+    decades_options = options['decade']
+    genres = options['genre']
+    moods = options['mood_category']
+    selected_decades = st.sidebar.multiselect(
+        "📅 Selecione as Décadas",
+        options=decades_options,
+        default=decades_options
+    )
+
+    # Filtro de gênero
+    selected_genres = st.sidebar.multiselect(
+        "🎸 Selecione os Gêneros",
+        options=genres,
+        default=genres
+    )
 
-# Filtro de mood
-moods = sorted(df['mood_category'].unique())
-selected_moods = st.sidebar.multiselect(
-    "🎭 Selecione os Humores",
-    options=moods,
-    default=moods
+    # Filtro de mood
+    selected_moods = st.sidebar.multiselect(
+        "🎭 Selecione os Humores",
+        options=moods,
+        default=moods
+    )
+
+    # Granularidade das séries temporais (evolução das características e dos temas)
+    time_views = startup['time_views']
+    time_view = st.sidebar.selectbox(
+        "🕒 Granularidade das séries",
+        options=list(time_views),
+        format_func=time_views.get
+    )
+    selection = {
+        'decade': selected_decades,
+        'genre': selected_genres,
+        'mood_category': selected_moods
+    }
+    return selection, time_view
+
+filters = None
+if startup is not None:
+    filters = sidebar_filters(startup)
+    profiler.mark('first_paint')
+
+# Bibliotecas pesadas, só depois de o header e a sidebar estarem na tela
+# (o seaborn fica para o primeiro heatmap)
+with profiler.stage('imports'):
+    import charts
+    import views
+    from dataset import Dataset
+    from figure_cache import FigureCache, normalize_selection
+    from precompute import Precomputer, configured_presets
+    from prefetch import ChartPrefetcher
+
+# Função para carregar e preparar dados: frame, cubo, índice dos filtros
+# e sketches, compartilhados entre sessões e atualizados incrementalmente
+@st.cache_resource
+def load_data():
+    # Carregar dados do cache colunar (o CSV só é lido quando muda)
+    try:
+        return Dataset(DATA_PATH)
+    except ValueError as e:
+        st.error(f"❌ {e}")
+        st.stop()
+
+# Gráficos renderizados, compartilhados entre sessões, a fila que
+# renderiza em segundo plano os gráficos das abas fechadas e o
+# pré-cálculo das visões mais acessadas
+@st.cache_resource
+def load_figure_cache():
+    figure_cache = FigureCache()
+    prefetcher = ChartPrefetcher(figure_cache)
+    return figure_cache, prefetcher, Precomputer(prefetcher, configured_presets())
+
+# Carregar dados (lotes novos acrescentados por ingest.py entram aqui)
+# A execução inteira usa a mesma versão, mesmo que outra sessão a atualize no meio
+with profiler.stage('load_data'):
+    store = load_data()
+    store.refresh()
+    dataset = store.snapshot()
+df = dataset.df
+filter_index = dataset.filter_index
+figure_cache, prefetcher, precomputer = load_figure_cache()
+# Ao subir e a cada versão nova do dataset (no-op nos demais reruns)
+precomputer.schedule(dataset)
+
+# Metadados desta versão para a próxima execução pintar a sidebar sem esperar a carga
+if startup is None or startup['version'] != list(dataset.version):
+    startup = views.startup_metadata(dataset)
+    write_metadata(DATA_PATH, startup)
+if filters is None:
+    filters = sidebar_filters(startup)
+    profiler.mark('first_paint')
+selection, time_view = filters
+
+# Gráficos interativos: o navegador desenha a partir de dados agregados, e
+# hover, zoom e pan não fazem rerun
+interactive_charts = st.sidebar.toggle(
+    "⚡ Gráficos interativos",
+    value=views.interactive_default(),
+    help="Desenhados no navegador a partir de dados agregados; desligado, os gráficos são imagens"
 )
 
-# Aplicar filtros
-df_filtered = df[
-    (df['decade'].isin(selected_decades)) &
-    (df['genre'].isin(selected_genres)) &
-    (df['mood_category'].isin(selected_moods))
-]
+# Aplicar filtros: o cubo responde os agregados e o índice devolve os
+# row ids, usados só onde as linhas individuais são necessárias
+with profiler.stage('filter'):
+    row_ids = filter_index.select(selection)
 
 st.sidebar.markdown("---")
-st.sidebar.info(f"📊 **{len(df_filtered):,}** músicas selecionadas de **{len(df):,}** totais")
+st.sidebar.info(f"📊 **{len(row_ids):,}** músicas selecionadas de **{len(df):,}** totais")
+
+# Chave da seleção atual no cache de gráficos
+selection_key = views.selection_key(dataset, selection)
+
+def show_chart(chart_id):
+    if interactive_charts:
+        with profiler.stage(f'chart:{chart_id}'):
+            chart = views.build_interactive_chart(chart_id, dataset, selection, row_ids, time_view)
+            if profiler.enabled:
+                from interactive import payload_bytes
+                profiler.annotate(payload_kb=round(payload_bytes(chart) / 1024, 1))
+            st.altair_chart(chart, width='stretch')
+        return
+
+    # Renderiza só quando a combinação (gráfico, filtros) não está no cache
+    # nem sendo renderizada em segundo plano
+    def build():
+        with profiler.stage(f'data:{chart_id}'):
+            args = views.chart_data(chart_id, dataset, selection, row_ids, time_view)
+        return views.CHARTS[chart_id][0](*args)
+
+    cache_id = views.cache_id(chart_id, time_view)
+    with profiler.stage(f'chart:{chart_id}'):
+        if profiler.enabled:
+            profiler.annotate(cache='hit' if (cache_id, selection_key) in figure_cache else 'miss')
+        st.image(prefetcher.get_or_render(cache_id, selection_key, build), width='stretch')
 
-# TABS PRINCIPAIS
-tab1, tab2, tab3, tab4 = st.tabs(["📊 Visão Geral", "🎭 Análise de Humor", "📈 Evolução Temática", "🔍 Insights Principais"])
+# TABS PRINCIPAIS: só o corpo da aba aberta roda em cada rerun
+tab1, tab2, tab3, tab4, tab5 = st.tabs(["📊 Visão Geral", "🎭 Análise de Humor", "📈 Evolução Temática",
+                                       "🔍 Insights Principais", "🎧 Músicas Parecidas"],
+                                      key='aba', on_change='rerun')
 
 # =============================================
 # TAB 1: VISÃO GERAL
 # =============================================
 with tab1:
-    # KPIs no topo
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        st.metric(
-            label="🎵 Total de Músicas",
-            value=f"{len(df_filtered):,}",
-            delta=f"{len(df_filtered)/len(df)*100:.1f}% do total"
-        )
-    
-    with col2:
-        n_artists = df_filtered['artist_name'].nunique()
-        st.metric(
-            label="👨‍🎤 Artistas Únicos",
-            value=f"{n_artists:,}"
-        )
-    
-    with col3:
-        n_genres = df_filtered['genre'].nunique()
-        st.metric(
-            label="🎸 Gêneros",
-            value=f"{n_genres}"
-        )
-    
-    with col4:
-        period = f"{int(df_filtered['decade'].min())}s-{int(df_filtered['decade'].max())}s"
-        st.metric(
-            label="📅 Período",
-            value=period
-        )
-    
-    st.markdown("---")
-    
-    # Gráficos principais
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        st.subheader("📊 Distribuição por Década")
-        
-        decade_counts = df_filtered['decade'].value_counts().sort_index()
-        
-        fig, ax = plt.subplots(figsize=(10, 6))
-        bars = ax.bar(decade_counts.index, decade_counts.values, 
-                      color='#667eea', edgecolor='black', linewidth=1.5, alpha=0.8)
-        
-        # Adicionar valores nas barras
-        for bar in bars:
-            height = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width()/2., height,
-                   f'{int(height)}',
-                   ha='center', va='bottom', fontweight='bold', fontsize=10)
-        
-        ax.set_xlabel('Década', fontsize=12, fontweight='bold')
-        ax.set_ylabel('Número de Músicas', fontsize=12, fontweight='bold')
-        ax.grid(True, alpha=0.3, axis='y')
-        plt.tight_layout()
-        st.pyplot(fig)
-    
-    with col2:
-        st.subheader("🎸 Top 10 Gêneros")
-        
-        top_genres = df_filtered['genre'].value_counts().head(10)
-        
-        fig, ax = plt.subplots(figsize=(10, 6))
-        colors = plt.cm.Spectral(np.linspace(0, 1, len(top_genres)))
-        bars = ax.barh(range(len(top_genres)), top_genres.values, color=colors, 
-                       edgecolor='black', linewidth=1.5)
-        
-        ax.set_yticks(range(len(top_genres)))
-        ax.set_yticklabels(top_genres.index, fontsize=11)
-        ax.set_xlabel('Número de Músicas', fontsize=12, fontweight='bold')
-        ax.invert_yaxis()
-        ax.grid(True, alpha=0.3, axis='x')
-        
-        # Adicionar valores
-        for i, (bar, val) in enumerate(zip(bars, top_genres.values)):
-            ax.text(val + 5, i, f'{val}', va='center', fontweight='bold', fontsize=10)
-        
-        plt.tight_layout()
-        st.pyplot(fig)
-    
-    st.markdown("---")
-    
-    # Audio Features Evolution
-    st.subheader("🎼 Evolução das Características Musicais")
+    if tab1.open:
+        with profiler.stage('tab1:metrics'):
+            metrics = views.overview_metrics(dataset, selection, row_ids)
+    
+        # KPIs no topo
+        col1, col2, col3, col4 = st.columns(4)
+    
+        with col1:
+            st.metric(
+                label="🎵 Total de Músicas",
+                value=f"{metrics['n_songs']:,}",
+                delta=f"{metrics['share']:.1f}% do total"
+            )
+    
+        with col2:
+            st.metric(
+                label="👨‍🎤 Artistas Únicos",
+                value=f"{metrics['n_artists']:,}"
+            )
+    
+        with col3:
+            st.metric(
+                label="🎸 Gêneros",
+                value=f"{metrics['n_genres']}"
+            )
+    
+        with col4:
+            first_decade, last_decade = metrics['period']
+            period = f"{int(first_decade)}s-{int(last_decade)}s"
+            st.metric(
+                label="📅 Período",
+                value=period
+            )
+    
+        st.markdown("---")
+    
+        # Gráficos principais
+        col1, col2 = st.columns(2)
+    
+        with col1:
+            st.subheader("📊 Distribuição por Década")
+            show_chart('decade_distribution')
+    
+        with col2:
+            st.subheader("🎸 Top 10 Gêneros")
+            show_chart('top_genres')
+    
+        st.markdown("---")
+    
+        # Audio Features Evolution
+        st.subheader("🎼 Evolução das Características Musicais")
+    
+        show_chart('features_evolution')
+
+# =============================================
+# TAB 2: ANÁLISE DE HUMOR
+# =============================================
+with tab2:
+    if tab2.open:
+        st.header("🎭 Mapa de Humor Musical")
+    
+        col1, col2 = st.columns([2, 1])
+    
+        with col1:
+            st.subheader("Valence × Energy: Quadrantes Emocionais")
+            show_chart('mood_scatter')
+            if len(row_ids) > charts.SCATTER_MAX_POINTS:
+                st.caption(f"Densidade de {len(row_ids):,} músicas agregadas em "
+                           f"{charts.DENSITY_BINS}×{charts.DENSITY_BINS} bins por humor")
+    
+        with col2:
+            st.subheader("📊 Distribuição de Humores")
+            show_chart('mood_pie')
+        
+            # Insight box, com os humores das músicas selecionadas
+            shares = views.mood_shares(dataset, selection)
+            if len(shares):
+                extremes = shares.get('Happy/Energetic', 0.0) + shares.get('Sad/Calm', 0.0)
+                mixed = shares.get('Peaceful/Content', 0.0) + shares.get('Angry/Tense', 0.0)
+                bimodal = round(extremes) > round(mixed)
+                st.markdown(f"""
+                <div class="insight-box">
+                <strong>💡 Insight:</strong><br>
+                {'Bimodalidade emocional! ' if bimodal else ''}~{extremes:.0f}% das músicas estão nos extremos 
+                (muito felizes ou muito tristes), enquanto {'apenas ' if bimodal else ''}~{mixed:.0f}% têm 
+                emoções "mistas" (peaceful/angry).
+                </div>
+                """, unsafe_allow_html=True)
+    
+        st.markdown("---")
+    
+        # Evolução dos moods por década
+        st.subheader("📈 Evolução dos Humores ao Longo das Décadas")
+        show_chart('mood_by_decade')
+
+# =============================================
+# TAB 3: EVOLUÇÃO TEMÁTICA
+# =============================================
+with tab3:
+    if tab3.open:
+        st.header("📈 Evolução dos Temas Musicais")
     
-    audio_features = ['danceability', 'energy', 'valence', 'acousticness']
-    features_by_decade = df_filtered.groupby('decade')[audio_features].mean()
+        col1, col2 = st.columns([2, 1])
     
-    fig, ax = plt.subplots(figsize=(14, 7))
+        with col1:
+            st.subheader("📊 Linha do Tempo dos Principais Temas")
+            show_chart('theme_timeline')
     
-    colors_features = ['#FF6B6B', '#4ECDC4', '#FFE66D', "#B28CE3"]
-    markers = ['o', 's', '^', 'D']
+        with col2:
+            st.subheader("🔺🔻 Variação Total")
+            show_chart('theme_variation')
     
-    for feature, color, marker in zip(audio_features, colors_features, markers):
-        ax.plot(features_by_decade.index, features_by_decade[feature],
-               marker=marker, linewidth=3, markersize=10, label=feature.capitalize(),
-               color=color, alpha=0.8)
+        st.markdown("---")
     
-    ax.set_xlabel('Década', fontsize=13, fontweight='bold')
-    ax.set_ylabel('Valor Médio (0-1)', fontsize=13, fontweight='bold')
-    ax.legend(loc='best', fontsize=12, frameon=True, shadow=True)
-    ax.grid(True, alpha=0.3)
-    ax.set_ylim(0, 1)
-    plt.tight_layout()
-    st.pyplot(fig)
+        # Heatmap
+        st.subheader("🌡️ Heatmap: Intensidade dos Temas por Década")
+        show_chart('theme_heatmap')
 
 # =============================================
-# TAB 2: ANÁLISE DE HUMOR
+# TAB 4: INSIGHTS PRINCIPAIS
 # =============================================
-with tab2:
-    st.header("🎭 Mapa de Humor Musical")
-    
-    col1, col2 = st.columns([2, 1])
+with tab4:
+    if tab4.open:
+        st.header("💡 Principais Descobertas")
+
+        # Números do corpus inteiro, recalculados do cubo a cada versão dos dados
+        with profiler.stage('tab4:insights'):
+            insights = views.theme_insights(dataset)
+        temas = insights['themes']
+        moods = insights['moods']
+        romantic, obscene = temas.loc['romantic'], temas.loc['obscene']
+        violence, sadness = temas.loc['violence'], temas.loc['sadness']
+        happy, sad = moods.get('Happy/Energetic', 0.0), moods.get('Sad/Calm', 0.0)
+        anos = int(romantic['last_decade'] - romantic['first_decade'] + 10)
+    
+        # Insight 1
+        st.markdown(f"""
+        ### 1. 💔 A Morte do Romance Clássico
     
-    with col1:
-        st.subheader("Valence × Energy: Quadrantes Emocionais")
-        
-        # Scatter plot dos moods
-        fig, ax = plt.subplots(figsize=(12, 10))
-        
-        colors_mood = {
-            'Happy/Energetic': '#FFD700',
-            'Angry/Tense': '#FF4444',
-            'Sad/Calm': '#4169E1',
-            'Peaceful/Content': '#90EE90'
-        }
-        
-        for mood, color in colors_mood.items():
-            mask = df_filtered['mood_category'] == mood
-            ax.scatter(df_filtered[mask]['valence'], 
-                      df_filtered[mask]['energy'],
-                      c=color, label=mood, alpha=0.6, s=30,
-                      edgecolors='black', linewidth=0.5)
-        
-        # Linhas de divisão
-        valence_median = df_filtered['valence'].median()
-        energy_median = df_filtered['energy'].median()
-        
-        ax.axhline(y=energy_median, color='black', linestyle='--', linewidth=2, alpha=0.5)
-        ax.axvline(x=valence_median, color='black', linestyle='--', linewidth=2, alpha=0.5)
-        
-        # Labels dos quadrantes
-        ax.text(0.75, 0.75, 'Happy/Energetic', fontsize=12, fontweight='bold',
-               ha='center', bbox=dict(boxstyle='round', facecolor='#FFD700', alpha=0.7))
-        ax.text(0.25, 0.75, 'Angry/Tense', fontsize=12, fontweight='bold',
-               ha='center', bbox=dict(boxstyle='round', facecolor='#FF4444', alpha=0.7))
-        ax.text(0.25, 0.25, 'Sad/Calm', fontsize=12, fontweight='bold',
-               ha='center', bbox=dict(boxstyle='round', facecolor='#4169E1', alpha=0.7))
-        ax.text(0.75, 0.25, 'Peaceful/Content', fontsize=12, fontweight='bold',
-               ha='center', bbox=dict(boxstyle='round', facecolor='#90EE90', alpha=0.7))
-        
-        ax.set_xlabel('Valence (Triste ← → Feliz)', fontsize=13, fontweight='bold')
-        ax.set_ylabel('Energy (Calmo ← → Energético)', fontsize=13, fontweight='bold')
-        ax.set_xlim(-0.05, 1.05)
-        ax.set_ylim(-0.05, 1.05)
-        ax.legend(loc='upper left', fontsize=11, frameon=True, shadow=True)
-        ax.grid(True, alpha=0.3)
-        plt.tight_layout()
-        st.pyplot(fig)
-    
-    with col2:
-        st.subheader("📊 Distribuição de Humores")
-        
-        mood_dist = df_filtered['mood_category'].value_counts()
-        
-        fig, ax = plt.subplots(figsize=(8, 8))
-        
-        colors_pie = [colors_mood[mood] for mood in mood_dist.index]
-        explode = [0.05] * len(mood_dist)
-        
-        wedges, texts, autotexts = ax.pie(
-            mood_dist,
-            labels=[f"{mood}\n({count:,})" for mood, count in mood_dist.items()],
-            autopct='%1.1f%%',
-            colors=colors_pie,
-            startangle=90,
-            explode=explode,
-            shadow=True,
-            textprops={'fontsize': 10, 'fontweight': 'bold'}
-        )
-        
-        for autotext in autotexts:
-            autotext.set_color('white')
-            autotext.set_fontsize(12)
-            autotext.set_fontweight('bold')
-        
-        plt.tight_layout()
-        st.pyplot(fig)
-        
-        # Insight box
-        st.markdown("""
         <div class="insight-box">
-        <strong>💡 Insight:</strong><br>
-        Bimodalidade emocional! ~60% das músicas estão nos extremos 
-        (muito felizes ou muito tristes), enquanto apenas ~40% têm 
-        emoções "mistas" (peaceful/angry).
+        O tema <strong>romântico</strong> {'despencou' if romantic['change_pct'] < 0 else 'subiu'} <strong>{abs(romantic['change_pct']):.0f}%</strong> em {anos} anos, saindo de {romantic['first'] * 100:.1f}% 
+        das músicas nos anos {int(romantic['first_decade'])} para {romantic['last'] * 100:.1f}% nos anos {int(romantic['last_decade'])}. 
+        <br><br>
+        <strong>Interpretação:</strong> Passamos de baladas idealizadas sobre amor eterno 
+        para abordagens mais realistas, cínicas ou sexualizadas. O amor mudou - e a música reflete isso.
         </div>
         """, unsafe_allow_html=True)
     
-    st.markdown("---")
+        # Insight 2
+        st.markdown(f"""
+        ### 2. 🔞 A Ascensão do Explícito
     
-    # Evolução dos moods por década
-    st.subheader("📈 Evolução dos Humores ao Longo das Décadas")
-    
-    mood_by_decade = pd.crosstab(df_filtered['decade'], 
-                                  df_filtered['mood_category'], 
-                                  normalize='index') * 100
-    
-    fig, ax = plt.subplots(figsize=(14, 7))
+        <div class="insight-box">
+        Conteúdo <strong>obsceno</strong> variou <strong>{obscene['change_pct']:+.0f}%</strong> e <strong>violência</strong> 
+        <strong>{violence['change_pct']:+.0f}%</strong>.
+        <br><br>
+        <strong>Interpretação:</strong> A música reflete uma sociedade menos reprimida, 
+        mas também mais confrontativa. Hip-Hop/Rap trouxe linguagem mais direta e 
+        sem filtros para o mainstream.
+        </div>
+        """, unsafe_allow_html=True)
     
-    mood_by_decade.plot(kind='bar', stacked=True, ax=ax,
-                       color=[colors_mood[m] for m in mood_by_decade.columns],
-                       edgecolor='black', linewidth=1.5, width=0.7)
+        # Insight 3
+        st.markdown(f"""
+        ### 3. 🎭 Bimodalidade Emocional
     
-    ax.set_xlabel('Década', fontsize=13, fontweight='bold')
-    ax.set_ylabel('Percentual (%)', fontsize=13, fontweight='bold')
-    ax.set_xticklabels(ax.get_xticklabels(), rotation=45, ha='right')
-    ax.legend(title='Mood Category', fontsize=11, title_fontsize=12)
-    ax.set_ylim(0, 100)
-    ax.grid(True, alpha=0.3, axis='y')
-    plt.tight_layout()
-    st.pyplot(fig)
-
-# =============================================
-# TAB 3: EVOLUÇÃO TEMÁTICA
-# =============================================
-with tab3:
-    st.header("📈 Evolução dos Temas Musicais")
-    
-    temas = ['romantic', 'obscene', 'violence', 'sadness', 'family/spiritual']
-    temas_por_decada = df_filtered.groupby('decade')[temas].mean()
+        <div class="insight-box">
+        Cerca de <strong>{happy + sad:.0f}%</strong> das músicas estão nos extremos emocionais: 
+        ou muito felizes/energéticas ({happy:.0f}%) ou muito tristes/calmas ({sad:.0f}%).
+        <br><br>
+        <strong>Interpretação:</strong> As pessoas buscam música principalmente para 
+        <strong>celebrar momentos alegres</strong> ou <strong>processar emoções difíceis</strong>. 
+        Estados emocionais "neutros" são menos procurados.
+        </div>
+        """, unsafe_allow_html=True)
     
-    # Calcular variações
-    primeira_decada = temas_por_decada.iloc[0]
-    ultima_decada = temas_por_decada.iloc[-1]
-    variacao = ((ultima_decada - primeira_decada) / primeira_decada * 100).sort_values(ascending=False)
+        # Insight 4
+        st.markdown(f"""
+        ### 4. 📉 Do Sentimentalismo ao Cinismo
     
-    col1, col2 = st.columns([2, 1])
+        <div class="insight-box">
+        Saímos de uma era sentimental (romance {romantic['first'] * 100:.0f}%, tristeza {sadness['first'] * 100:.0f}%) para uma era mais 
+        crua (obscenidade {obscene['last'] * 100:.0f}%, violência {violence['last'] * 100:.0f}%).
+        <br><br>
+        <strong>Interpretação:</strong> A música deixou de ser "escape da realidade" 
+        para ser "espelho da realidade". Menos idealização, mais autenticidade (ou cinismo).
+        </div>
+        """, unsafe_allow_html=True)
     
-    with col1:
-        st.subheader("📊 Linha do Tempo dos Principais Temas")
-        
-        fig, ax = plt.subplots(figsize=(14, 8))
-        
-        cores_temas = {
-            'romantic': '#FF69B4',
-            'obscene': '#DC143C',
-            'violence': '#8B0000',
-            'sadness': '#4169E1',
-            'family/spiritual': '#9370DB'
-        }
-        
-        for tema in temas:
-            ax.plot(temas_por_decada.index, temas_por_decada[tema],
-                   marker='o', linewidth=3, markersize=9,
-                   label=tema.upper(), color=cores_temas[tema], alpha=0.8)
-            
-            # Anotação no último ponto
-            ultimo_valor = temas_por_decada[tema].iloc[-1]
-            var_pct = variacao[tema]
-            ax.annotate(f'{var_pct:+.0f}%',
-                       xy=(temas_por_decada.index[-1], ultimo_valor),
-                       xytext=(10, 0), textcoords='offset points',
-                       fontsize=10, fontweight='bold',
-                       color=cores_temas[tema],
-                       bbox=dict(boxstyle='round', facecolor='white',
-                                edgecolor=cores_temas[tema], linewidth=2))
-        
-        ax.set_xlabel('Década', fontsize=13, fontweight='bold')
-        ax.set_ylabel('Intensidade Média', fontsize=13, fontweight='bold')
-        ax.legend(loc='best', fontsize=11, frameon=True, shadow=True)
-        ax.grid(True, alpha=0.3)
-        plt.tight_layout()
-        st.pyplot(fig)
-    
-    with col2:
-        st.subheader("🔺🔻 Variação Total")
-        
-        fig, ax = plt.subplots(figsize=(8, 8))
-        
-        cores_var = ['green' if x > 0 else 'red' for x in variacao]
-        bars = ax.barh(range(len(variacao)), variacao.values,
-                      color=cores_var, alpha=0.7,
-                      edgecolor='black', linewidth=2)
-        
-        ax.set_yticks(range(len(variacao)))
-        ax.set_yticklabels(variacao.index, fontsize=11, fontweight='bold')
-        ax.set_xlabel('Variação (%)', fontsize=12, fontweight='bold')
-        ax.axvline(x=0, color='black', linewidth=2)
-        ax.grid(True, alpha=0.3, axis='x')
-        
-        # Adicionar valores
-        for i, (val, bar) in enumerate(zip(variacao.values, bars)):
-            ax.text(val + (5 if val > 0 else -5), i, f'{val:+.0f}%',
-                   va='center', ha='left' if val > 0 else 'right',
-                   fontweight='bold', fontsize=10)
-        
-        plt.tight_layout()
-        st.pyplot(fig)
+        st.markdown("---")
     
-    st.markdown("---")
+        # Resumo em números
+        col1, col2, col3 = st.columns(3)
+        growth, decline = insights['growth'], insights['decline']
     
-    # Heatmap
-    st.subheader("🌡️ Heatmap: Intensidade dos Temas por Década")
+        with col1:
+               st.markdown(f"""
+        <div class="metric-card">
+          <h3 style="color: #FF6B6B;">🔺 Maior Crescimento</h3>
+          <h2 style="color: #FF6B6B;">{growth.name.capitalize()}</h2>
+          <p style="font-size: 1.5rem; font-weight: bold; color: #00C853;">{growth['change_pct']:+.0f}%</p>
+          <p>De {growth['first'] * 100:.1f}% → {growth['last'] * 100:.1f}% das músicas</p>
+        </div>
+        """, unsafe_allow_html=True)
     
-    fig, ax = plt.subplots(figsize=(14, 8))
+        with col2:
+             st.markdown(f"""
+        <div class="metric-card">
+          <h3 style="color: #4169E1;">🔻 Maior Declínio</h3>
+          <h2 style="color: #4169E1;">{decline.name.capitalize()}</h2>
+          <p style="font-size: 1.5rem; font-weight: bold; color: #FF5252;">{decline['change_pct']:+.0f}%</p>
+          <p>De {decline['first'] * 100:.1f}% → {decline['last'] * 100:.1f}% das músicas</p>
+        </div>
+        """, unsafe_allow_html=True)
+
     
-    sns.heatmap(temas_por_decada.T, annot=True, fmt='.3f',
-               cmap='YlOrRd', linewidths=2, linecolor='white',
-               cbar_kws={'label': 'Intensidade Média'}, ax=ax)
+        with col3:
+            dominant, runner_up = moods.index[0], moods.index[1] if len(moods) > 1 else None
+            st.markdown(f"""
+        <div class="metric-card">
+          <h3 style="color: #FFD700;">🎭 Mood Dominante</h3>
+          <h2 style="color: #FFD700;">{dominant}</h2>
+          <p style="font-size: 1.5rem; font-weight: bold;">~{moods.iloc[0]:.0f}%</p>
+          <p>{f'Seguido de {runner_up} ({moods.iloc[1]:.0f}%)' if runner_up else ''}</p>
+        </div>
+        """, unsafe_allow_html=True)
     
-    ax.set_xlabel('Década', fontsize=13, fontweight='bold')
-    ax.set_ylabel('Tema', fontsize=13, fontweight='bold')
-    plt.tight_layout()
-    st.pyplot(fig)
+        # Destaques de todos os recortes, da mesma tabela
+        with st.expander("🔎 Maiores variações por gênero e humor"):
+            columns = {'dimension': 'Recorte', 'value': 'Valor', 'theme': 'Tema',
+                       'first_decade': 'De', 'last_decade': 'Até', 'change_pct': 'Variação (%)'}
+            col1, col2 = st.columns(2)
+            with col1:
+                st.markdown("**Maiores altas**")
+                st.dataframe(insights['slice_growth'][list(columns)].rename(columns=columns).round(1),
+                             hide_index=True)
+            with col2:
+                st.markdown("**Maiores quedas**")
+                st.dataframe(insights['slice_decline'][list(columns)].rename(columns=columns).round(1),
+                             hide_index=True)
+    
+        st.markdown("---")
+    
+        # Conclusão
+        explicit = obscene['last'] / obscene['first'] if obscene['first'] else float('nan')
+        st.markdown(f"""
+        ### 🎯 Conclusão
+    
+        A análise de {anos} anos de música popular revela uma **transformação cultural profunda**:
+    
+        - 🎵 **Menos idealização, mais realidade**: Romance {'declinou' if romantic['change_pct'] < 0 else 'subiu'} {abs(romantic['change_pct']):.0f}%
+        - 🔓 **Liberalização cultural**: Conteúdo explícito foi de {obscene['first'] * 100:.1f}% para {obscene['last'] * 100:.1f}% das músicas ({explicit:.1f}×)
+        - ⚡ **Música mais crua**: Violência {'aumentou' if violence['change_pct'] > 0 else 'caiu'} {abs(violence['change_pct']):.0f}%
+        - 🎭 **Extremos emocionais**: {happy + sad:.0f}% das músicas são muito felizes ou muito tristes
+    
+        A música não apenas entretém - ela **espelha e documenta** as mudanças na sociedade.
+        """)
 
 # =============================================
-# TAB 4: INSIGHTS PRINCIPAIS
+# TAB 5: MÚSICAS PARECIDAS
 # =============================================
-with tab4:
-    st.header("💡 Principais Descobertas")
-    
-    # Insight 1
-    st.markdown("""
-    ### 1. 💔 A Morte do Romance Clássico
-    
-    <div class="insight-box">
-    O tema <strong>romântico</strong> despencou <strong>77%</strong> em 70 anos, saindo de 12.1% 
-    das músicas nos anos 50 para apenas 2.8% nos anos 2010. 
-    <br><br>
-    <strong>Interpretação:</strong> Passamos de baladas idealizadas sobre amor eterno 
-    para abordagens mais realistas, cínicas ou sexualizadas. O amor mudou - e a música reflete isso.
-    </div>
-    """, unsafe_allow_html=True)
-    
-    # Insight 2
-    st.markdown("""
-    ### 2. 🔞 A Ascensão do Explícito
-    
-    <div class="insight-box">
-    Conteúdo <strong>obsceno</strong> aumentou <strong>+178%</strong> e <strong>violência</strong> 
-    cresceu <strong>+144%</strong>.
-    <br><br>
-    <strong>Interpretação:</strong> A música reflete uma sociedade menos reprimida, 
-    mas também mais confrontativa. Hip-Hop/Rap trouxe linguagem mais direta e 
-    sem filtros para o mainstream.
-    </div>
-    """, unsafe_allow_html=True)
-    
-    # Insight 3
-    st.markdown("""
-    ### 3. 🎭 Bimodalidade Emocional
-    
-    <div class="insight-box">
-    Cerca de <strong>60%</strong> das músicas estão nos extremos emocionais: 
-    ou muito felizes/energéticas (30%) ou muito tristes/calmas (30%).
-    <br><br>
-    <strong>Interpretação:</strong> As pessoas buscam música principalmente para 
-    <strong>celebrar momentos alegres</strong> ou <strong>processar emoções difíceis</strong>. 
-    Estados emocionais "neutros" são menos procurados.
-    </div>
-    """, unsafe_allow_html=True)
-    
-    # Insight 4
-    st.markdown("""
-    ### 4. 📉 Do Sentimentalismo ao Cinismo
-    
-    <div class="insight-box">
-    Saímos de uma era sentimental (romance 12%, tristeza 14%) para uma era mais 
-    crua (obscenidade 16%, violência 14%).
-    <br><br>
-    <strong>Interpretação:</strong> A música deixou de ser "escape da realidade" 
-    para ser "espelho da realidade". Menos idealização, mais autenticidade (ou cinismo).
-    </div>
-    """, unsafe_allow_html=True)
-    
-    st.markdown("---")
-    
-    # Resumo em números
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-           st.markdown("""
-    <div class="metric-card">
-      <h3 style="color: #FF6B6B;">🔺 Maior Crescimento</h3>
-      <h2 style="color: #FF6B6B;">Obscene</h2>
-      <p style="font-size: 1.5rem; font-weight: bold; color: #00C853;">+178%</p>
-      <p>De 5.7% → 16% das músicas</p>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    with col2:
-         st.markdown("""
-    <div class="metric-card">
-      <h3 style="color: #4169E1;">🔻 Maior Declínio</h3>
-      <h2 style="color: #4169E1;">Romantic</h2>
-      <p style="font-size: 1.5rem; font-weight: bold; color: #FF5252;">-77%</p>
-      <p>De 12.1% → 2.8% das músicas</p>
-    </div>
-    """, unsafe_allow_html=True)
-
-    
-    with col3:
-        st.markdown("""
-    <div class="metric-card">
-      <h3 style="color: #FFD700;">🎭 Mood Dominante</h3>
-      <h2 style="color: #FFD700;">Happy/Energetic</h2>
-      <p style="font-size: 1.5rem; font-weight: bold;">~30%</p>
-      <p>Empatado com Sad/Calm</p>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    st.markdown("---")
-    
-    # Conclusão
-    st.markdown("""
-    ### 🎯 Conclusão
-    
-    A análise de 70 anos de música popular revela uma **transformação cultural profunda**:
-    
-    - 🎵 **Menos idealização, mais realidade**: Romance e poesia declinaram
-    - 🔓 **Liberalização cultural**: Conteúdo explícito triplicou
-    - ⚡ **Música mais crua**: Violência e confronto aumentaram
-    - 🎭 **Extremos emocionais**: Público busca catarse (felicidade ou tristeza intensa)
-    
-    A música não apenas entretém - ela **espelha e documenta** as mudanças na sociedade.
-    """)
+with tab5:
+    if tab5.open:
+        st.header("🎧 Encontrar Músicas Parecidas")
+        st.markdown("Músicas mais próximas nas características de áudio e nos temas das letras.")
+
+        query_text = st.text_input("🔎 Buscar por música ou artista")
+        if query_text:
+            with profiler.stage('tab5:find'):
+                matches = views.find_songs(dataset, query_text)
+            if matches.empty:
+                st.info("Nenhuma música encontrada.")
+            else:
+                col1, col2 = st.columns([3, 1])
+                with col1:
+                    song = st.selectbox(
+                        "🎵 Música",
+                        options=matches.index,
+                        format_func=lambda row: (f"{matches.at[row, 'track_name']} — "
+                                                 f"{matches.at[row, 'artist_name']} "
+                                                 f"({matches.at[row, 'genre']}, {matches.at[row, 'decade']}s)")
+                    )
+                with col2:
+                    n_similar = st.slider("Quantidade", min_value=5, max_value=50, value=10)
+                only_selected = st.checkbox("Só entre as músicas dos filtros", value=True)
+
+                # O índice é montado (ou aberto do cache) na primeira busca
+                with st.spinner("Buscando músicas parecidas..."), profiler.stage('tab5:similar'):
+                    start = time.perf_counter()
+                    similar = views.similar_songs(dataset, song, n_similar,
+                                                  row_ids if only_selected else None)
+                    elapsed_ms = (time.perf_counter() - start) * 1000
+                columns = {'track_name': 'Música', 'artist_name': 'Artista', 'genre': 'Gênero',
+                           'decade': 'Década', 'mood_category': 'Humor', 'distance': 'Distância'}
+                st.dataframe(similar.rename(columns=columns).round({'Distância': 3}), hide_index=True)
+                st.caption(f"{len(similar)} músicas em {elapsed_ms:.1f} ms "
+                           f"(busca aproximada entre {len(row_ids) if only_selected else len(df):,})")
+
+# Gráficos das abas fechadas: renderizados em segundo plano para a seleção
+# atual; o que ainda está na fila para seleções anteriores é descartado
+prefetched = st.session_state.get('prefetched', [])
+prefetcher.cancel(future for key, future in prefetched if key != selection_key)
+prefetched = [(key, future) for key, future in prefetched if key == selection_key]
+for tab, chart_ids in zip((tab1, tab2, tab3), views.TABS.values()):
+    # Gráficos interativos não passam pelo cache de imagens
+    if tab.open or interactive_charts:
+        continue
+    for chart_id in chart_ids:
+        future = prefetcher.submit(views.cache_id(chart_id, time_view), selection_key,
+                                   lambda chart_id=chart_id: views.build_chart(
+                                       chart_id, dataset, selection, row_ids, time_view))
+        if future is not None:
+            prefetched.append((selection_key, future))
+st.session_state['prefetched'] = [(key, future) for key, future in prefetched if not future.done()]
 
 # FOOTER
 st.markdown("---")
@@ -580,4 +546,15 @@ st.markdown("""
     <p><strong>🎵 Dashboard de Análise Musical</strong></p>
     <p>Dados: Kaggle Music Dataset (1950-2019) | Desenvolvido com Streamlit & Python</p>
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+# Painel de profiling (só quando ligado) e log da execução
+if profiler.enabled:
+    total = profiler.finish()
+    with st.sidebar.expander(f"⏱️ Profiling: {total['wall_ms']:.0f} ms nesta execução"):
+        st.dataframe(profiler.summary(), hide_index=True)
+        st.caption(f"Cache de gráficos: {figure_cache.hits} hits, {figure_cache.misses} misses. "
+                   f"Pré-cálculo: {precomputer.total - precomputer.pending}/{precomputer.total} gráficos. "
+                   "Pico = memória alocada durante a etapa (tracemalloc).")
+    profiler.write_log(selection=normalize_selection(selection), rows=len(row_ids),
+                       dataset_version=dataset.version)
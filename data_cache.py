@@ -0,0 +1,419 @@
+"""
+Cache colunar em disco para o dataset do dashboard.
+
+O CSV é lido uma única vez e o resultado, já com as colunas derivadas
+(`decade` e `mood_category`), é gravado em Arrow IPC (Feather v2) sem
+compressão. Assim o arquivo pode ser aberto com memory map e cada coluna
+é lida sem cópia, o que torna o cold start de um novo processo quase
+instantâneo.
+
+O cache é identificado pelo hash SHA-256 do CSV de origem; o mtime e o
+tamanho do arquivo servem de atalho para não recalcular o hash a cada
+inicialização.
+
+Músicas novas entram como segmentos Arrow adicionais (`append_segment`),
+listados no índice junto da base; a leitura concatena base e segmentos
+sem copiar. Se o próprio CSV mudar, o cache é refeito do zero e os
+segmentos antigos são descartados.
+
+Para o frame inteiro, base e segmentos são juntados uma vez por versão
+num snapshot de um único record batch (`load_snapshot`), que todos os
+processos da máquina abrem com memory map sem copiar nenhuma coluna.
+
+As colunas são gravadas em tipos compactos (`compact_table`): float32
+para as características e temas, que ficam em [0, 1], e int16 para a
+década. Na leitura, as colunas de poucos valores viram categóricas e as
+de texto livre continuam como strings do Arrow.
+"""
+import glob
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+
+from mood import MOOD_CATEGORIES, classify_csv, classify_moods
+
+CACHE_DIR = '.cache'
+INDEX_FILE = 'index.json'
+FINGERPRINT_KEYS = ('sha256', 'mtime_ns', 'size')
+# Versão do layout dos arquivos; caches de outra versão são convertidos
+CACHE_FORMAT = 2
+SNAPSHOT_FILE = 'snap.arrow'
+
+# Colunas numéricas do dataset (características de áudio e temas das letras)
+AUDIO_FEATURES = ['danceability', 'energy', 'valence', 'acousticness',
+                  'loudness', 'instrumentalness']
+TEMAS = [
+    'dating', 'violence', 'world/life', 'night/time',
+    'shake the audience', 'family/gospel', 'romantic',
+    'communication', 'obscene', 'music', 'movement/places',
+    'light/visual perceptions', 'family/spiritual',
+    'like/girls', 'sadness', 'feelings'
+]
+
+# Tipos compactos (ver `compact_table` e `load_frame`)
+FLOAT32_COLUMNS = AUDIO_FEATURES + TEMAS + ['age']
+INT16_COLUMNS = ['decade']
+CATEGORY_COLUMNS = ['genre', 'topic', 'mood_category']
+
+
+def years_of(df):
+    """
+    Ano de lançamento de cada linha (float; NaN quando desconhecido)
+    """
+    if 'release_date' in df.columns:
+        dates = df['release_date']
+        if not pd.api.types.is_numeric_dtype(dates):
+            dates = pd.to_datetime(dates, errors='coerce')
+        if pd.api.types.is_datetime64_any_dtype(dates):
+            dates = dates.dt.year
+    elif 'year' in df.columns:
+        dates = pd.to_numeric(df['year'], errors='coerce')
+    else:
+        raise ValueError("Dataset não tem coluna de data/ano!")
+    return dates.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def add_decade(df):
+    """
+    Cria a coluna `decade` a partir da data de lançamento ou do ano, com
+    os mesmos anos de `years_of` (uma data numérica já é o ano)
+    """
+    if 'decade' not in df.columns:
+        years = years_of(df)
+        if 'release_date' in df.columns and not pd.api.types.is_numeric_dtype(df['release_date']):
+            df['release_date'] = pd.to_datetime(df['release_date'], errors='coerce')
+        decades = years // 10 * 10
+        # Inteira quando não há anos desconhecidos, para virar int16 no cache
+        df['decade'] = decades if np.isnan(decades).any() else decades.astype(np.int64)
+    return df
+
+
+def add_derived_columns(df):
+    """
+    Cria as colunas `decade` e `mood_category` quando não existem no frame
+    """
+    add_decade(df)
+
+    # Humor a partir das medianas globais de valence e energy
+    if 'mood_category' not in df.columns:
+        df['mood_category'] = classify_moods(df['valence'], df['energy'],
+                                             df['valence'].median(), df['energy'].median())
+    return df
+
+
+def compact_table(table):
+    """
+    Tabela com as colunas numéricas nos tipos compactos. Colunas que não
+    são do tipo esperado (ex.: década com nulos, em float) ficam como estão.
+    """
+    for name in FLOAT32_COLUMNS + INT16_COLUMNS:
+        if name not in table.column_names:
+            continue
+        field = table.schema.field(name)
+        if name in INT16_COLUMNS and pa.types.is_integer(field.type):
+            target = pa.int16()
+        elif name in FLOAT32_COLUMNS and pa.types.is_floating(field.type):
+            target = pa.float32()
+        else:
+            continue
+        # Arredondar para float32 é esperado; um inteiro fora do int16 levanta erro
+        column = pc.cast(table[name], target, safe=target != pa.float32())
+        table = table.set_column(table.schema.get_field_index(name), field.with_type(target), column)
+    return table
+
+
+def _sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_index(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, INDEX_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_index(cache_dir, index):
+    tmp = os.path.join(cache_dir, INDEX_FILE + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=1)
+    os.replace(tmp, os.path.join(cache_dir, INDEX_FILE))
+
+
+def source_fingerprint(csv_path, cache_dir=CACHE_DIR):
+    """
+    Retorna {'sha256', 'mtime_ns', 'size'} do CSV de origem.
+
+    Se mtime e tamanho batem com o último registro do índice, o hash
+    guardado é reutilizado sem reler o arquivo.
+    """
+    stat = os.stat(csv_path)
+    known = _read_index(cache_dir).get(os.path.abspath(csv_path))
+    if known and known['mtime_ns'] == stat.st_mtime_ns and known['size'] == stat.st_size:
+        return {k: known[k] for k in FINGERPRINT_KEYS}
+    return {'sha256': _sha256(csv_path), 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+
+def _prefix(csv_path, fingerprint, cache_dir):
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(cache_dir, f"{stem}-{fingerprint['sha256'][:16]}")
+
+
+def cache_path(csv_path, fingerprint, cache_dir=CACHE_DIR):
+    return _prefix(csv_path, fingerprint, cache_dir) + '.arrow'
+
+
+def build_cache(csv_path, cache_dir=CACHE_DIR, fingerprint=None):
+    """
+    Lê o CSV em chunks, deriva as colunas e grava o cache Arrow (sem
+    compressão, o que permite leitura zero-copy). Retorna o caminho.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    if fingerprint is None:
+        fingerprint = source_fingerprint(csv_path, cache_dir)
+
+    path = cache_path(csv_path, fingerprint, cache_dir)
+    tmp = path + '.tmp'
+    thresholds = classify_csv(csv_path, tmp, prepare_chunk=add_decade, prepare_table=compact_table)
+    os.replace(tmp, path)
+
+    # Remover versões antigas do mesmo CSV (base, segmentos e agregados)
+    key = os.path.abspath(csv_path)
+    index = _read_index(cache_dir)
+    old = index.get(key)
+    if old and old['sha256'] != fingerprint['sha256']:
+        for old_path in glob.glob(glob.escape(_prefix(csv_path, old, cache_dir)) + '.*'):
+            os.remove(old_path)
+    index[key] = dict(fingerprint, mood_thresholds=thresholds, segments=[], format=CACHE_FORMAT)
+    _write_index(cache_dir, index)
+    return path
+
+
+def _upgrade_cache(csv_path, cache_dir, fingerprint, entry):
+    # Cache de um layout anterior: a base é refeita do CSV e os segmentos
+    # (músicas que só existem no cache) são convertidos, não descartados
+    path = build_cache(csv_path, cache_dir, fingerprint)
+    for name in entry['segments']:
+        segment = os.path.join(cache_dir, name)
+        table = compact_table(feather.read_table(segment, memory_map=False))
+        feather.write_feather(table, segment + '.tmp', compression='uncompressed')
+        os.replace(segment + '.tmp', segment)
+    # Limiares congelados continuam valendo para os lotes seguintes; o cubo
+    # persistido é recalculado a partir dos valores compactos
+    fields = {'segments': entry['segments']}
+    if entry.get('mood_thresholds') is not None:
+        fields['mood_thresholds'] = entry['mood_thresholds']
+    update_entry(csv_path, cache_dir, **fields)
+    return path
+
+
+def ensure_cache(csv_path, cache_dir=CACHE_DIR):
+    """
+    Garante que existe um cache válido para o CSV e retorna seu caminho
+    """
+    fingerprint = source_fingerprint(csv_path, cache_dir)
+    path = cache_path(csv_path, fingerprint, cache_dir)
+    key = os.path.abspath(csv_path)
+    entry = _read_index(cache_dir).get(key)
+    if not os.path.exists(path) or entry is None or entry['sha256'] != fingerprint['sha256']:
+        return build_cache(csv_path, cache_dir, fingerprint)
+    if entry.get('format') != CACHE_FORMAT:
+        return _upgrade_cache(csv_path, cache_dir, fingerprint, entry)
+
+    # Arquivo tocado mas com o mesmo conteúdo: só atualizar o índice
+    if any(entry[k] != fingerprint[k] for k in FINGERPRINT_KEYS):
+        update_entry(csv_path, cache_dir, **fingerprint)
+    return path
+
+
+def cache_entry(csv_path, cache_dir=CACHE_DIR):
+    """
+    Registro do índice para o CSV (fingerprint, limiares de humor, segmentos)
+    """
+    ensure_cache(csv_path, cache_dir)
+    return _read_index(cache_dir)[os.path.abspath(csv_path)]
+
+
+def update_entry(csv_path, cache_dir=CACHE_DIR, **fields):
+    key = os.path.abspath(csv_path)
+    index = _read_index(cache_dir)
+    index[key] = dict(index[key], **fields)
+    _write_index(cache_dir, index)
+
+
+def store_version(csv_path, cache_dir=CACHE_DIR):
+    """
+    (hash do CSV, número de segmentos acrescentados). Muda sempre que o
+    conteúdo visível do dataset muda.
+    """
+    entry = cache_entry(csv_path, cache_dir)
+    return entry['sha256'], len(entry['segments'])
+
+
+def store_paths(csv_path, cache_dir=CACHE_DIR):
+    """
+    Arquivos Arrow do dataset: a base gerada do CSV seguida dos segmentos
+    acrescentados por `append_segment`
+    """
+    entry = cache_entry(csv_path, cache_dir)
+    return [cache_path(csv_path, entry, cache_dir)] + \
+        [os.path.join(cache_dir, name) for name in entry['segments']]
+
+
+def aggregates_path(csv_path, name, cache_dir=CACHE_DIR):
+    """
+    Caminho para um arquivo auxiliar (agregados, índices) ligado ao cache
+    """
+    return _prefix(csv_path, cache_entry(csv_path, cache_dir), cache_dir) + f'.{name}'
+
+
+def read_table(csv_path, columns=None, cache_dir=CACHE_DIR, start=0):
+    """
+    Abre o cache com memory map e retorna uma pyarrow.Table com as colunas
+    pedidas. Os buffers apontam direto para o arquivo (zero-copy).
+    `start` pula os primeiros arquivos (base = 0, segmentos a partir de 1).
+    """
+    tables = [feather.read_table(path, columns=columns, memory_map=True)
+              for path in store_paths(csv_path, cache_dir)[start:]]
+    if len(tables) == 1:
+        return tables[0]
+    return pa.concat_tables(tables)
+
+
+def _encode_categories(table):
+    # Colunas de `CATEGORY_COLUMNS` como dicionário com os valores em ordem
+    # e índices do menor inteiro que cabe (viram categóricas no pandas)
+    for name in CATEGORY_COLUMNS:
+        if name not in table.column_names or pa.types.is_dictionary(table.schema.field(name).type):
+            continue
+        values = table[name].combine_chunks()
+        categories = pc.unique(values).drop_null()
+        categories = categories.take(pc.sort_indices(categories))
+        index_type = pa.int8() if len(categories) < 2 ** 7 else \
+            pa.int16() if len(categories) < 2 ** 15 else pa.int32()
+        indices = pc.index_in(values, value_set=categories).cast(index_type)
+        table = table.set_column(table.schema.get_field_index(name), name,
+                                 pa.DictionaryArray.from_arrays(indices, categories))
+    return table
+
+
+def load_frame(csv_path, columns=None, cache_dir=CACHE_DIR, start=0):
+    """
+    Mesmo que `read_table`, mas convertido para DataFrame, com as colunas
+    de `CATEGORY_COLUMNS` como categóricas. Cada arquivo tem vários record
+    batches, então as colunas numéricas são copiadas; para o frame inteiro
+    sem cópia, use `load_snapshot`.
+    """
+    table = read_table(csv_path, columns, cache_dir, start)
+    # Texto livre (letras, nomes) fica no Arrow pelo `str` padrão do pandas 3
+    return _encode_categories(table).to_pandas(split_blocks=True)
+
+
+def version_path(csv_path, name, cache_dir=CACHE_DIR):
+    """
+    Caminho de um arquivo derivado da versão atual do store (base + n
+    segmentos): `name` = 'snap.arrow' vira '<prefixo>.snap00003.arrow'
+    """
+    entry = cache_entry(csv_path, cache_dir)
+    stem, ext = os.path.splitext(name)
+    return _prefix(csv_path, entry, cache_dir) + f".{stem}{len(entry['segments']):05d}{ext}"
+
+
+def write_version(csv_path, name, write, cache_dir=CACHE_DIR):
+    """
+    Grava o arquivo `name` da versão atual com `write(caminho)` e apaga os
+    de versões anteriores. Retorna o caminho.
+    """
+    path = version_path(csv_path, name, cache_dir)
+    # Vários processos podem gravar a mesma versão ao mesmo tempo
+    tmp = f'{path}.{os.getpid()}.tmp'
+    write(tmp)
+    os.replace(tmp, path)
+
+    stem, ext = os.path.splitext(name)
+    prefix = _prefix(csv_path, cache_entry(csv_path, cache_dir), cache_dir)
+    for old_path in glob.glob(glob.escape(prefix) + f'.{stem}' + '[0-9]' * 5 + ext):
+        if old_path != path:
+            try:
+                os.remove(old_path)
+            except OSError:
+                # Ainda mapeado por outro processo (Windows); fica para a próxima versão
+                pass
+    return path
+
+
+def _write_single_batch(table, path):
+    # Um único record batch: cada coluna vira um buffer contínuo no arquivo
+    feather.write_feather(table, path, compression='uncompressed',
+                          chunksize=max(table.num_rows, 1))
+
+
+def load_snapshot(csv_path, cache_dir=CACHE_DIR):
+    """
+    Frame inteiro (base + segmentos) lido do snapshot com memory map. Com
+    um único record batch, as colunas numéricas, as strings e os códigos
+    das categóricas são views somente leitura do arquivo: processos na
+    mesma máquina dividem as mesmas páginas do page cache, e cada processo
+    a mais custa só os objetos do pandas.
+    """
+    path = version_path(csv_path, SNAPSHOT_FILE, cache_dir)
+    if not os.path.exists(path):
+        # Base + segmentos juntados uma vez por versão, por quem chegar primeiro
+        table = _encode_categories(read_table(csv_path, cache_dir=cache_dir)).combine_chunks()
+        path = write_version(csv_path, SNAPSHOT_FILE, lambda tmp: _write_single_batch(table, tmp),
+                             cache_dir)
+        del table
+    return feather.read_table(path, memory_map=True).to_pandas(split_blocks=True)
+
+
+def mood_thresholds(csv_path, cache_dir=CACHE_DIR):
+    """
+    Medianas de valence/energy usadas para classificar o humor. Ficam
+    congeladas no índice para que lotes novos usem os mesmos quadrantes.
+    """
+    entry = cache_entry(csv_path, cache_dir)
+    if entry.get('mood_thresholds') is None:
+        # CSV já vinha com mood_category: calcular uma vez a partir da base
+        base = feather.read_table(cache_path(csv_path, entry, cache_dir),
+                                  columns=['valence', 'energy'], memory_map=True)
+        thresholds = {col: float(base[col].to_pandas().median()) for col in base.column_names}
+        update_entry(csv_path, cache_dir, mood_thresholds=thresholds)
+        return thresholds
+    return entry['mood_thresholds']
+
+
+def append_segment(csv_path, batch, cache_dir=CACHE_DIR):
+    """
+    Grava um lote (já com `decade` e `mood_category`) como novo segmento
+    Arrow, com o mesmo schema da base. Não reescreve nada do que já existe.
+    Retorna o lote como foi gravado (pyarrow.Table).
+    """
+    entry = cache_entry(csv_path, cache_dir)
+    base = cache_path(csv_path, entry, cache_dir)
+    with pa.memory_map(base) as source:
+        schema = pa.ipc.open_file(source).schema
+
+    for name in schema.names:
+        if name not in batch.columns:
+            batch[name] = None
+    table = pa.Table.from_pandas(batch[schema.names], schema=schema, preserve_index=False)
+
+    name = os.path.basename(_prefix(csv_path, entry, cache_dir)) + \
+        f".seg{len(entry['segments']) + 1:05d}.arrow"
+    path = os.path.join(cache_dir, name)
+    tmp = path + '.tmp'
+    feather.write_feather(table, tmp, compression='uncompressed')
+    os.replace(tmp, path)
+    update_entry(csv_path, cache_dir, segments=entry['segments'] + [name])
+    return table
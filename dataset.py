@@ -0,0 +1,277 @@
+"""
+Dataset do dashboard com suas estruturas derivadas.
+
+Reúne o frame lido do cache colunar, o cubo de agregados, o índice dos
+filtros, os sketches de quantis e de contagem, as somas por ano das
+séries temporais e, sob demanda, o índice de músicas parecidas.
+`refresh()` compara a versão do store com a carregada: segmentos novos
+são aplicados de forma incremental em cópias do cubo, dos índices, dos
+sketches e das somas por ano (O(lote)), e a nova `DatasetVersion`, com o
+snapshot da nova versão como frame, é publicada numa atribuição só; um
+CSV diferente provoca um recarregamento completo.
+
+O frame é uma view somente leitura do snapshot em memory map, dividida
+por todas as sessões do processo e pelas páginas do page cache entre
+processos. As sessões trabalham com row ids do índice, nunca com cópias
+filtradas do frame.
+"""
+import copy
+import os
+import threading
+
+import data_cache
+from count_sketches import CountSketches
+from cube import AggregateCube
+from filter_index import FilterIndex
+from similarity import SimilarityIndex
+from sketches import CellDigests
+from time_buckets import YearCube
+
+CUBE_FILE = 'cube.npz'
+FILTER_INDEX_FILE = 'filters.arrow'
+DIGESTS_FILE = 'digests.npz'
+YEARS_FILE = 'years.npz'
+COUNTS_FILE = 'counts.npz'
+SIMILARITY_FILE = 'similarity.arrow'
+
+
+def load_cube(csv_path, cache_dir=data_cache.CACHE_DIR, df=None):
+    """
+    Cubo persistido ao lado do cache; reconstruído (e salvo) quando não
+    corresponde à versão atual do store
+    """
+    path = data_cache.aggregates_path(csv_path, CUBE_FILE, cache_dir)
+    _, n_segments = data_cache.store_version(csv_path, cache_dir)
+    entry = data_cache.cache_entry(csv_path, cache_dir)
+    if os.path.exists(path) and entry.get('cube_segments') == n_segments:
+        return AggregateCube.load(path)
+
+    if df is None:
+        df = data_cache.load_frame(csv_path, cache_dir=cache_dir)
+    cube = AggregateCube.from_frame(df)
+    save_cube(csv_path, cube, n_segments, cache_dir)
+    return cube
+
+
+def save_cube(csv_path, cube, n_segments, cache_dir=data_cache.CACHE_DIR):
+    path = data_cache.aggregates_path(csv_path, CUBE_FILE, cache_dir)
+    tmp = path + '.tmp.npz'
+    cube.save(tmp)
+    os.replace(tmp, path)
+    data_cache.update_entry(csv_path, cache_dir, cube_segments=n_segments)
+
+
+def load_filter_index(csv_path, cache_dir=data_cache.CACHE_DIR, df=None):
+    """
+    Índice dos filtros da versão atual do store. O primeiro processo monta
+    e grava; todos (ele incluído) abrem o arquivo com memory map.
+    """
+    path = data_cache.version_path(csv_path, FILTER_INDEX_FILE, cache_dir)
+    if not os.path.exists(path):
+        if df is None:
+            df = data_cache.load_snapshot(csv_path, cache_dir)
+        path = data_cache.write_version(csv_path, FILTER_INDEX_FILE,
+                                        FilterIndex.from_frame(df).save, cache_dir)
+    return FilterIndex.load(path)
+
+
+def load_digests(csv_path, cache_dir=data_cache.CACHE_DIR, df=None):
+    """
+    Sketches da versão atual do store, montados uma vez e relidos do disco
+    pelos demais processos
+    """
+    path = data_cache.version_path(csv_path, DIGESTS_FILE, cache_dir)
+    if os.path.exists(path):
+        return CellDigests.load(path)
+    if df is None:
+        df = data_cache.load_snapshot(csv_path, cache_dir)
+    digests = CellDigests.from_frame(df)
+    data_cache.write_version(csv_path, DIGESTS_FILE, digests.save, cache_dir)
+    return digests
+
+
+def load_counts(csv_path, cache_dir=data_cache.CACHE_DIR, df=None):
+    """
+    Distintos e top-k de artistas e tópicos da versão atual do store
+    """
+    path = data_cache.version_path(csv_path, COUNTS_FILE, cache_dir)
+    if os.path.exists(path):
+        return CountSketches.load(path)
+    if df is None:
+        df = data_cache.load_snapshot(csv_path, cache_dir)
+    counts = CountSketches.from_frame(df)
+    data_cache.write_version(csv_path, COUNTS_FILE, counts.save, cache_dir)
+    return counts
+
+
+def load_years(csv_path, cache_dir=data_cache.CACHE_DIR, df=None):
+    """
+    Somas por ano da versão atual do store, ou None se o dataset não tem
+    data de lançamento nem ano (aí as séries ficam só por década)
+    """
+    path = data_cache.version_path(csv_path, YEARS_FILE, cache_dir)
+    if os.path.exists(path):
+        return YearCube.load(path)
+    if df is None:
+        df = data_cache.load_snapshot(csv_path, cache_dir)
+    try:
+        years = YearCube.from_frame(df)
+    except ValueError:
+        return None
+    data_cache.write_version(csv_path, YEARS_FILE, years.save, cache_dir)
+    return years
+
+
+def load_similarity(csv_path, cache_dir=data_cache.CACHE_DIR, df=None):
+    """
+    Índice de músicas parecidas da versão atual do store, montado uma vez
+    e aberto com memory map por todos os processos
+    """
+    path = data_cache.version_path(csv_path, SIMILARITY_FILE, cache_dir)
+    if not os.path.exists(path):
+        if df is None:
+            df = data_cache.load_snapshot(csv_path, cache_dir)
+        path = data_cache.write_version(csv_path, SIMILARITY_FILE,
+                                        SimilarityIndex.from_frame(df).save, cache_dir)
+    return SimilarityIndex.load(path)
+
+
+class DatasetVersion:
+    """
+    Frame + cubo + índice + sketches + somas por ano de uma versão do
+    store. Não muda depois de publicada: `Dataset.refresh` monta outra.
+    """
+
+    def __init__(self, csv_path, cache_dir, version, df, cube, filter_index, digests, counts, years,
+                 similarity=None):
+        self.csv_path = csv_path
+        self.cache_dir = cache_dir
+        self.version = version
+        self.df = df
+        self.cube = cube
+        self.filter_index = filter_index
+        self.digests = digests
+        self.counts = counts
+        self.years = years
+        # Só a busca de músicas parecidas usa; montado no primeiro acesso
+        self._similarity = similarity
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, csv_path, cache_dir=data_cache.CACHE_DIR):
+        version = data_cache.store_version(csv_path, cache_dir)
+        df = data_cache.load_snapshot(csv_path, cache_dir)
+        return cls(csv_path, cache_dir, version, df,
+                   load_cube(csv_path, cache_dir, df),
+                   load_filter_index(csv_path, cache_dir, df),
+                   load_digests(csv_path, cache_dir, df),
+                   load_counts(csv_path, cache_dir, df),
+                   load_years(csv_path, cache_dir, df))
+
+    @property
+    def similarity(self):
+        """
+        Índice de músicas parecidas (`SimilarityIndex`), carregado sob demanda
+        """
+        if self._similarity is None:
+            with self._lock:
+                if self._similarity is None:
+                    self._similarity = load_similarity(self.csv_path, self.cache_dir, self.df)
+        return self._similarity
+
+    def appended(self, version, batch):
+        """
+        Nova versão com `batch` (os segmentos ainda não vistos) aplicado em
+        cópias das estruturas, em O(lote)
+        """
+        # Cubo e somas por ano são pequenos e copiados inteiros; os `append`
+        # do índice e dos sketches só trocam atributos, então uma cópia rasa
+        # basta e os arrays em memory map continuam compartilhados
+        structures = {'cube': copy.deepcopy(self.cube), 'years': copy.deepcopy(self.years),
+                      'filter_index': copy.copy(self.filter_index),
+                      'digests': copy.copy(self.digests), 'counts': copy.copy(self.counts),
+                      'similarity': copy.copy(self._similarity)}
+        for structure in structures.values():
+            if structure is not None:
+                structure.append(batch)
+        # O snapshot da nova versão é gravado por um processo e mapeado pelos
+        # demais, em vez de cada um concatenar sua cópia
+        df = data_cache.load_snapshot(self.csv_path, self.cache_dir)
+        return DatasetVersion(self.csv_path, self.cache_dir, version, df, **structures)
+
+
+class Dataset:
+    """
+    A versão mais recente (`DatasetVersion`) de um CSV, mantida em
+    sincronia com o store em disco. Os atributos delegam para ela; quem lê
+    várias estruturas de uma vez deve usar `snapshot()`, para que um
+    `refresh` no meio não misture versões.
+    """
+
+    def __init__(self, csv_path, cache_dir=data_cache.CACHE_DIR):
+        self.csv_path = csv_path
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self._current = DatasetVersion.load(csv_path, cache_dir)
+
+    def snapshot(self):
+        """
+        Versão atual, que não muda mesmo se outra sessão chamar `refresh`
+        """
+        return self._current
+
+    @property
+    def version(self):
+        return self._current.version
+
+    @property
+    def df(self):
+        return self._current.df
+
+    @property
+    def cube(self):
+        return self._current.cube
+
+    @property
+    def filter_index(self):
+        return self._current.filter_index
+
+    @property
+    def digests(self):
+        return self._current.digests
+
+    @property
+    def counts(self):
+        return self._current.counts
+
+    @property
+    def years(self):
+        return self._current.years
+
+    @property
+    def similarity(self):
+        return self._current.similarity
+
+    def refresh(self):
+        """
+        Aplica o que mudou no store desde a última carga. Retorna True se
+        o dataset mudou.
+        """
+        if data_cache.store_version(self.csv_path, self.cache_dir) == self.version:
+            return False
+
+        with self._lock:
+            current = self._current
+            version = data_cache.store_version(self.csv_path, self.cache_dir)
+            if version == current.version:
+                return False
+            if version[0] != current.version[0]:
+                self._current = DatasetVersion.load(self.csv_path, self.cache_dir)
+                return True
+
+            # Só os segmentos ainda não vistos (base = 0, segmentos a partir de 1).
+            # Tudo é montado fora da versão publicada e trocado numa atribuição só
+            batch = data_cache.load_frame(self.csv_path, cache_dir=self.cache_dir,
+                                          start=current.version[1] + 1)
+            self._current = current.appended(version, batch)
+            return True
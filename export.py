@@ -0,0 +1,258 @@
+"""
+Exportação em lote dos gráficos do dashboard, sem Streamlit.
+
+Cada recorte (um filtro aplicado sobre a visão padrão, no mesmo formato
+de `DASHBOARD_PRESETS`) vira uma pasta com os gráficos das abas em PNG
+e/ou SVG e uma página HTML que junta todos. Os recortes são divididos
+entre processos com o backend Agg; cada processo abre o `Dataset` uma
+vez (cubo, índice e sketches em memory map) e todos os recortes usam os
+mesmos agregados. Recortes repetidos são exportados uma vez só, e cada
+gráfico é desenhado uma vez para todos os formatos.
+
+Uso:
+    python export.py music_com_decade.csv --slices '[{}, {"genre": ["rock"]}]'
+    python export.py music_com_decade.csv --each decade genre --formats png html
+    python export.py music_com_decade.csv --grid genre decade --workers 8 --output relatorios
+"""
+import argparse
+import base64
+import html
+import io
+import itertools
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+
+matplotlib.use('Agg')
+
+import data_cache
+import views
+from dataset import Dataset
+from figure_cache import SAVEFIG_OPTIONS, normalize_selection
+
+FORMATS = ('png', 'svg', 'html')
+DEFAULT_OUTPUT = 'relatorios'
+
+TAB_TITLES = {
+    'overview': "📊 Visão Geral",
+    'mood': "🎭 Análise de Humor",
+    'themes': "📈 Evolução Temática",
+}
+
+# Dataset aberto uma vez por processo do pool
+_dataset = None
+
+
+def slice_name(index, preset):
+    """
+    Nome da pasta do recorte: posição + filtros, só com caracteres seguros
+    """
+    parts = [f"{dim}-{'+'.join(str(v) for v in values)}" for dim, values in sorted(preset.items())]
+    name = re.sub(r'[^\w.+-]+', '_', '_'.join(parts) or 'todos')
+    return f'{index:04d}_{name}'[:120]
+
+
+def build_slices(options, presets=None, each=(), grid=()):
+    """
+    (nome, filtros, seleção completa) de cada recorte sem repetições: os
+    de `presets`, um por valor de cada dimensão de `each` e um por
+    combinação de valores das dimensões de `grid`
+    """
+    presets = list(presets if presets is not None else ([] if each or grid else [{}]))
+    presets += [{dim: [value]} for dim in each for value in options[dim]]
+    if grid:
+        presets += [{dim: [value] for dim, value in zip(grid, values)}
+                    for values in itertools.product(*(options[dim] for dim in grid))]
+
+    slices, seen = [], set()
+    for preset in presets:
+        selection = {**options, **preset}
+        key = normalize_selection(selection)
+        if key in seen:
+            continue
+        seen.add(key)
+        slices.append((slice_name(len(slices), preset), preset, selection))
+    return slices
+
+
+def _init_worker(csv_path, cache_dir):
+    global _dataset
+    _dataset = Dataset(csv_path, cache_dir)
+
+
+def _render(fig, formats):
+    # Uma renderização por formato da mesma figura; depois libera os artistas
+    rendered = {}
+    for fmt in formats:
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=fmt, **SAVEFIG_OPTIONS)
+        rendered[fmt] = buffer.getvalue()
+    fig.clear()
+    return rendered
+
+
+def _html_page(title, row_count, images):
+    # Página do recorte com os gráficos embutidos (SVG inline ou PNG em base64)
+    sections = []
+    for tab, chart_ids in views.TABS.items():
+        figures = []
+        for chart_id in chart_ids:
+            if chart_id not in images:
+                continue
+            fmt, data = images[chart_id]
+            if fmt == 'svg':
+                # Sem o prólogo XML, que não vale dentro do HTML
+                svg = data.decode()
+                figures.append(f"<figure>{svg[svg.index('<svg'):]}</figure>")
+            else:
+                encoded = base64.b64encode(data).decode()
+                figures.append(f'<figure><img src="data:image/png;base64,{encoded}" '
+                               f'alt="{chart_id}"></figure>')
+        if figures:
+            sections.append(f'<h2>{TAB_TITLES[tab]}</h2>\n' + '\n'.join(figures))
+    return f"""<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+<meta charset="utf-8">
+<title>{html.escape(title)}</title>
+<style>
+body {{ font-family: sans-serif; max-width: 1460px; margin: 2rem auto; }}
+figure {{ margin: 1rem 0; }}
+figure img, figure svg {{ max-width: 100%; height: auto; }}
+</style>
+</head>
+<body>
+<h1>🎵 {html.escape(title)}</h1>
+<p>{row_count:,} músicas</p>
+{chr(10).join(sections)}
+</body>
+</html>
+"""
+
+
+def export_slice(name, preset, selection, output, formats, chart_ids,
+                 time_view=views.DEFAULT_TIME_VIEW):
+    """
+    Exporta os gráficos de um recorte para `output/name`. Roda num
+    processo do pool. Retorna o resumo do recorte para o manifesto.
+    """
+    start = time.perf_counter()
+    directory = os.path.join(output, name)
+    os.makedirs(directory, exist_ok=True)
+    row_ids = _dataset.filter_index.select(selection)
+
+    image_formats = [fmt for fmt in formats if fmt != 'html']
+    # O HTML embute o SVG quando ele é exportado; senão, um PNG
+    embed = 'svg' if 'svg' in image_formats else 'png'
+    render_formats = image_formats or ([embed] if 'html' in formats else [])
+    images, files = {}, []
+    for chart_id in chart_ids:
+        fig = views.build_chart(chart_id, _dataset, selection, row_ids, time_view)
+        rendered = _render(fig, render_formats)
+        for fmt in image_formats:
+            path = os.path.join(directory, f'{chart_id}.{fmt}')
+            with open(path, 'wb') as f:
+                f.write(rendered[fmt])
+            files.append(os.path.relpath(path, output))
+        images[chart_id] = (embed, rendered[embed])
+
+    if 'html' in formats:
+        path = os.path.join(directory, 'index.html')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(_html_page(name, len(row_ids), images))
+        files.append(os.path.relpath(path, output))
+
+    return {'name': name, 'filters': preset, 'rows': int(len(row_ids)), 'files': files,
+            'seconds': round(time.perf_counter() - start, 3)}
+
+
+def _write_index(output, results):
+    # Manifesto (JSON) e página com um link por recorte
+    with open(os.path.join(output, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=1, default=str)
+    items = []
+    for result in results:
+        target = next((p for p in result['files'] if p.endswith('.html')), None) \
+            or (result['files'][0] if result['files'] else None)
+        label = html.escape(result['name'])
+        link = f'<a href="{html.escape(target)}">{label}</a>' if target else label
+        items.append(f"<li>{link} ({result['rows']:,} músicas)</li>")
+    with open(os.path.join(output, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write('<!DOCTYPE html>\n<html lang="pt-BR"><head><meta charset="utf-8">'
+                '<title>Relatórios</title></head><body>\n'
+                f'<h1>🎵 Relatórios por recorte</h1>\n<ul>\n{chr(10).join(items)}\n</ul>\n'
+                '</body></html>\n')
+
+
+def export(csv_path, slices, output=DEFAULT_OUTPUT, formats=('png', 'html'), chart_ids=None,
+           workers=None, cache_dir=data_cache.CACHE_DIR, time_view=views.DEFAULT_TIME_VIEW,
+           log=print):
+    """
+    Exporta `slices` (saída de `build_slices`) num pool de `workers`
+    processos. Retorna os resumos dos recortes, na ordem de `slices`.
+    """
+    chart_ids = list(chart_ids or views.CHARTS)
+    os.makedirs(output, exist_ok=True)
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(csv_path, cache_dir)) as pool:
+        futures = {pool.submit(export_slice, name, preset, selection, output, formats,
+                               chart_ids, time_view): name
+                   for name, preset, selection in slices}
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results[result['name']] = result
+            log(f"[{done}/{len(futures)}] {result['name']}: {result['rows']:,} músicas, "
+                f"{result['seconds']:.1f} s")
+    ordered = [results[name] for name, _, _ in slices]
+    _write_index(output, ordered)
+    return ordered
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta os gráficos do dashboard por recorte")
+    parser.add_argument('csv', nargs='?', default='music_com_decade.csv')
+    parser.add_argument('--slices', help="Lista JSON de filtros (ou arquivo com ela), como em "
+                                         "DASHBOARD_PRESETS; [{}] é a visão padrão")
+    parser.add_argument('--each', nargs='*', default=[], choices=('decade', 'genre', 'mood_category'),
+                        help="Um recorte para cada valor destas dimensões")
+    parser.add_argument('--grid', nargs='*', default=[], choices=('decade', 'genre', 'mood_category'),
+                        help="Um recorte para cada combinação de valores destas dimensões")
+    parser.add_argument('--formats', nargs='+', default=['png', 'html'], choices=FORMATS)
+    parser.add_argument('--charts', nargs='+', choices=list(views.CHARTS), help="Padrão: todos")
+    parser.add_argument('--time-view', default=views.DEFAULT_TIME_VIEW, choices=list(views.TIME_VIEWS))
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--cache-dir', default=data_cache.CACHE_DIR)
+    args = parser.parse_args()
+
+    presets = None
+    if args.slices:
+        text = args.slices
+        if os.path.exists(text):
+            with open(text, encoding='utf-8') as f:
+                text = f.read()
+        presets = json.loads(text)
+        if not isinstance(presets, list) or not all(isinstance(p, dict) for p in presets):
+            raise ValueError("--slices deve ser uma lista JSON de filtros")
+
+    # Monta (ou atualiza) o cache e as estruturas antes de abrir o pool,
+    # para os processos só mapearem os arquivos prontos
+    dataset = Dataset(args.csv, args.cache_dir)
+    slices = build_slices(views.filter_options(dataset), presets, args.each, args.grid)
+    del dataset
+
+    start = time.perf_counter()
+    results = export(args.csv, slices, args.output, args.formats, args.charts, args.workers,
+                     args.cache_dir, args.time_view)
+    elapsed = time.perf_counter() - start
+    n_files = sum(len(result['files']) for result in results)
+    print(f"✅ {len(results)} recortes, {n_files} arquivos em {args.output}/ ({elapsed:.1f} s)")
+
+
+if __name__ == '__main__':
+    main()
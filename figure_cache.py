@@ -0,0 +1,119 @@
+"""
+Cache dos gráficos já renderizados.
+
+Guarda os bytes (PNG ou SVG) de cada figura, identificados pelo id do
+gráfico e pela seleção de filtros normalizada. A figura matplotlib é
+descartada logo após a renderização; quando o total passa do orçamento
+em bytes, os itens usados há mais tempo saem primeiro (LRU).
+"""
+import io
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Mesmos parâmetros que o st.pyplot usa por padrão
+SAVEFIG_OPTIONS = {'bbox_inches': 'tight', 'dpi': 200}
+
+# Largura máxima que o st.image exibe. Acima dela ele decodifica, reduz e
+# recodifica o PNG a cada chamada (mesmo vindo do cache); reduzido aqui uma
+# vez, com a mesma reamostragem, o navegador recebe a mesma imagem
+MAX_WIDTH = 1460
+
+
+def normalize_selection(selection):
+    """
+    Chave hashable e independente da ordem dos valores escolhidos
+    """
+    return tuple(sorted(
+        (dim, None if values is None else tuple(sorted(values, key=str)))
+        for dim, values in (selection or {}).items()
+    ))
+
+
+def render_figure(fig, fmt='png', max_width=None):
+    """
+    Renderiza a figura em bytes e libera seus artistas. PNGs mais largos
+    que `max_width` são reduzidos proporcionalmente.
+    """
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=fmt, **SAVEFIG_OPTIONS)
+    fig.clear()
+    if fmt == 'png' and max_width:
+        return _fit_width(buffer.getvalue(), max_width)
+    return buffer.getvalue()
+
+
+def _fit_width(data, max_width):
+    image = Image.open(io.BytesIO(data))
+    if image.width <= max_width:
+        return data
+    height = int(1.0 * image.height * max_width / image.width)
+    buffer = io.BytesIO()
+    image.resize((max_width, height), resample=Image.BILINEAR).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class FigureCache:
+    """
+    LRU de bytes renderizados com limite total de `max_bytes`.
+    Seguro para uso simultâneo por várias sessões.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, fmt='png', max_width=MAX_WIDTH):
+        self.max_bytes = max_bytes
+        self.fmt = fmt
+        self.max_width = max_width
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key):
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+            return data
+
+    def put(self, key, data):
+        with self._lock:
+            if key in self._items:
+                self.size -= len(self._items.pop(key))
+            # Um item maior que o orçamento inteiro não é guardado
+            if len(data) > self.max_bytes:
+                return
+            self._items[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def get_or_render(self, chart_id, selection_key, build):
+        """
+        Bytes do gráfico `chart_id` para a seleção; `build()` só é chamado
+        (e a figura renderizada) quando não há entrada no cache
+        """
+        key = (chart_id, selection_key)
+        data = self.get(key)
+        if data is None:
+            with self._lock:
+                self.misses += 1
+            data = render_figure(build(), self.fmt, self.max_width)
+            self.put(key, data)
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.size = 0
@@ -0,0 +1,226 @@
+"""
+Índice categórico para os filtros multiselect do dashboard.
+
+Cada dimensão filtrável (`decade`, `genre`, `mood_category`) é guardada
+como códigos inteiros, e para cada valor existe a lista ordenada das
+linhas que o contêm (posting list). Uma seleção vira a união das listas
+da dimensão mais seletiva, seguida de uma interseção com as demais
+dimensões feita por lookup nos códigos, sem comparar strings.
+
+Lotes acrescentados depois da construção ganham posting lists próprias
+(um segmento por lote) e valores novos recebem os próximos códigos, então
+`append` custa O(lote) e não recodifica as linhas antigas.
+
+`save` grava códigos e posting lists num arquivo Arrow de um único record
+batch; `load` o abre com memory map, então processos que carregam o mesmo
+índice dividem as páginas em vez de cada um montar o seu.
+"""
+import json
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from cube import DIMS
+
+
+def _posting_lists(codes, n_categories, first_row=0):
+    # Linhas agrupadas por código; nulos (-1) ficam antes da posição offsets[0]
+    order = np.argsort(codes, kind='stable') + first_row
+    counts = np.bincount(codes[codes >= 0], minlength=n_categories)
+    offsets = np.concatenate([[0], np.cumsum(counts)]) + np.count_nonzero(codes < 0)
+    return order.astype(np.int64 if first_row + len(codes) >= 2 ** 31 else np.int32), offsets
+
+
+class FilterIndex:
+    """
+    Códigos e posting lists por dimensão. `select` devolve os row ids
+    (ordenados) das linhas que passam em todos os filtros.
+    """
+
+    def __init__(self, dims, categories, codes, segments):
+        self.dims = tuple(dims)
+        self.categories = [np.asarray(c) for c in categories]
+        self.n_rows = len(codes[0]) if codes else 0
+        # Buffers com folga para acrescentar lotes sem copiar tudo a cada vez
+        self._codes = list(codes)
+        # Um item por lote: [(order, offsets) por dimensão]
+        self.segments = segments
+        self._all_rows = None
+
+    @property
+    def codes(self):
+        return [buffer[:self.n_rows] for buffer in self._codes]
+
+    @classmethod
+    def from_frame(cls, df, dims=DIMS):
+        categories, codes, postings = [], [], []
+        for dim in dims:
+            cats = np.sort(df[dim].dropna().unique())
+            dim_codes = pd.Categorical(df[dim], categories=cats).codes
+            dim_codes = dim_codes.astype(np.int16 if len(cats) < 2 ** 15 else np.int32)
+            categories.append(cats)
+            codes.append(dim_codes)
+            postings.append(_posting_lists(dim_codes, len(cats)))
+        return cls(dims, categories, codes, [postings])
+
+    def save(self, path):
+        """
+        Grava o índice em `path` (Arrow IPC, sem compressão). Os lotes
+        acrescentados são juntados numa única posting list por dimensão.
+        """
+        columns, meta = {}, {'dims': list(self.dims), 'categories': [], 'offsets': []}
+        for d, codes in enumerate(self.codes):
+            if len(self.segments) == 1:
+                order, offsets = self.segments[0][d]
+            else:
+                order, offsets = _posting_lists(codes, len(self.categories[d]))
+            columns[f'codes_{d}'] = codes
+            columns[f'order_{d}'] = order
+            meta['categories'].append([self.categories[d].tolist(), str(self.categories[d].dtype)])
+            meta['offsets'].append(offsets.tolist())
+        table = pa.table(columns).replace_schema_metadata({'filter_index': json.dumps(meta)})
+        feather.write_feather(table, path, compression='uncompressed',
+                              chunksize=max(table.num_rows, 1))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Abre um índice gravado por `save`. Códigos e posting lists são
+        views somente leitura do arquivo (`append` copia antes de crescer).
+        """
+        table = feather.read_table(path, memory_map=True)
+        meta = json.loads(table.schema.metadata[b'filter_index'])
+
+        def column(name):
+            # Um único chunk: to_numpy não copia
+            return table[name].chunk(0).to_numpy() if table.num_rows else \
+                np.empty(0, dtype=table.schema.field(name).type.to_pandas_dtype())
+
+        categories = [np.asarray(values, dtype=dtype) for values, dtype in meta['categories']]
+        codes = [column(f'codes_{d}') for d in range(len(meta['dims']))]
+        postings = [(column(f'order_{d}'), np.asarray(offsets, dtype=np.int64))
+                    for d, offsets in enumerate(meta['offsets'])]
+        return cls(meta['dims'], categories, codes, [postings])
+
+    def append(self, batch):
+        """
+        Indexa um lote de linhas novas (row ids n_rows .. n_rows + len(lote)).
+        As listas são trocadas, não alteradas, então uma cópia rasa do índice
+        recebe o lote sem mudar o original.
+        """
+        first_row = self.n_rows
+        self.categories, self._codes = list(self.categories), list(self._codes)
+        total = first_row + len(batch)
+        postings = []
+        for d, dim in enumerate(self.dims):
+            values = batch[dim]
+            new_values = pd.unique(values.dropna())
+            new_values = new_values[~np.isin(new_values, self.categories[d])]
+            if len(new_values):
+                self.categories[d] = np.concatenate([self.categories[d], new_values])
+            cats = self.categories[d]
+
+            # Códigos na ordem das categorias (que deixam de ser ordenadas)
+            batch_codes = pd.Categorical(values, categories=cats).codes
+            buffer = self._codes[d]
+            dtype = buffer.dtype if len(cats) < np.iinfo(buffer.dtype).max else np.int32
+            if total > len(buffer) or dtype != buffer.dtype:
+                grown = np.empty(max(total, 2 * len(buffer)), dtype=dtype)
+                grown[:first_row] = buffer[:first_row]
+                buffer = self._codes[d] = grown
+            buffer[first_row:total] = batch_codes
+            postings.append(_posting_lists(batch_codes, len(cats), first_row))
+        self.segments = self.segments + [postings]
+        self.n_rows = total
+
+    def _selected_codes(self, d, values):
+        return np.flatnonzero(np.isin(self.categories[d], list(values)))
+
+    def _has_nulls(self, d):
+        return any(segment[d][1][0] > 0 for segment in self.segments)
+
+    def _is_full(self, d, selected_codes):
+        # Seleção com todos os valores e sem nulos na coluna não restringe nada
+        return len(selected_codes) == len(self.categories[d]) and not self._has_nulls(d)
+
+    def _rows_for_codes(self, d, selected):
+        parts = []
+        for segment in self.segments:
+            order, offsets = segment[d]
+            # Segmentos antigos não conhecem códigos criados depois deles
+            codes = selected[selected < len(offsets) - 1]
+            parts.extend(order[s:e] for s, e in zip(offsets[codes], offsets[codes + 1]))
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(parts))
+
+    def _count_for_codes(self, d, selected):
+        total = 0
+        for segment in self.segments:
+            offsets = segment[d][1]
+            codes = selected[selected < len(offsets) - 1]
+            total += int(np.sum(offsets[codes + 1] - offsets[codes]))
+        return total
+
+    def rows_for(self, dim, values):
+        """
+        Row ids (ordenados) das linhas cujo `dim` está em `values`
+        """
+        d = self.dims.index(dim)
+        return self._rows_for_codes(d, self._selected_codes(d, values))
+
+    def all_rows(self):
+        """
+        Todos os row ids. Sem filtro é o caso padrão do dashboard, então o
+        mesmo array (somente leitura) é devolvido a todas as sessões.
+        """
+        rows = self._all_rows
+        if rows is None or len(rows) != self.n_rows:
+            rows = np.arange(self.n_rows)
+            rows.setflags(write=False)
+            self._all_rows = rows
+        return rows
+
+    def select(self, selection):
+        """
+        Row ids das linhas selecionadas. `selection` mapeia dimensão ->
+        valores escolhidos; dimensões ausentes ou None não filtram.
+        """
+        constraints = []
+        for d, dim in enumerate(self.dims):
+            values = (selection or {}).get(dim)
+            if values is None:
+                continue
+            selected = self._selected_codes(d, values)
+            if self._is_full(d, selected):
+                continue
+            constraints.append((self._count_for_codes(d, selected), d, selected))
+
+        if not constraints:
+            return self.all_rows()
+
+        # Começar pela dimensão que gera menos candidatos
+        constraints.sort(key=lambda c: c[0])
+        _, d, selected = constraints[0]
+        rows = self._rows_for_codes(d, selected)
+
+        for _, d, selected in constraints[1:]:
+            # Última posição da tabela responde pelo código -1 (nulo)
+            lookup = np.zeros(len(self.categories[d]) + 1, dtype=bool)
+            lookup[selected] = True
+            rows = rows[lookup[self._codes[d][rows]]]
+        return rows
+
+    def group_rows(self, rows, dim):
+        """
+        Divide `rows` pelos valores de `dim`: {valor: row ids}
+        """
+        d = self.dims.index(dim)
+        codes = self._codes[d][rows]
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(self.categories[d]) + 1))
+        return {value: rows[order[bounds[i]:bounds[i + 1]]]
+                for i, value in enumerate(self.categories[d])
+                if bounds[i + 1] > bounds[i]}
@@ -0,0 +1,60 @@
+"""
+Ingestão incremental de músicas novas.
+
+Um lote entra no store como um novo segmento Arrow (o CSV original e os
+segmentos anteriores não são reescritos), e o cubo persistido é
+atualizado só com as linhas do lote. Dashboards em execução aplicam o
+segmento no próximo rerun via `Dataset.refresh()`.
+
+O humor das músicas novas usa os mesmos limiares (medianas) do dataset
+original, guardados no índice do cache, para que as categorias já
+existentes não mudem.
+
+Uso:
+    python ingest.py novas_musicas.csv [--source music_com_decade.csv]
+"""
+import argparse
+import os
+
+import pandas as pd
+
+import data_cache
+from dataset import CUBE_FILE, load_cube, save_cube
+from mood import classify_moods
+
+
+def append_batch(batch, csv_path, cache_dir=data_cache.CACHE_DIR):
+    """
+    Acrescenta `batch` (DataFrame com o schema do CSV) ao dataset de
+    `csv_path`. Retorna a nova versão do store.
+    """
+    batch = data_cache.add_decade(batch.copy())
+    if 'mood_category' not in batch.columns:
+        thresholds = data_cache.mood_thresholds(csv_path, cache_dir)
+        batch['mood_category'] = classify_moods(batch['valence'], batch['energy'],
+                                                thresholds['valence'], thresholds['energy'])
+
+    # Cubo atual carregado antes do segmento novo existir
+    cube = load_cube(csv_path, cache_dir)
+    table = data_cache.append_segment(csv_path, batch, cache_dir)
+    cube.append(table.to_pandas())
+    version = data_cache.store_version(csv_path, cache_dir)
+    save_cube(csv_path, cube, version[1], cache_dir)
+    return version
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Acrescenta músicas novas ao dataset do dashboard")
+    parser.add_argument('batch', help="CSV com as músicas novas")
+    parser.add_argument('--source', default='music_com_decade.csv', help="CSV do dataset principal")
+    parser.add_argument('--cache-dir', default=data_cache.CACHE_DIR)
+    args = parser.parse_args()
+
+    batch = pd.read_csv(args.batch)
+    sha256, n_segments = append_batch(batch, args.source, args.cache_dir)
+    print(f"✅ {len(batch):,} músicas acrescentadas a {os.path.basename(args.source)} "
+          f"(segmento {n_segments}, {CUBE_FILE} atualizado)")
+
+
+if __name__ == '__main__':
+    main()
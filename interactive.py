@@ -0,0 +1,273 @@
+"""
+Versão interativa (Vega-Lite, via Altair) dos gráficos do dashboard.
+
+Cada função recebe os mesmos argumentos da função de mesmo nome em
+`charts` (os dados já agregados de `views`) e devolve um `alt.Chart`.
+O navegador desenha o gráfico a partir de uma tabela pequena, então
+tooltip, zoom e pan não voltam ao servidor.
+
+O scatter de humor manda os pontos só até `MAX_POINTS`; acima disso
+manda uma grade de densidade por humor (como o mapa de densidade do
+gráfico estático), engrossada até caber em `MAX_ROWS` linhas, o teto do
+payload de qualquer gráfico.
+
+Ligado pelo seletor da sidebar ou por padrão com DASHBOARD_INTERACTIVE=1
+(lido em `views`, para o Altair só ser importado quando os gráficos
+interativos são usados).
+"""
+import json
+
+import altair as alt
+import numpy as np
+import pandas as pd
+
+from charts import (COLORS_FEATURES, COLORS_MOOD, CORES_TEMAS, DENSITY_BINS,
+                    SCATTER_EXTENT)
+
+# Pontos enviados crus no scatter; acima disso vai a grade de densidade
+MAX_POINTS = 2_000
+# Teto de linhas de dados de um gráfico (o Altair recusa mais de 5000)
+MAX_ROWS = 4_000
+
+HEIGHT = 380
+SONGS_TOOLTIP = alt.Tooltip('count:Q', title='Músicas', format=',')
+
+
+def payload_bytes(chart):
+    """
+    Tamanho do spec + dados que vão para o navegador
+    """
+    return len(json.dumps(chart.to_dict()))
+
+
+def _scale(colors):
+    return alt.Scale(domain=list(colors), range=list(colors.values()))
+
+
+def _periods(frame, value_name, var_name):
+    # DataFrame (período × colunas) em formato longo, com o período como int
+    long = frame.rename_axis(index='periodo', columns=var_name).stack().rename(value_name)
+    long = long.reset_index()
+    long['periodo'] = long['periodo'].astype(int)
+    return long
+
+
+def decade_distribution(decade_counts):
+    """
+    Barras com o número de músicas por década
+    """
+    data = pd.DataFrame({'decade': decade_counts.index.astype(int), 'count': decade_counts.to_numpy()})
+    bars = alt.Chart(data).mark_bar(color='#667eea', stroke='black', opacity=0.8).encode(
+        x=alt.X('decade:O', title='Década'),
+        y=alt.Y('count:Q', title='Número de Músicas'),
+        tooltip=[alt.Tooltip('decade:O', title='Década'), SONGS_TOOLTIP],
+    )
+    labels = bars.mark_text(dy=-8, fontWeight='bold').encode(text='count:Q')
+    return (bars + labels).properties(height=HEIGHT)
+
+
+def top_genres(top_genres):
+    """
+    Barras horizontais com os gêneros mais frequentes
+    """
+    data = pd.DataFrame({'genre': top_genres.index.astype(str), 'count': top_genres.to_numpy()})
+    bars = alt.Chart(data).mark_bar(stroke='black').encode(
+        y=alt.Y('genre:N', sort='-x', title=None),
+        x=alt.X('count:Q', title='Número de Músicas'),
+        color=alt.Color('genre:N', scale=alt.Scale(scheme='spectral'), legend=None, sort='-x'),
+        tooltip=[alt.Tooltip('genre:N', title='Gênero'), SONGS_TOOLTIP],
+    )
+    labels = bars.mark_text(align='left', dx=4, fontWeight='bold').encode(
+        text='count:Q', color=alt.value('black'))
+    return (bars + labels).properties(height=HEIGHT)
+
+
+def features_evolution(features_by_decade, xlabel='Década'):
+    """
+    Linhas com a média de cada característica de áudio por período; clicar
+    na legenda destaca uma característica, arrastar faz pan e a roda, zoom
+    """
+    data = _periods(features_by_decade, 'value', 'feature')
+    colors = dict(zip(features_by_decade.columns, COLORS_FEATURES))
+    highlight = alt.selection_point(fields=['feature'], bind='legend')
+    lines = alt.Chart(data).mark_line(point=len(features_by_decade) <= 15, strokeWidth=3).encode(
+        x=alt.X('periodo:Q', title=xlabel, scale=alt.Scale(zero=False), axis=alt.Axis(format='d')),
+        y=alt.Y('value:Q', title='Valor Médio (0-1)', scale=alt.Scale(domain=[0, 1])),
+        color=alt.Color('feature:N', scale=_scale(colors), title=None),
+        opacity=alt.condition(highlight, alt.value(0.9), alt.value(0.15)),
+        tooltip=[alt.Tooltip('periodo:Q', title=xlabel, format='d'),
+                 alt.Tooltip('feature:N', title='Característica'),
+                 alt.Tooltip('value:Q', title='Média', format='.3f')],
+    )
+    return lines.add_params(highlight).interactive(bind_y=False).properties(height=HEIGHT)
+
+
+def density_grid(points_by_mood, max_rows=MAX_ROWS, bins=DENSITY_BINS):
+    """
+    Contagem de músicas por célula (valence × energy) de cada humor, só as
+    células ocupadas, com o canto inferior esquerdo de cada célula. A grade
+    é engrossada pela metade até caber em `max_rows`. Retorna (grade,
+    largura da célula).
+    """
+    lo, hi = SCATTER_EXTENT
+    while True:
+        frames = []
+        for mood, (valence, energy) in points_by_mood.items():
+            counts, v_edges, e_edges = np.histogram2d(valence, energy, bins=bins,
+                                                      range=[[lo, hi], [lo, hi]])
+            v, e = np.nonzero(counts)
+            frames.append(pd.DataFrame({'mood': mood, 'count': counts[v, e].astype(np.int64),
+                                        'valence': v_edges[v].round(4), 'energy': e_edges[e].round(4)}))
+        grid = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+            columns=['mood', 'count', 'valence', 'energy'])
+        if len(grid) <= max_rows or bins <= 2:
+            return grid, (hi - lo) / bins
+        bins //= 2
+
+
+def mood_scatter(points_by_mood, valence_median, energy_median,
+                 max_points=MAX_POINTS, max_rows=MAX_ROWS):
+    """
+    Valence × Energy com as medianas. Até `max_points` músicas manda os
+    pontos; acima, a grade de densidade de cada humor
+    """
+    lo, hi = SCATTER_EXTENT
+    x_scale = alt.Scale(domain=[lo, hi])
+    y_scale = alt.Scale(domain=[lo, hi])
+    color = alt.Color('mood:N', scale=_scale(COLORS_MOOD), title=None)
+
+    n_points = sum(len(valence) for valence, _ in points_by_mood.values())
+    if n_points <= max_points:
+        frames = [pd.DataFrame({'mood': mood, 'valence': np.round(valence, 3),
+                                'energy': np.round(energy, 3)})
+                  for mood, (valence, energy) in points_by_mood.items()]
+        data = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+            columns=['mood', 'valence', 'energy'])
+        marks = alt.Chart(data).mark_circle(size=30, opacity=0.6, stroke='black',
+                                            strokeWidth=0.5).encode(
+            x=alt.X('valence:Q', title='Valence (Triste ← → Feliz)', scale=x_scale),
+            y=alt.Y('energy:Q', title='Energy (Calmo ← → Energético)', scale=y_scale),
+            color=color,
+            tooltip=[alt.Tooltip('mood:N', title='Humor'), alt.Tooltip('valence:Q', format='.2f'),
+                     alt.Tooltip('energy:Q', format='.2f')],
+        )
+    else:
+        data, step = density_grid(points_by_mood, max_rows)
+        # O fim de cada célula é calculado no navegador; a opacidade segue o
+        # log da contagem, como no mapa de densidade estático
+        marks = alt.Chart(data).transform_calculate(
+            valence_end=f'datum.valence + {step}', energy_end=f'datum.energy + {step}',
+        ).mark_rect().encode(
+            x=alt.X('valence:Q', title='Valence (Triste ← → Feliz)', scale=x_scale),
+            x2='valence_end:Q',
+            y=alt.Y('energy:Q', title='Energy (Calmo ← → Energético)', scale=y_scale),
+            y2='energy_end:Q',
+            color=color,
+            opacity=alt.Opacity('count:Q', scale=alt.Scale(type='log', range=[0.1, 0.9]), legend=None),
+            tooltip=[alt.Tooltip('mood:N', title='Humor'), SONGS_TOOLTIP],
+        )
+
+    medians = pd.DataFrame({'valence': [valence_median], 'energy': [energy_median]})
+    rule = alt.Chart(medians).mark_rule(color='black', strokeDash=[6, 4], strokeWidth=2, opacity=0.5)
+    return (marks + rule.encode(x='valence:Q') + rule.encode(y='energy:Q')).interactive().properties(
+        height=HEIGHT + 120)
+
+
+def mood_pie(mood_dist):
+    """
+    Pizza com a distribuição de humores
+    """
+    data = pd.DataFrame({'mood': mood_dist.index.astype(str), 'count': mood_dist.to_numpy()})
+    data['share'] = data['count'] / data['count'].sum()
+    return alt.Chart(data).mark_arc(stroke='white').encode(
+        theta=alt.Theta('count:Q'),
+        color=alt.Color('mood:N', scale=_scale(COLORS_MOOD), title=None),
+        tooltip=[alt.Tooltip('mood:N', title='Humor'), SONGS_TOOLTIP,
+                 alt.Tooltip('share:Q', title='Percentual', format='.1%')],
+    ).properties(height=HEIGHT)
+
+
+def mood_by_decade(mood_by_decade):
+    """
+    Barras empilhadas com o percentual de cada humor por década
+    """
+    data = _periods(mood_by_decade, 'pct', 'mood')
+    return alt.Chart(data).mark_bar(stroke='black').encode(
+        x=alt.X('periodo:O', title='Década'),
+        y=alt.Y('pct:Q', title='Percentual (%)', stack=True, scale=alt.Scale(domain=[0, 100])),
+        color=alt.Color('mood:N', scale=_scale(COLORS_MOOD), title='Mood Category'),
+        tooltip=[alt.Tooltip('periodo:O', title='Década'), alt.Tooltip('mood:N', title='Humor'),
+                 alt.Tooltip('pct:Q', title='Percentual', format='.1f')],
+    ).properties(height=HEIGHT)
+
+
+def theme_timeline(temas_por_decada, variacao, xlabel='Década'):
+    """
+    Linha do tempo dos temas, com a variação total de cada um no último ponto
+    """
+    data = _periods(temas_por_decada, 'value', 'tema')
+    colors = {tema: CORES_TEMAS[tema] for tema in temas_por_decada.columns}
+    color = alt.Color('tema:N', scale=_scale(colors), title=None)
+    highlight = alt.selection_point(fields=['tema'], bind='legend')
+    lines = alt.Chart(data).mark_line(point=len(temas_por_decada) <= 15, strokeWidth=3).encode(
+        x=alt.X('periodo:Q', title=xlabel, scale=alt.Scale(zero=False), axis=alt.Axis(format='d')),
+        y=alt.Y('value:Q', title='Intensidade Média'),
+        color=color,
+        opacity=alt.condition(highlight, alt.value(0.9), alt.value(0.15)),
+        tooltip=[alt.Tooltip('periodo:Q', title=xlabel, format='d'), alt.Tooltip('tema:N', title='Tema'),
+                 alt.Tooltip('value:Q', title='Intensidade', format='.3f')],
+    ).add_params(highlight)
+
+    last = data[data['periodo'] == data['periodo'].max()].copy()
+    last['label'] = [f'{variacao[tema]:+.0f}%' for tema in last['tema']]
+    labels = alt.Chart(last).mark_text(align='left', dx=8, fontWeight='bold').encode(
+        x='periodo:Q', y='value:Q', text='label:N', color=color)
+    return (lines + labels).interactive(bind_y=False).properties(height=HEIGHT + 40)
+
+
+def theme_variation(variacao):
+    """
+    Barras horizontais com a variação percentual de cada tema
+    """
+    data = pd.DataFrame({'tema': variacao.index.astype(str), 'variacao': variacao.to_numpy()})
+    data['label'] = data['variacao'].map('{:+.0f}%'.format)
+    base = alt.Chart(data).encode(y=alt.Y('tema:N', sort=list(data['tema']), title=None))
+    bars = base.mark_bar(stroke='black', opacity=0.7).encode(
+        x=alt.X('variacao:Q', title='Variação (%)'),
+        color=alt.condition('datum.variacao > 0', alt.value('green'), alt.value('red')),
+        tooltip=[alt.Tooltip('tema:N', title='Tema'),
+                 alt.Tooltip('variacao:Q', title='Variação (%)', format='+.1f')],
+    )
+    labels = base.mark_text(fontWeight='bold', dx=alt.expr('datum.variacao > 0 ? 18 : -18')).encode(
+        x='variacao:Q', text='label:N')
+    return (bars + labels).properties(height=HEIGHT + 40)
+
+
+def theme_heatmap(temas_por_decada):
+    """
+    Heatmap da intensidade média de cada tema por década
+    """
+    data = _periods(temas_por_decada, 'value', 'tema')
+    base = alt.Chart(data).encode(x=alt.X('periodo:O', title='Década'), y=alt.Y('tema:N', title='Tema'))
+    cells = base.mark_rect(stroke='white', strokeWidth=2).encode(
+        color=alt.Color('value:Q', scale=alt.Scale(scheme='yelloworangered'),
+                        title='Intensidade Média'),
+        tooltip=[alt.Tooltip('periodo:O', title='Década'), alt.Tooltip('tema:N', title='Tema'),
+                 alt.Tooltip('value:Q', title='Intensidade', format='.3f')],
+    )
+    labels = base.mark_text(fontSize=11).encode(text=alt.Text('value:Q', format='.3f'))
+    return (cells + labels).properties(height=HEIGHT)
+
+
+# id do gráfico (o mesmo de `views.CHARTS`) -> função de desenho interativa
+CHARTS = {
+    'decade_distribution': decade_distribution,
+    'top_genres': top_genres,
+    'features_evolution': features_evolution,
+    'mood_scatter': mood_scatter,
+    'mood_pie': mood_pie,
+    'mood_by_decade': mood_by_decade,
+    'theme_timeline': theme_timeline,
+    'theme_variation': theme_variation,
+    'theme_heatmap': theme_heatmap,
+}
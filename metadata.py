@@ -0,0 +1,60 @@
+"""
+Metadados do dataset para o dashboard aparecer antes da carga.
+
+O header e a sidebar só precisam das opções dos filtros, do total de
+músicas e das granularidades das séries. Depois de carregar o `Dataset`,
+o dashboard grava esses números num JSON pequeno da versão atual do
+store, ao lado do cache (`write_metadata`). Nas execuções seguintes,
+`read_metadata` os lê só com a biblioteca padrão, sem importar pandas,
+pyarrow ou matplotlib, e confere pelo índice do cache que o CSV e os
+segmentos continuam os mesmos; se não, devolve None e o dashboard
+carrega o dataset antes de montar a sidebar.
+"""
+import json
+import os
+
+METADATA_FILE = 'meta.json'
+# Os mesmos de `data_cache`, que não é importado aqui por puxar pandas e pyarrow
+CACHE_DIR = '.cache'
+INDEX_FILE = 'index.json'
+
+
+def read_metadata(csv_path, cache_dir=CACHE_DIR):
+    """
+    Metadados da versão atual do store, ou None se o CSV mudou desde o
+    último registro no índice ou se eles ainda não foram gravados
+    """
+    try:
+        with open(os.path.join(cache_dir, INDEX_FILE), encoding='utf-8') as f:
+            entry = json.load(f).get(os.path.abspath(csv_path))
+        stat = os.stat(csv_path)
+    except (OSError, ValueError):
+        return None
+    if not entry or entry.get('mtime_ns') != stat.st_mtime_ns or entry.get('size') != stat.st_size:
+        return None
+
+    # Mesmo nome que `data_cache.version_path` dá ao arquivo
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    name, ext = os.path.splitext(METADATA_FILE)
+    path = os.path.join(cache_dir, f"{stem}-{entry['sha256'][:16]}"
+                                   f".{name}{len(entry.get('segments', [])):05d}{ext}")
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_metadata(csv_path, metadata, cache_dir=CACHE_DIR):
+    """
+    Grava `metadata` (dicionário serializável em JSON) para a versão atual
+    do store. Retorna o caminho.
+    """
+    # Só roda depois da carga do dataset, quando pandas e pyarrow já estão importados
+    import data_cache
+
+    def write(path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, ensure_ascii=False)
+
+    return data_cache.write_version(csv_path, METADATA_FILE, write, cache_dir)
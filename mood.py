@@ -0,0 +1,161 @@
+"""
+Classificação de humor vetorizada e em streaming.
+
+O humor de cada música depende das medianas globais de valence e energy
+(quadrantes de Russell). Para não precisar do dataset inteiro em memória,
+o CSV é lido em chunks:
+
+1. histograma fino de valence e energy (mediana com erro ≤ largura do bin);
+2. opcionalmente, coleta dos valores que caem no bin da mediana, o que
+   torna a mediana exata (igual a `Series.median()`);
+3. classificação vetorizada de cada chunk, gravada direto no cache Arrow.
+"""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+MOOD_CATEGORIES = ['Happy/Energetic', 'Angry/Tense', 'Sad/Calm', 'Peaceful/Content']
+
+# Índice = (valence < mediana) + 2 * (energy < mediana); 4 = valor nulo
+_QUADRANTS = np.array(['Happy/Energetic', 'Angry/Tense', 'Peaceful/Content',
+                       'Sad/Calm', 'Unknown'], dtype=object)
+
+CHUNKSIZE = 200_000
+
+
+def classify_moods(valence, energy, valence_median, energy_median):
+    """
+    Regra dos quadrantes aplicada de uma vez a todas as músicas: devolve
+    um array com a categoria de cada uma ('Unknown' quando falta valor)
+    """
+    valence = np.asarray(valence, dtype=np.float64)
+    energy = np.asarray(energy, dtype=np.float64)
+    quadrant = (valence < valence_median).astype(np.int8) + 2 * (energy < energy_median)
+    quadrant[np.isnan(valence) | np.isnan(energy)] = 4
+    return _QUADRANTS[quadrant]
+
+
+class StreamingMedian:
+    """
+    Mediana de um fluxo de valores via histograma de `bins` faixas em
+    [lo, hi]. Valores fora do intervalo vão para as faixas das pontas.
+
+    `estimate()` tem erro ≤ (hi - lo) / bins para dados dentro do
+    intervalo. Para o valor exato, passe os dados de novo por `collect()`
+    e chame `exact()`; só os valores do bin da mediana ficam em memória.
+    """
+
+    def __init__(self, bins=65536, lo=0.0, hi=1.0):
+        self.bins = bins
+        self.lo = lo
+        self.hi = hi
+        self.hist = np.zeros(bins, dtype=np.int64)
+        self.n = 0
+        self._candidates = []
+
+    def _bin(self, values):
+        scaled = (values - self.lo) / (self.hi - self.lo) * self.bins
+        return np.clip(scaled, 0, self.bins - 1).astype(np.int64)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        self.hist += np.bincount(self._bin(values), minlength=self.bins)
+        self.n += len(values)
+
+    def _ranks(self):
+        # Posições (base 0) que compõem a mediana, como em pandas
+        if self.n == 0:
+            return []
+        if self.n % 2:
+            return [self.n // 2]
+        return [self.n // 2 - 1, self.n // 2]
+
+    def _target_bins(self):
+        cumulative = np.cumsum(self.hist)
+        return np.searchsorted(cumulative, np.array(self._ranks()) + 1)
+
+    def estimate(self):
+        if self.n == 0:
+            return np.nan
+        width = (self.hi - self.lo) / self.bins
+        centers = self.lo + (self._target_bins() + 0.5) * width
+        return float(np.mean(centers))
+
+    def collect(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        targets = self._target_bins()
+        bins = self._bin(values)
+        keep = (bins >= targets.min()) & (bins <= targets.max())
+        self._candidates.append(values[keep])
+
+    def exact(self):
+        if self.n == 0:
+            return np.nan
+        targets = self._target_bins()
+        before = int(self.hist[:targets.min()].sum())
+        candidates = np.sort(np.concatenate(self._candidates))
+        return float(np.mean([candidates[r - before] for r in self._ranks()]))
+
+
+def _read_chunks(csv_path, chunksize, usecols=None):
+    return pd.read_csv(csv_path, chunksize=chunksize, usecols=usecols)
+
+
+def csv_medians(csv_path, columns=('valence', 'energy'), exact=True, chunksize=CHUNKSIZE):
+    """
+    Medianas das colunas do CSV sem carregá-lo inteiro: {coluna: mediana}
+    """
+    medians = {col: StreamingMedian() for col in columns}
+    for chunk in _read_chunks(csv_path, chunksize, list(columns)):
+        for col, median in medians.items():
+            median.update(chunk[col].to_numpy(dtype=np.float64))
+    if not exact:
+        return {col: median.estimate() for col, median in medians.items()}
+
+    for chunk in _read_chunks(csv_path, chunksize, list(columns)):
+        for col, median in medians.items():
+            median.collect(chunk[col].to_numpy(dtype=np.float64))
+    return {col: median.exact() for col, median in medians.items()}
+
+
+def classify_csv(csv_path, out_path, prepare_chunk=None, exact=True, chunksize=CHUNKSIZE,
+                 prepare_table=None):
+    """
+    Classifica o CSV em streaming e grava o resultado (com `mood_category`)
+    como arquivo Arrow IPC em `out_path`. `prepare_chunk` recebe cada chunk
+    antes da classificação (ex.: para derivar a década); `prepare_table`
+    recebe a tabela do primeiro chunk e define o schema do arquivo.
+
+    Retorna as medianas usadas como limiar dos quadrantes.
+    """
+    columns = list(pd.read_csv(csv_path, nrows=0).columns)
+    medians = None
+    if 'mood_category' not in columns:
+        medians = csv_medians(csv_path, exact=exact, chunksize=chunksize)
+
+    schema = None
+    writer = None
+    try:
+        for chunk in _read_chunks(csv_path, chunksize):
+            if prepare_chunk is not None:
+                chunk = prepare_chunk(chunk)
+            if medians is not None:
+                chunk['mood_category'] = classify_moods(chunk['valence'], chunk['energy'],
+                                                        medians['valence'], medians['energy'])
+            # O schema do primeiro chunk vale para o arquivo inteiro
+            table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            if writer is None:
+                if prepare_table is not None:
+                    table = prepare_table(table)
+                schema = table.schema
+                writer = pa.ipc.new_file(out_path, schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is None:
+        raise ValueError("CSV sem linhas de dados!")
+    return medians
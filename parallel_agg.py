@@ -0,0 +1,395 @@
+"""
+Agregações paralelas para o relatório: médias por grupo e crosstabs.
+
+As colunas usadas são copiadas uma vez para blocos de memória
+compartilhada (códigos inteiros das chaves + matriz float64 dos valores).
+Os processos do pool se anexam a esses blocos pelo nome, então nenhuma
+linha é serializada: cada tarefa recebe só o intervalo de linhas da sua
+partição e devolve somas e contagens por grupo, que são pequenas.
+
+O merge soma as parciais, o que é exato para contagens e crosstabs. Para
+as médias, cada valor é dividido numa parte inteira numa grade 2^-S
+(somada sem arredondamento) e um resto menor que a grade, que é dividido
+de novo em grades mais finas até não sobrar nada (um valor muito maior
+que os outros não faz os pequenos perderem precisão); as partes
+inteiras são juntadas como inteiros e a soma final é arredondada uma
+única vez. O resultado não depende de quantas partições existem e é a
+média da soma corretamente arredondada; a soma compensada (Kahan) do
+pandas chega no mesmo valor, salvo raros casos em que ela erra 1 ulp.
+
+Uso como benchmark:
+    python parallel_agg.py music_com_decade.csv --workers 1 2 4 --scale 10
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from data_cache import TEMAS
+
+# Arrays anexados por cada processo do pool: nome do bloco -> (array, bloco).
+# O array vem primeiro para ser liberado antes de o bloco ser fechado.
+_attached = {}
+
+
+def _attach(specs):
+    for name, shape, dtype in specs:
+        block = shared_memory.SharedMemory(name=name)
+        _attached[name] = (np.ndarray(shape, dtype=dtype, buffer=block.buf), block)
+
+
+def _pool_ready(_):
+    return len(_attached)
+
+
+def grid_sums(codes, v, n_groups, scale, bits):
+    """
+    Somas exatas de `v` por grupo (`codes`): as partes inteiras nas grades
+    2^-(scale + k·bits), k = 0, 1, ..., até não sobrar resto, e a soma dos
+    valores não finitos, que propagam inf e nan como no pandas. Com
+    |v| < 2^(bits - scale) e menos de 2^(52 - bits) valores, nenhuma soma
+    arredonda.
+    """
+    finite = np.isfinite(v)
+    lo = np.zeros(n_groups)
+    if not finite.all():
+        lo = np.bincount(codes[~finite], weights=v[~finite], minlength=n_groups)
+        codes, v = codes[finite], v[finite]
+
+    levels = []
+    while True:
+        grid = scale + len(levels) * bits
+        # ldexp não estoura nas grades mais finas que 2^-1023
+        hi = np.round(np.ldexp(v, grid))
+        levels.append(np.bincount(codes, weights=hi, minlength=n_groups).astype(np.int64))
+        v = v - np.ldexp(hi, -grid)
+        # Só os valores que ainda têm resto seguem para a próxima grade
+        left = v != 0
+        if not left.any():
+            return levels, lo
+        if not left.all():
+            codes, v = codes[left], v[left]
+
+
+def grid_total(level_sums, scale, bits):
+    """
+    Soma exata (Fraction) das partes inteiras de um grupo, uma por grade
+    de `grid_sums`
+    """
+    total = Fraction(0)
+    for k, value in enumerate(level_sums):
+        exponent = scale + k * bits
+        total += Fraction(int(value), 2 ** exponent) if exponent >= 0 \
+            else Fraction(int(value) * 2 ** -exponent)
+    return total
+
+
+def _group_partial(codes_name, n_groups, values_name, columns, scales, bits, start, end):
+    """
+    Somas (partes inteiras por grade e resto) e não nulos por grupo das
+    `columns` nas linhas start:end
+    """
+    codes = _attached[codes_name][0][start:end]
+    values = _attached[values_name][0][:, start:end]
+    valid = codes >= 0
+    if not valid.all():
+        codes = codes[valid]
+        values = values[:, valid]
+    sizes = np.bincount(codes, minlength=n_groups)
+
+    hi_sums = []
+    lo_sums = np.zeros((n_groups, len(columns)))
+    nonnull = np.zeros((n_groups, len(columns)), dtype=np.int64)
+    for j, (column, scale) in enumerate(zip(columns, scales)):
+        v = values[column]
+        missing = np.isnan(v)
+        if missing.any():
+            v = np.where(missing, 0.0, v)
+            nonnull[:, j] = sizes - np.bincount(codes, weights=missing, minlength=n_groups)
+        else:
+            nonnull[:, j] = sizes
+        levels, lo_sums[:, j] = grid_sums(codes, v, n_groups, scale, bits)
+        hi_sums.append(levels)
+    return hi_sums, lo_sums, nonnull
+
+
+def _crosstab_partial(index_name, n_index, columns_name, n_columns, start, end):
+    """
+    Contagens por (linha, coluna) da crosstab nas linhas start:end
+    """
+    index = _attached[index_name][0][start:end]
+    columns = _attached[columns_name][0][start:end]
+    valid = (index >= 0) & (columns >= 0)
+    cells = index[valid].astype(np.int64) * n_columns + columns[valid]
+    return np.bincount(cells, minlength=n_index * n_columns)
+
+
+def max_abs(values):
+    """
+    Maior valor absoluto finito de `values` (0 se não há nenhum), que
+    define a primeira grade de `grid_sums`
+    """
+    if len(values) == 0 or np.isnan(values).all():
+        return 0.0
+    top = max(abs(np.nanmin(values)), abs(np.nanmax(values)))
+    if np.isinf(top):
+        finite = values[np.isfinite(values)]
+        top = np.abs(finite).max() if len(finite) else 0.0
+    return top
+
+
+class ParallelAggregator:
+    """
+    Colunas de um DataFrame em memória compartilhada + pool de processos.
+
+    Use como context manager para liberar os blocos no final:
+
+        with ParallelAggregator(df, keys=['decade'], values=temas) as agg:
+            temas_por_decada = agg.group_means('decade', temas)
+    """
+
+    def __init__(self, df, keys, values=(), workers=None):
+        self.n_rows = len(df)
+        self.workers = workers or os.cpu_count() or 1
+        self._blocks = []
+        self._specs = []
+        self.categories = {}
+        self.codes = {}
+        for key in keys:
+            codes, cats = pd.factorize(df[key], sort=True)
+            self.categories[key] = pd.Index(cats, name=key)
+            self.codes[key], _ = self._share(codes.shape, np.int32, codes)
+
+        self.values = list(values)
+        # Uma linha por coluna: cada partição lê trechos contíguos. A matriz
+        # é preenchida direto no bloco compartilhado, sem cópia intermediária.
+        self._values, matrix = self._share((len(self.values), self.n_rows), np.float64)
+        for j, column in enumerate(self.values):
+            matrix[j] = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+        # Expoente do maior |valor| finito de cada coluna (define a grade das somas)
+        self._exponents = np.array([np.frexp(max_abs(row))[1] for row in matrix], dtype=int)
+        del matrix
+
+        self._pool = None
+        if self.workers > 1:
+            self._pool = ProcessPoolExecutor(self.workers, initializer=_attach,
+                                             initargs=(self._specs,))
+        else:
+            _attach(self._specs)
+
+    def _share(self, shape, dtype, data=None):
+        dtype = np.dtype(dtype)
+        size = int(np.prod(shape)) * dtype.itemsize
+        block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        view = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        if data is not None:
+            view[...] = data
+        self._blocks.append(block)
+        self._specs.append((block.name, shape, dtype))
+        return block.name, view
+
+    def warm_up(self):
+        """
+        Sobe os processos do pool, que o ProcessPoolExecutor só cria na
+        primeira tarefa
+        """
+        if self._pool is not None:
+            list(self._pool.map(_pool_ready, range(self.workers)))
+
+    def _partitions(self):
+        bounds = np.linspace(0, self.n_rows, self.workers + 1).astype(np.int64)
+        return [(int(s), int(e)) for s, e in zip(bounds[:-1], bounds[1:]) if e > s]
+
+    def _run(self, func, *args):
+        tasks = [args + bounds for bounds in self._partitions()]
+        if self._pool is None:
+            return [func(*task) for task in tasks]
+        return list(self._pool.map(func, *zip(*tasks)))
+
+    def _scales(self, positions):
+        """
+        Primeira grade de cada coluna e bits por grade: |hi| ≤ 2^bits, com
+        bits escolhido para que a soma de uma partição inteira ainda seja
+        exata em float64 (< 2^53)
+        """
+        rows = max((e - s for s, e in self._partitions()), default=1)
+        bits = 52 - int(np.ceil(np.log2(rows + 1)))
+        return [int(bits - self._exponents[p]) for p in positions], bits
+
+    def group_means(self, by, columns):
+        """
+        Equivalente a `df.groupby(by)[columns].mean()`
+        """
+        columns = list(columns)
+        positions = [self.values.index(c) for c in columns]
+        scales, bits = self._scales(positions)
+        categories = self.categories[by]
+        partials = self._run(_group_partial, self.codes[by], len(categories),
+                             self._values, positions, scales, bits)
+        lo_sums = sum(p[1] for p in partials)
+        nonnull = sum(p[2] for p in partials)
+        # Partes inteiras de cada grade somadas entre as partições (as grades
+        # são as mesmas; uma partição pode ter precisado de menos delas)
+        hi_sums = []
+        for j in range(len(columns)):
+            levels = [p[0][j] for p in partials]
+            hi_sums.append([sum(level[k] for level in levels if k < len(level))
+                            for k in range(max(len(level) for level in levels))])
+
+        means = np.full(lo_sums.shape, np.nan)
+        for (g, j), count in np.ndenumerate(nonnull):
+            if count == 0:
+                continue
+            if lo_sums[g, j] != 0:
+                # Só valores não finitos sobram no resto; propagam como no pandas
+                means[g, j] = lo_sums[g, j]
+                continue
+            # Um único arredondamento da soma exata
+            total = grid_total([level[g] for level in hi_sums[j]], scales[j], bits)
+            means[g, j] = float(total) / count
+        return pd.DataFrame(means, index=categories, columns=columns)
+
+    def crosstab(self, index, columns, normalize=False):
+        """
+        Equivalente a `pd.crosstab(df[index], df[columns], normalize=...)`
+        """
+        rows, cols = self.categories[index], self.categories[columns]
+        partials = self._run(_crosstab_partial, self.codes[index], len(rows),
+                             self.codes[columns], len(cols))
+        counts = sum(partials).reshape(len(rows), len(cols))
+        table = pd.DataFrame(counts, index=rows, columns=pd.Index(cols, name=columns))
+        # O pandas não mostra valores que só aparecem junto de nulos na outra chave
+        table = table.loc[counts.sum(axis=1) > 0, counts.sum(axis=0) > 0]
+
+        # Mesmos aliases do pd.crosstab ('index' = 0, 'columns' = 1, 'all' = True)
+        if normalize is False:
+            return table
+        if normalize in ('index', 0) and normalize is not True:
+            return table.div(table.sum(axis=1), axis=0)
+        if normalize in ('columns', 1) and normalize is not True:
+            return table.div(table.sum(axis=0), axis=1)
+        if normalize in ('all', True):
+            return table / table.to_numpy().sum()
+        raise ValueError(f"normalize inválido: {normalize!r}")
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        for block in self._blocks:
+            _attached.pop(block.name, None)
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def group_means(df, by, columns, workers=None):
+    with ParallelAggregator(df, [by], columns, workers) as agg:
+        return agg.group_means(by, columns)
+
+
+def crosstab(df, index, columns, normalize=False, workers=None):
+    with ParallelAggregator(df, [index, columns], workers=workers) as agg:
+        return agg.crosstab(index, columns, normalize)
+
+
+REPORT_KEYS = ['decade', 'genre', 'mood_category']
+
+
+def _theme_aggregations(agg, temas):
+    return {
+        'temas_por_decada': agg.group_means('decade', temas),
+        'mood_decade': agg.crosstab('decade', 'mood_category', normalize='index') * 100,
+        'mood_genre': agg.crosstab('genre', 'mood_category', normalize='index') * 100,
+    }
+
+
+def theme_report(df, workers=None):
+    """
+    Agregações da análise de temas do notebook, num único pool:
+    temas por década, humor por década e humor por gênero (em %)
+    """
+    temas = [t for t in TEMAS if t in df.columns]
+    with ParallelAggregator(df, REPORT_KEYS, temas, workers) as agg:
+        return _theme_aggregations(agg, temas)
+
+
+def pandas_theme_report(df):
+    """
+    Mesmas agregações, com o pandas (referência). As médias são feitas em
+    float64, como no agregador, mesmo com os temas em float32 no frame
+    """
+    temas = [t for t in TEMAS if t in df.columns]
+    return {
+        'temas_por_decada': df[temas].astype(np.float64).groupby(df['decade']).mean(),
+        'mood_decade': pd.crosstab(df['decade'], df['mood_category'], normalize='index') * 100,
+        'mood_genre': pd.crosstab(df['genre'], df['mood_category'], normalize='index') * 100,
+    }
+
+
+def check_equal(result, expected):
+    """
+    Levanta AssertionError se algum resultado difere do pandas
+    """
+    for name, frame in expected.items():
+        pd.testing.assert_frame_equal(result[name], frame, check_exact=False,
+                                      rtol=1e-12, atol=0, check_dtype=False,
+                                      check_index_type=False, check_column_type=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das agregações paralelas de temas")
+    parser.add_argument('csv', nargs='?', default='music_com_decade.csv')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--scale', type=int, default=1,
+                        help="Repete as linhas N vezes para simular um corpus maior")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    import data_cache
+    df = data_cache.load_frame(args.csv)
+    if args.scale > 1:
+        df = pd.concat([df] * args.scale, ignore_index=True)
+    print(f"{len(df):,} linhas, {os.cpu_count()} núcleos\n")
+
+    temas = [t for t in TEMAS if t in df.columns]
+
+    def timed(func):
+        start = time.perf_counter()
+        result = func()
+        return time.perf_counter() - start, result
+
+    base, expected = min((timed(lambda: pandas_theme_report(df)) for _ in range(args.repeat)),
+                         key=lambda r: r[0])
+    print(f"{'':>11}  {'preparo':>8}  {'agregação':>9}  {'total':>8}")
+    print(f"{'pandas':>11}  {'':>8}  {base:8.3f}s  {base:7.3f}s")
+
+    for workers in args.workers:
+        runs = []
+        for _ in range(args.repeat):
+            # Preparo (códigos + cópia para memória compartilhada + pool) é serial;
+            # a agregação é a parte que escala com os núcleos
+            setup, agg = timed(lambda: ParallelAggregator(df, REPORT_KEYS, temas, workers))
+            with agg:
+                agg.warm_up()
+                elapsed, result = timed(lambda: _theme_aggregations(agg, temas))
+            runs.append((setup + elapsed, setup, elapsed, result))
+        total, setup, elapsed, result = min(runs, key=lambda r: r[0])
+        check_equal(result, expected)
+        print(f"{workers:>3} worker{'s' if workers > 1 else ' '}  {setup:7.3f}s  {elapsed:8.3f}s  "
+              f"{total:7.3f}s  {base / elapsed:5.2f}x na agregação  ✅ igual ao pandas")
+
+
+if __name__ == '__main__':
+    main()
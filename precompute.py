@@ -0,0 +1,150 @@
+"""
+Pré-cálculo em segundo plano das visões mais acessadas.
+
+A maioria das sessões abre o dashboard na visão padrão (todos os filtros
+marcados) ou em poucos recortes populares, como uma única década ou um
+único gênero. Ao subir e a cada versão nova do dataset, o `Precomputer`
+enfileira todos os gráficos dessas visões no `ChartPrefetcher`, e a
+primeira pintura delas já sai do `FigureCache`.
+
+No máximo `max_pending` gráficos do pré-cálculo ficam na fila do
+prefetcher ao mesmo tempo; o próximo só entra quando um termina. Assim os
+gráficos pedidos pelas sessões (abas fechadas) não esperam o pré-cálculo
+inteiro, só o que já está na fila.
+
+As visões podem ser trocadas pela variável de ambiente
+`DASHBOARD_PRESETS`, com uma lista JSON de filtros aplicados sobre a
+visão padrão, ex.: '[{}, {"genre": ["rock"]}, {"decade": [1980, 1990]}]'.
+"""
+import collections
+import json
+import os
+import threading
+
+import views
+from figure_cache import normalize_selection
+
+ENV_VAR = 'DASHBOARD_PRESETS'
+
+# Filtros aplicados sobre a visão padrão; {} é a própria visão padrão
+PRESETS = [{}]
+# Dimensões em que cada valor sozinho também vira uma visão (ex.: só os anos 80)
+SINGLE_VALUE_DIMS = ('decade', 'genre')
+
+MAX_PENDING = 2
+
+
+def configured_presets():
+    """
+    Visões de `DASHBOARD_PRESETS`, ou None se a variável não está definida
+    """
+    value = os.environ.get(ENV_VAR, '').strip()
+    if not value:
+        return None
+    presets = json.loads(value)
+    if not isinstance(presets, list) or not all(isinstance(p, dict) for p in presets):
+        raise ValueError(f"{ENV_VAR} deve ser uma lista JSON de filtros")
+    return presets
+
+
+def expand_presets(options, presets=None, single_value_dims=SINGLE_VALUE_DIMS):
+    """
+    Seleções completas das visões, na ordem em que são pré-calculadas:
+    as de `presets` (com todos os valores nas dimensões que não filtram) e
+    depois um valor por vez de cada dimensão em `single_value_dims`
+    """
+    presets = list(PRESETS if presets is None else presets)
+    presets += [{dim: [value]} for dim in single_value_dims for value in options.get(dim, [])]
+    selections, seen = [], set()
+    for preset in presets:
+        selection = {**options, **preset}
+        key = normalize_selection(selection)
+        if key not in seen:
+            seen.add(key)
+            selections.append(selection)
+    return selections
+
+
+class Precomputer:
+    """
+    Mantém os gráficos das visões pré-definidas no cache para a versão
+    atual do dataset
+    """
+
+    def __init__(self, prefetcher, presets=None, single_value_dims=SINGLE_VALUE_DIMS,
+                 max_pending=MAX_PENDING):
+        self.prefetcher = prefetcher
+        self.presets = presets
+        self.single_value_dims = single_value_dims
+        self.max_pending = max_pending
+        self.total = 0
+        self._jobs = collections.deque()
+        self._pending = 0
+        self._version = None
+        self._lock = threading.Lock()
+
+    def schedule(self, dataset):
+        """
+        Enfileira as visões para a versão de `dataset`, se ainda não foram.
+        O que ficou na fila de uma versão anterior é descartado. Retorna
+        True se agendou.
+        """
+        with self._lock:
+            if dataset.version == self._version:
+                return False
+            self._version = dataset.version
+            options = views.filter_options(dataset)
+            selections = expand_presets(options, self.presets, self.single_value_dims)
+            self._jobs = collections.deque()
+            for selection in selections:
+                key = views.selection_key(dataset, selection)
+                build = self._builder(dataset, selection)
+                self._jobs.extend((chart_id, key, build) for chart_id in views.CHARTS)
+            self.total = len(self._jobs)
+        self._feed()
+        return True
+
+    @staticmethod
+    def _builder(dataset, selection):
+        # Row ids calculados uma vez por visão, já na thread de fundo
+        rows = []
+
+        def build(chart_id):
+            if not rows:
+                rows.append(dataset.filter_index.select(selection))
+            return views.build_chart(chart_id, dataset, selection, rows[0])
+        return build
+
+    def _feed(self):
+        while True:
+            with self._lock:
+                if self._pending >= self.max_pending or not self._jobs:
+                    return
+                chart_id, key, build = self._jobs.popleft()
+                self._pending += 1
+            try:
+                future = self.prefetcher.submit(chart_id, key,
+                                                lambda chart_id=chart_id, build=build: build(chart_id))
+            except RuntimeError:
+                # Pool encerrado (processo saindo): o resto da fila não roda mais
+                with self._lock:
+                    self._jobs.clear()
+                    self._pending -= 1
+                return
+            if future is None:
+                # Já estava no cache
+                self._finished()
+            else:
+                future.add_done_callback(lambda f: (self._finished(), self._feed()))
+
+    def _finished(self):
+        with self._lock:
+            self._pending -= 1
+
+    @property
+    def pending(self):
+        """
+        Gráficos do pré-cálculo ainda não prontos
+        """
+        with self._lock:
+            return len(self._jobs) + self._pending
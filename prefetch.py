@@ -0,0 +1,72 @@
+"""
+Renderização em segundo plano dos gráficos das abas fechadas.
+
+Com as abas preguiçosas só o corpo da aba aberta roda no rerun. Os
+gráficos das outras abas vão para um pool pequeno de threads ao final da
+execução e caem no mesmo `FigureCache`, chaveados pela seleção dos
+filtros. Ao trocar de aba, cada gráfico já está pronto (hit), ainda na
+fila (a tarefa é cancelada e ele é renderizado na hora) ou sendo
+renderizado (espera-se o mesmo resultado em vez de renderizar de novo).
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Uma thread: o trabalho de fundo disputa o GIL com os reruns das sessões
+DEFAULT_WORKERS = 1
+
+
+class ChartPrefetcher:
+    """
+    Fila de renderizações para o `FigureCache`, sem duplicar gráficos
+    que já estão no cache ou em andamento
+    """
+
+    def __init__(self, figure_cache, max_workers=DEFAULT_WORKERS):
+        self.figure_cache = figure_cache
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix='prefetch')
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+
+    def submit(self, chart_id, selection_key, build):
+        """
+        Agenda o gráfico. Retorna o Future, ou None se ele já está no cache
+        """
+        key = (chart_id, selection_key)
+        with self._lock:
+            if key in self._pending:
+                return self._pending[key]
+            if key in self.figure_cache:
+                return None
+            future = self._executor.submit(self.figure_cache.get_or_render,
+                                           chart_id, selection_key, build)
+            self._pending[key] = future
+        # Roda também quando a tarefa é cancelada
+        future.add_done_callback(lambda f: self._forget(key, f))
+        return future
+
+    def get_or_render(self, chart_id, selection_key, build):
+        """
+        Como `FigureCache.get_or_render`, aproveitando uma renderização de
+        fundo que já começou
+        """
+        with self._lock:
+            future = self._pending.get((chart_id, selection_key))
+        if future is not None and not future.cancel():
+            try:
+                return future.result()
+            except Exception:
+                # Falhou em segundo plano: tenta de novo aqui, com o erro visível
+                pass
+        return self.figure_cache.get_or_render(chart_id, selection_key, build)
+
+    def cancel(self, futures):
+        """
+        Cancela as tarefas que ainda estão na fila
+        """
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,221 @@
+"""
+Medição por etapa de uma execução do dashboard.
+
+Ligado pela variável de ambiente `DASHBOARD_PROFILE=1` ou pelo parâmetro
+`?profile=1` na URL. Cada etapa envolvida em `profiler.stage(nome)` ganha
+tempo de parede, tempo de CPU da thread (cada sessão do Streamlit roda na
+sua) e o pico de memória alocada durante a etapa (tracemalloc). Etapas
+podem ser aninhadas; o pico de uma etapa inclui o das etapas internas.
+
+Desligado, `stage` devolve sempre o mesmo context manager vazio e o
+tracemalloc nem é iniciado, então o custo é uma chamada de método.
+
+`mark(nome)` registra um instante (tempo desde o início da execução),
+como a primeira pintura da página. O pandas só é importado para montar
+as tabelas, então o profiler pode medir desde antes da carga das
+bibliotecas pesadas.
+
+Ao final de cada execução as etapas podem ser gravadas como uma linha de
+um log JSONL que é rotacionado ao passar de `MAX_LOG_BYTES`.
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+import tracemalloc
+import weakref
+
+ENV_VAR = 'DASHBOARD_PROFILE'
+QUERY_PARAM = 'profile'
+LOG_PATH = os.path.join('.profile', 'dashboard.jsonl')
+MAX_LOG_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 3
+
+_TRUE_VALUES = {'1', 'true', 'yes', 'on'}
+_NULL_STAGE = contextlib.nullcontext()
+
+# O tracemalloc é global ao processo: fica ligado enquanto algum profiler
+# (de qualquer sessão) estiver medindo, e só é desligado por quem o ligou
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_owned = False
+_log_lock = threading.Lock()
+
+
+def is_enabled(query_params=None):
+    """
+    True se o profiling foi pedido pelo ambiente ou pela URL
+    """
+    values = [os.environ.get(ENV_VAR, '')]
+    if query_params is not None:
+        values.append(query_params.get(QUERY_PARAM, ''))
+    return any(str(value).strip().lower() in _TRUE_VALUES for value in values)
+
+
+def _start_tracing():
+    global _tracing_users, _tracing_owned
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_owned = True
+        _tracing_users += 1
+
+
+def _stop_tracing():
+    global _tracing_users, _tracing_owned
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _tracing_owned:
+            tracemalloc.stop()
+            _tracing_owned = False
+
+
+class Profiler:
+    """
+    Etapas medidas de uma execução, na ordem em que começaram
+    """
+
+    def __init__(self, enabled=False, trace_memory=True):
+        self.enabled = enabled
+        self.records = []
+        self.total = None
+        self._stack = []
+        self._trace_memory = enabled and trace_memory
+        self._release = None
+        if self._trace_memory:
+            _start_tracing()
+            # Libera o tracemalloc mesmo se a execução for interrompida antes de finish()
+            self._release = weakref.finalize(self, _stop_tracing)
+        self._wall = time.perf_counter()
+        self._cpu = time.thread_time()
+
+    def stage(self, name):
+        """
+        Context manager que mede a etapa `name`
+        """
+        if not self.enabled:
+            return _NULL_STAGE
+        return self._measure(name)
+
+    @contextlib.contextmanager
+    def _measure(self, name):
+        record = {'stage': name, 'depth': len(self._stack)}
+        frame = {'record': record, 'start_memory': 0, 'peak': 0}
+        if self._trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                # O pico até aqui pertence à etapa de fora
+                self._stack[-1]['peak'] = max(self._stack[-1]['peak'], peak)
+            tracemalloc.reset_peak()
+            frame['start_memory'] = frame['peak'] = current
+        self._stack.append(frame)
+        self.records.append(record)
+
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            record['wall_ms'] = (time.perf_counter() - wall) * 1000
+            record['cpu_ms'] = (time.thread_time() - cpu) * 1000
+            self._stack.pop()
+            if self._trace_memory:
+                peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+                record['peak_kb'] = (peak - frame['start_memory']) / 1024
+                if self._stack:
+                    self._stack[-1]['peak'] = max(self._stack[-1]['peak'], peak)
+
+    def mark(self, name):
+        """
+        Registra o instante `name`: tempo de parede e de CPU desde o início
+        da execução
+        """
+        if self.enabled:
+            self.records.append({'stage': name, 'depth': len(self._stack), 'mark': True,
+                                 'wall_ms': (time.perf_counter() - self._wall) * 1000,
+                                 'cpu_ms': (time.thread_time() - self._cpu) * 1000})
+
+    def annotate(self, **info):
+        """
+        Acrescenta informações (ex.: hit/miss de cache) à etapa em andamento
+        """
+        if self.enabled and self._stack:
+            self._stack[-1]['record'].update(info)
+
+    def finish(self):
+        """
+        Fecha a execução: guarda o total e libera o tracemalloc
+        """
+        if not self.enabled or self.total is not None:
+            return self.total
+        self.total = {
+            'wall_ms': (time.perf_counter() - self._wall) * 1000,
+            'cpu_ms': (time.thread_time() - self._cpu) * 1000,
+        }
+        if self._release is not None:
+            self._release()
+        return self.total
+
+    def summary(self):
+        """
+        Tabela das etapas (internas recuadas sob a de fora) + total. Os
+        instantes de `mark` aparecem com o tempo desde o início.
+        """
+        import pandas as pd
+
+        rows = [{
+            'etapa': '  ' * max(r['depth'] - 1, 0) + '↳ ' * bool(r['depth']) + r['stage']
+                     + (' (desde o início)' if r.get('mark') else ''),
+            'parede (ms)': r.get('wall_ms'),
+            'CPU (ms)': r.get('cpu_ms'),
+            'pico (KB)': r.get('peak_kb'),
+            'cache': r.get('cache', ''),
+        } for r in self.records]
+        if self.total is not None:
+            rows.append({'etapa': 'total', 'parede (ms)': self.total['wall_ms'],
+                         'CPU (ms)': self.total['cpu_ms'], 'pico (KB)': None, 'cache': ''})
+        return pd.DataFrame(rows).round(2)
+
+    def write_log(self, path=LOG_PATH, max_bytes=MAX_LOG_BYTES, backups=LOG_BACKUPS, **meta):
+        """
+        Acrescenta a execução como uma linha JSON em `path`
+        """
+        entry = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), **meta,
+                 'total': self.total, 'stages': self.records}
+        line = json.dumps(entry, ensure_ascii=False, default=str) + '\n'
+        with _log_lock:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            if os.path.exists(path) and os.path.getsize(path) + len(line) > max_bytes:
+                _rotate(path, backups)
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(line)
+
+
+def _rotate(path, backups):
+    # path -> path.1 -> path.2 ...; o mais antigo é descartado
+    for i in range(backups - 1, 0, -1):
+        if os.path.exists(f'{path}.{i}'):
+            os.replace(f'{path}.{i}', f'{path}.{i + 1}')
+    if backups > 0:
+        os.replace(path, f'{path}.1')
+    else:
+        os.remove(path)
+
+
+def read_log(path=LOG_PATH):
+    """
+    Etapas de todas as execuções do log (arquivos rotacionados incluídos)
+    num DataFrame, uma linha por etapa
+    """
+    import pandas as pd
+
+    paths = sorted((p for p in os.listdir(os.path.dirname(path) or '.')
+                    if p.startswith(os.path.basename(path))), reverse=True)
+    rows = []
+    for name in paths:
+        with open(os.path.join(os.path.dirname(path), name), encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                for record in entry['stages']:
+                    rows.append({'timestamp': entry['timestamp'], **record})
+    return pd.DataFrame(rows)
@@ -0,0 +1,350 @@
+"""
+Busca de músicas parecidas pelos vetores de características e temas.
+
+Cada música vira um vetor float32 com as características de áudio e os
+temas das letras, padronizados (média 0, desvio 1) e com peso por grupo
+para que áudio e temas pesem o mesmo na distância, apesar de haver 16
+temas e 6 características. A distância é a euclidiana ao quadrado.
+
+- `exact_search` é a busca exata: força bruta vetorizada, em blocos de
+  linhas para a matriz de distâncias não crescer com o dataset.
+- `SimilarityIndex` é o índice aproximado no estilo IVF: um k-means
+  (treinado numa amostra) divide os vetores em listas, gravadas contíguas
+  na ordem das listas; a consulta só varre as `nprobe` listas de
+  centróides mais próximos. O índice é montado uma vez por versão do
+  store e gravado ao lado do cache num arquivo Arrow, aberto com memory
+  map. Lotes acrescentados depois ficam numa cauda varrida por inteiro.
+
+A linha de comando mede recall e latência do índice contra a busca exata:
+
+    python similarity.py music_com_decade.csv --queries 200 --k 10 --nprobe 1 4 16 64
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from data_cache import AUDIO_FEATURES, TEMAS
+
+FEATURE_GROUPS = (AUDIO_FEATURES, TEMAS)
+FEATURES = [f for group in FEATURE_GROUPS for f in group]
+# Linhas por bloco da força bruta: (consultas × bloco) distâncias por vez
+BLOCK_SIZE = 65_536
+DEFAULT_NPROBE = 16
+KMEANS_ITERATIONS = 10
+# Pontos de treino do k-means por lista
+TRAIN_PER_LIST = 64
+
+
+def vectorize(df, mean, scale, features=FEATURES):
+    """
+    Vetores padronizados (linhas × características) de `df`; nulos ficam
+    na média
+    """
+    values = df[features].to_numpy(dtype=np.float32, na_value=np.nan)
+    vectors = (values - mean) / scale
+    return np.nan_to_num(vectors, nan=0.0).astype(np.float32, copy=False)
+
+
+def _scaling(df, features=FEATURES, groups=FEATURE_GROUPS):
+    # Média e escala por coluna: desvio padrão × √(colunas do grupo), para
+    # cada grupo contribuir com a mesma variância esperada
+    values = df[features].to_numpy(dtype=np.float64, na_value=np.nan)
+    mean = np.nan_to_num(np.nanmean(values, axis=0)) if len(values) else np.zeros(len(features))
+    std = np.nan_to_num(np.nanstd(values, axis=0)) if len(values) else np.ones(len(features))
+    group_size = {f: len(group) for group in groups for f in group}
+    group_size = np.array([group_size.get(f, 1) for f in features])
+    scale = np.where(std > 0, std, 1.0) * np.sqrt(group_size)
+    return mean.astype(np.float32), scale.astype(np.float32)
+
+
+def _smallest(distances, k):
+    # Colunas das k menores distâncias de cada linha, em ordem crescente
+    k = min(k, distances.shape[1])
+    if k < distances.shape[1]:
+        candidates = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(distances.shape[1]), distances.shape)
+    order = np.take_along_axis(distances, candidates, axis=1).argsort(axis=1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+def _squared_distances(block, queries, query_norms):
+    # ‖x‖² − 2x·q + ‖q‖², (consultas × linhas do bloco)
+    distances = np.einsum('ij,ij->i', block, block)[None, :] - 2 * (queries @ block.T)
+    distances += query_norms[:, None]
+    return np.maximum(distances, 0, out=distances)
+
+
+def exact_search(vectors, queries, k, mask=None, block_size=BLOCK_SIZE):
+    """
+    k vizinhos exatos de cada consulta em `vectors`, varrendo `block_size`
+    linhas por vez. `mask` (booleano por linha) restringe os candidatos.
+    Retorna (posições, distâncias), (consultas × k), com -1/inf quando há
+    menos de k candidatos.
+    """
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    query_norms = np.einsum('ij,ij->i', queries, queries)
+    best_positions = np.empty((len(queries), 0), dtype=np.int64)
+    best_distances = np.empty((len(queries), 0), dtype=np.float32)
+    for start in range(0, len(vectors), block_size):
+        block = vectors[start:start + block_size]
+        positions = np.arange(start, start + len(block))
+        if mask is not None:
+            selected = np.flatnonzero(mask[start:start + block_size])
+            block, positions = block[selected], positions[selected]
+        if not len(block):
+            continue
+        distances = _squared_distances(block, queries, query_norms)
+        # Top-k do bloco, depois juntado ao top-k acumulado
+        top = _smallest(distances, k)
+        distances = np.hstack([best_distances, np.take_along_axis(distances, top, axis=1)])
+        positions = np.hstack([best_positions, positions[top]])
+        top = _smallest(distances, k)
+        best_distances = np.take_along_axis(distances, top, axis=1)
+        best_positions = np.take_along_axis(positions, top, axis=1)
+
+    missing = k - best_positions.shape[1]
+    if missing > 0:
+        best_positions = np.pad(best_positions, ((0, 0), (0, missing)), constant_values=-1)
+        best_distances = np.pad(best_distances, ((0, 0), (0, missing)), constant_values=np.inf)
+    return best_positions, best_distances
+
+
+def assign(vectors, centroids, block_size=BLOCK_SIZE):
+    """
+    Centróide mais próximo de cada vetor, em blocos
+    """
+    centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), block_size):
+        block = vectors[start:start + block_size]
+        # ‖x‖² é o mesmo para todos os centróides e não muda o argmin
+        distances = centroid_norms[None, :] - 2 * (block @ centroids.T)
+        labels[start:start + len(block)] = distances.argmin(axis=1)
+    return labels
+
+
+def kmeans(vectors, n_lists, iterations=KMEANS_ITERATIONS, seed=0):
+    """
+    Centróides de Lloyd, começando de vetores sorteados; listas que ficam
+    vazias recebem outro vetor sorteado
+    """
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].astype(np.float32)
+    for _ in range(iterations):
+        labels = assign(vectors, centroids)
+        counts = np.bincount(labels, minlength=n_lists)
+        sums = np.stack([np.bincount(labels, weights=vectors[:, j], minlength=n_lists)
+                         for j in range(vectors.shape[1])], axis=1)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        centroids[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+    return centroids
+
+
+class SimilarityIndex:
+    """
+    Vetores agrupados por lista do IVF. `rows` dá o row id (do snapshot) de
+    cada vetor; as linhas dos lotes acrescentados ficam na cauda.
+    """
+
+    def __init__(self, features, mean, scale, centroids, offsets, vectors, rows):
+        self.features = list(features)
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.scale = np.asarray(scale, dtype=np.float32)
+        self.centroids = np.asarray(centroids, dtype=np.float32).reshape(-1, len(self.features))
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.vectors = vectors
+        self.rows = rows
+        # (vetores, row ids) da cauda, trocados juntos em `append`
+        self._tail = (np.empty((0, len(self.features)), dtype=np.float32),
+                      np.empty(0, dtype=np.int64))
+
+    @property
+    def n_rows(self):
+        return len(self.rows) + len(self._tail[1])
+
+    @classmethod
+    def from_frame(cls, df, features=FEATURES, n_lists=None, seed=0):
+        """
+        Treina o k-means numa amostra de `TRAIN_PER_LIST` vetores por lista
+        (√n listas por padrão) e agrupa todos os vetores pela lista
+        """
+        mean, scale = _scaling(df, features)
+        vectors = vectorize(df, mean, scale, features)
+        n_lists = min(n_lists or max(1, int(np.sqrt(len(vectors)))), max(len(vectors), 1))
+        if len(vectors):
+            rng = np.random.default_rng(seed)
+            sample = vectors[rng.choice(len(vectors), min(len(vectors), TRAIN_PER_LIST * n_lists),
+                                        replace=False)]
+            centroids = kmeans(sample, n_lists, seed=seed)
+            labels = assign(vectors, centroids)
+        else:
+            centroids = np.zeros((n_lists, len(features)), dtype=np.float32)
+            labels = np.empty(0, dtype=np.int32)
+        order = np.argsort(labels, kind='stable')
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=n_lists))])
+        rows = order.astype(np.int64 if len(order) >= 2 ** 31 else np.int32)
+        return cls(features, mean, scale, centroids, offsets, vectors[order], rows)
+
+    def save(self, path):
+        """
+        Grava o índice em `path` (Arrow IPC, sem compressão): vetores e row
+        ids na ordem das listas; centróides e escala nos metadados. A cauda
+        entra no fim da lista do centróide mais próximo.
+        """
+        vectors, rows, offsets = self.vectors, self.rows, self.offsets
+        tail_vectors, tail_rows = self._tail
+        if len(tail_rows):
+            labels = np.concatenate([np.repeat(np.arange(len(offsets) - 1), np.diff(offsets)),
+                                     assign(tail_vectors, self.centroids)])
+            order = np.argsort(labels, kind='stable')
+            vectors = np.concatenate([vectors, tail_vectors])[order]
+            rows = np.concatenate([rows, tail_rows])[order]
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=len(offsets) - 1))])
+        meta = {'features': self.features, 'mean': self.mean.tolist(), 'scale': self.scale.tolist(),
+                'centroids': self.centroids.tolist(), 'offsets': offsets.tolist()}
+        flat = pa.array(np.ascontiguousarray(vectors, dtype=np.float32).ravel())
+        table = pa.table({'rows': rows,
+                          'vectors': pa.FixedSizeListArray.from_arrays(flat, len(self.features))})
+        table = table.replace_schema_metadata({'similarity': json.dumps(meta)})
+        feather.write_feather(table, path, compression='uncompressed',
+                              chunksize=max(table.num_rows, 1))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Abre um índice gravado por `save`; vetores e row ids são views
+        somente leitura do arquivo
+        """
+        table = feather.read_table(path, memory_map=True)
+        meta = json.loads(table.schema.metadata[b'similarity'])
+        n_features = len(meta['features'])
+        if table.num_rows:
+            rows = table['rows'].chunk(0).to_numpy()
+            # Um único chunk sem offset: os valores da lista são os vetores, sem cópia
+            vectors = table['vectors'].chunk(0).values.to_numpy().reshape(-1, n_features)
+        else:
+            rows = np.empty(0, dtype=np.int32)
+            vectors = np.empty((0, n_features), dtype=np.float32)
+        return cls(meta['features'], meta['mean'], meta['scale'], meta['centroids'],
+                   meta['offsets'], vectors, rows)
+
+    def append(self, batch):
+        """
+        Acrescenta um lote (row ids n_rows .. n_rows + len(lote)) à cauda,
+        com a escala e os centróides já treinados
+        """
+        tail_vectors, tail_rows = self._tail
+        new_rows = np.arange(self.n_rows, self.n_rows + len(batch), dtype=np.int64)
+        self._tail = (np.concatenate([tail_vectors, self.vectorize(batch)]),
+                      np.concatenate([tail_rows, new_rows]))
+
+    def vectorize(self, df):
+        return vectorize(df, self.mean, self.scale, self.features)
+
+    def _top(self, query, vectors, rows, k, mask, exclude):
+        # k melhores entre os candidatos, sem `exclude` e fora da máscara
+        keep = np.ones(len(rows), dtype=bool)
+        if mask is not None:
+            keep &= mask[rows]
+        if exclude is not None:
+            keep &= rows != exclude
+        positions, distances = exact_search(vectors, query, k, keep)
+        found = positions[0] >= 0
+        return rows[positions[0][found]].astype(np.int64), distances[0][found]
+
+    def _merge(self, parts, k):
+        rows = np.concatenate([r for r, _ in parts])
+        distances = np.concatenate([d for _, d in parts])
+        order = np.argsort(distances, kind='stable')[:k]
+        return rows[order], distances[order]
+
+    def exact(self, query, k=10, mask=None, exclude=None):
+        """
+        k vizinhos exatos de `query` (vetor de `vectorize`). `mask` é um
+        booleano por row id. Retorna (row ids, distâncias), em ordem.
+        """
+        tail_vectors, tail_rows = self._tail
+        return self._merge([self._top(query, self.vectors, self.rows, k, mask, exclude),
+                            self._top(query, tail_vectors, tail_rows, k, mask, exclude)], k)
+
+    def search(self, query, k=10, nprobe=DEFAULT_NPROBE, mask=None, exclude=None):
+        """
+        k vizinhos aproximados: só as `nprobe` listas mais próximas e a
+        cauda. Se elas não têm k candidatos (filtros muito estreitos),
+        cai na busca exata.
+        """
+        query = np.asarray(query, dtype=np.float32).reshape(1, -1)
+        lists = _smallest(_squared_distances(self.centroids, query, np.einsum('ij,ij->i', query, query)),
+                          nprobe)[0]
+        spans = [(self.offsets[i], self.offsets[i + 1]) for i in np.sort(lists)]
+        vectors = np.concatenate([self.vectors[a:b] for a, b in spans])
+        rows = np.concatenate([self.rows[a:b] for a, b in spans])
+        tail_vectors, tail_rows = self._tail
+        rows, distances = self._merge([self._top(query, vectors, rows, k, mask, exclude),
+                                       self._top(query, tail_vectors, tail_rows, k, mask, exclude)], k)
+        if len(rows) < k:
+            return self.exact(query, k, mask, exclude)
+        return rows, distances
+
+
+def benchmark(index, df, n_queries=200, k=10, nprobes=(1, 4, DEFAULT_NPROBE, 64), seed=0):
+    """
+    Recall@k e latência por consulta do índice contra a busca exata, com
+    músicas sorteadas do próprio dataset como consultas
+    """
+    rng = np.random.default_rng(seed)
+    query_rows = rng.choice(len(df), min(n_queries, len(df)), replace=False)
+    queries = index.vectorize(df.iloc[query_rows])
+
+    def timed(search):
+        results, seconds = [], []
+        for query, row in zip(queries, query_rows):
+            start = time.perf_counter()
+            results.append(search(query, row)[0])
+            seconds.append(time.perf_counter() - start)
+        return results, np.array(seconds) * 1000
+
+    truth, exact_ms = timed(lambda query, row: index.exact(query, k, exclude=row))
+    records = [{'method': 'exact', 'nprobe': None, 'recall': 1.0,
+                'p50_ms': np.median(exact_ms), 'p95_ms': np.percentile(exact_ms, 95)}]
+    for nprobe in nprobes:
+        found, ms = timed(lambda query, row: index.search(query, k, nprobe, exclude=row))
+        recall = np.mean([len(np.intersect1d(a, b)) / max(len(b), 1) for a, b in zip(found, truth)])
+        records.append({'method': 'ivf', 'nprobe': nprobe, 'recall': recall,
+                        'p50_ms': np.median(ms), 'p95_ms': np.percentile(ms, 95)})
+    results = pd.DataFrame(records)
+    results['nprobe'] = results['nprobe'].astype('Int64')
+    return results
+
+
+def main():
+    import data_cache
+    from dataset import load_similarity
+
+    parser = argparse.ArgumentParser(description="Recall e latência da busca de músicas parecidas")
+    parser.add_argument('csv', nargs='?', default='music_com_decade.csv')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, DEFAULT_NPROBE, 64])
+    parser.add_argument('--cache-dir', default=data_cache.CACHE_DIR)
+    args = parser.parse_args()
+
+    df = data_cache.load_snapshot(args.csv, args.cache_dir)
+    start = time.perf_counter()
+    index = load_similarity(args.csv, args.cache_dir, df)
+    print(f"Índice: {index.n_rows:,} músicas, {len(index.centroids)} listas, "
+          f"{len(index.features)} dimensões ({time.perf_counter() - start:.2f} s para abrir/montar)")
+    results = benchmark(index, df, args.queries, args.k, args.nprobe)
+    with pd.option_context('display.width', 120):
+        print(results.round({'recall': 3, 'p50_ms': 2, 'p95_ms': 2}).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
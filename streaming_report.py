@@ -0,0 +1,539 @@
+"""
+Relatório de qualidade e estatísticas do notebook sem o CSV em memória.
+
+`analyze` lê o CSV em chunks e, num único passe, acumula o que
+`analise.ipynb` calcula com o frame inteiro:
+
+- nulos por coluna (`df.isnull().sum()`) e a checagem de ranges de
+  `verificar_qualidade_dados`;
+- momentos de cada coluna numérica (contagem, média, desvio, mínimo,
+  máximo, assimetria e curtose, como em `df.describe()`, `skew()` e
+  `kurt()`), juntados entre chunks pelas fórmulas de Chan/Pébay;
+- co-momentos de cada par de colunas, só com as linhas em que as duas
+  existem, como no `df.corr()` do pandas, juntados do mesmo jeito;
+- médias por década e por gênero; as somas de cada grupo são exatas
+  (partes inteiras em grades cada vez mais finas, como em
+  `parallel_agg`) e só são arredondadas no fim.
+
+Esses acumuladores têm tamanho fixo (colunas, pares de colunas, grupos),
+qualquer que seja o número de linhas. A exceção são as linhas duplicadas
+(`df.duplicated().sum()`), que saem de um hash de 64 bits por linha: são
+8 bytes por linha em memória, O(linhas), bem menos que o frame. Quando
+há hashes repetidos, um segundo passe lê só as linhas candidatas e as
+compara de verdade, então colisões de hash não viram duplicatas.
+
+Uso:
+    python streaming_report.py music.csv
+    python streaming_report.py music.csv --chunksize 100000 --verify
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from cube import merge_categories
+from data_cache import AUDIO_FEATURES, TEMAS, years_of
+from mood import CHUNKSIZE
+from parallel_agg import grid_sums, grid_total, max_abs
+
+# Ranges esperados de `verificar_qualidade_dados` (None = sem limite)
+RANGES = {
+    'danceability': (0, 1),
+    'acousticness': (0, 1),
+    'instrumentalness': (0, 1),
+    'valence': (0, 1),
+    'energy': (0, 1),
+    'loudness': (-60, 5),
+    'len': (1, 1000),
+    'age': (0, 100),
+    **{tema: (0, None) for tema in TEMAS},
+}
+# Colunas que o notebook descarta antes das estatísticas
+DROP_COLUMNS = ('Unnamed: 0',)
+GROUP_KEYS = ('decade', 'genre')
+GROUP_COLUMNS = AUDIO_FEATURES + TEMAS
+CORR_COLUMNS = ['danceability', 'energy', 'valence', 'loudness', 'acousticness', 'instrumentalness']
+
+_NULL_HASH = np.uint64(0x9E3779B97F4A7C15)
+_HASH_PRIME = np.uint64(0x100000001B3)
+
+
+def _normalized(column):
+    # Mesma representação em todos os chunks: números em float64 (1 e 1.0
+    # são iguais, como no frame inteiro) e o resto como objeto
+    if pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column):
+        return column.astype(np.float64)
+    return column.astype(object)
+
+
+def row_hashes(chunk):
+    """
+    Hash de 64 bits de cada linha; nulos têm o mesmo hash em qualquer coluna
+    """
+    combined = np.zeros(len(chunk), dtype=np.uint64)
+    for name in chunk.columns:
+        column = _normalized(chunk[name])
+        hashes = pd.util.hash_pandas_object(column, index=False).to_numpy()
+        hashes = np.where(column.isna().to_numpy(), _NULL_HASH, hashes)
+        combined = (combined ^ hashes) * _HASH_PRIME
+    return combined
+
+
+def group_keys(chunk, key):
+    """
+    Chave de agrupamento de cada linha: a década vem da coluna `decade` ou
+    do ano de lançamento; o gênero é normalizado como no notebook
+    """
+    if key == 'decade' and 'decade' not in chunk.columns:
+        return years_of(chunk) // 10 * 10
+    if key == 'genre':
+        return chunk['genre'].str.lower().str.strip().to_numpy(dtype=object, na_value=None)
+    return chunk[key].to_numpy()
+
+
+class ColumnMoments:
+    """
+    Contagem, média, somas dos desvios à 2ª, 3ª e 4ª potência, mínimo e
+    máximo de cada coluna (nulos ignorados)
+    """
+
+    def __init__(self, n, mean, m2, m3, m4, minimum, maximum):
+        self.n, self.mean, self.m2, self.m3, self.m4 = n, mean, m2, m3, m4
+        self.min, self.max = minimum, maximum
+
+    @classmethod
+    def from_values(cls, values):
+        """
+        Momentos de uma matriz (linhas × colunas) com NaN nos nulos
+        """
+        valid = ~np.isnan(values)
+        n = valid.sum(axis=0).astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(n > 0, np.where(valid, values, 0).sum(axis=0) / n, 0.0)
+        deviations = np.where(valid, values - mean, 0.0)
+        squares = deviations ** 2
+        has_values = n > 0
+        minimum = np.where(has_values, np.where(valid, values, np.inf).min(axis=0), np.nan)
+        maximum = np.where(has_values, np.where(valid, values, -np.inf).max(axis=0), np.nan)
+        return cls(n, mean, squares.sum(axis=0), (squares * deviations).sum(axis=0),
+                   (squares ** 2).sum(axis=0), minimum, maximum)
+
+    def merge(self, other):
+        """
+        Junta os momentos de outro bloco das mesmas colunas
+        """
+        na, nb = self.n, other.n
+        n = na + nb
+        with np.errstate(invalid='ignore', divide='ignore'):
+            delta = np.where(n > 0, other.mean - self.mean, 0.0)
+            n = np.where(n > 0, n, 1.0)
+            mean = self.mean + delta * nb / n
+            m2 = self.m2 + other.m2 + delta ** 2 * na * nb / n
+            m3 = (self.m3 + other.m3 + delta ** 3 * na * nb * (na - nb) / n ** 2
+                  + 3 * delta * (na * other.m2 - nb * self.m2) / n)
+            m4 = (self.m4 + other.m4 + delta ** 4 * na * nb * (na ** 2 - na * nb + nb ** 2) / n ** 3
+                  + 6 * delta ** 2 * (na ** 2 * other.m2 + nb ** 2 * self.m2) / n ** 2
+                  + 4 * delta * (na * other.m3 - nb * self.m3) / n)
+        self.n = na + nb
+        self.mean, self.m2, self.m3, self.m4 = mean, m2, m3, m4
+        self.min = np.fmin(self.min, other.min)
+        self.max = np.fmax(self.max, other.max)
+
+    def table(self, columns):
+        """
+        count, mean, std, min, max, skew e kurt por coluna, com as mesmas
+        fórmulas (amostrais) do pandas
+        """
+        n, m2, m3, m4 = self.n, self.m2, self.m3, self.m4
+        with np.errstate(invalid='ignore', divide='ignore'):
+            std = np.where(n > 1, np.sqrt(m2 / (n - 1)), np.nan)
+            skew = (n * (n - 1) ** 0.5 / (n - 2)) * (m3 / m2 ** 1.5)
+            skew = np.where(n < 3, np.nan, np.where(m2 == 0, 0.0, skew))
+            kurt = (n * (n + 1) * (n - 1) * m4 / ((n - 2) * (n - 3) * m2 ** 2)
+                    - 3 * (n - 1) ** 2 / ((n - 2) * (n - 3)))
+            kurt = np.where(n < 4, np.nan, np.where(m2 == 0, 0.0, kurt))
+        return pd.DataFrame({'count': n, 'mean': np.where(n > 0, self.mean, np.nan), 'std': std,
+                             'min': self.min, 'max': self.max, 'skew': skew, 'kurt': kurt},
+                            index=columns).T
+
+
+class Comoments:
+    """
+    Estatísticas de cada par de colunas (i, j) nas linhas em que as duas
+    existem: contagem, médias de i e de j, co-momento e somas dos desvios
+    ao quadrado de i e de j (matrizes colunas × colunas)
+    """
+
+    def __init__(self, n, mean_i, mean_j, c, m2_i, m2_j):
+        self.n, self.mean_i, self.mean_j = n, mean_i, mean_j
+        self.c, self.m2_i, self.m2_j = c, m2_i, m2_j
+
+    @classmethod
+    def from_values(cls, values):
+        valid = ~np.isnan(values)
+        mask = valid.astype(np.float64)
+        # Desvios da média do bloco, para as somas não perderem precisão
+        counts = mask.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            shift = np.where(counts > 0, np.where(valid, values, 0).sum(axis=0) / counts, 0.0)
+        centered = np.where(valid, values - shift, 0.0)
+        n = mask.T @ mask
+        # sums[i, j] = soma dos desvios de i nas linhas em que j também existe
+        sums = centered.T @ mask
+        squares = (centered ** 2).T @ mask
+        products = centered.T @ centered
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_i = np.where(n > 0, sums / n, 0.0)
+        mean_j = mean_i.T
+        c = products - mean_i * sums.T
+        m2_i = squares - mean_i * sums
+        return cls(n, mean_i + shift[:, None], mean_j + shift[None, :], c, m2_i, m2_i.T)
+
+    def merge(self, other):
+        na, nb = self.n, other.n
+        n = na + nb
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weight = np.where(n > 0, na * nb / np.where(n > 0, n, 1.0), 0.0)
+            share = np.where(n > 0, nb / np.where(n > 0, n, 1.0), 0.0)
+        delta_i = other.mean_i - self.mean_i
+        delta_j = other.mean_j - self.mean_j
+        self.c = self.c + other.c + delta_i * delta_j * weight
+        self.m2_i = self.m2_i + other.m2_i + delta_i ** 2 * weight
+        self.m2_j = self.m2_j + other.m2_j + delta_j ** 2 * weight
+        self.mean_i = self.mean_i + delta_i * share
+        self.mean_j = self.mean_j + delta_j * share
+        self.n = n
+
+    def cov(self, columns):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return pd.DataFrame(np.where(self.n > 1, self.c / (self.n - 1), np.nan),
+                                index=columns, columns=columns)
+
+    def corr(self, columns):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = np.clip(self.c / np.sqrt(self.m2_i * self.m2_j), -1, 1)
+        corr = np.where(self.n > 1, corr, np.nan)
+        return pd.DataFrame(corr, index=columns, columns=columns)
+
+
+class GroupMeans:
+    """
+    Médias de `columns` por valor de uma chave. As partes inteiras das
+    somas de cada chunk (`parallel_agg.grid_sums`) entram num acumulador
+    inteiro exato, numa grade por coluna que só fica mais fina quando um
+    chunk precisa; só os valores não finitos são somados em float. A
+    memória não depende do número de chunks.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.categories = None
+        shape = (0, len(self.columns))
+        self.nonnull = np.zeros(shape, dtype=np.int64)
+        # Soma exata das partes inteiras (int do Python) na grade 2^-scales[j]
+        self.hi_sums = np.zeros(shape, dtype=object)
+        self.scales = [None] * len(self.columns)
+        # Soma dos valores não finitos (inf e nan propagam como no pandas)
+        self.lo_sums = np.zeros(shape)
+
+    def _grow(self, merged, positions):
+        def grow(array):
+            grown = np.zeros((len(merged),) + array.shape[1:], dtype=array.dtype)
+            grown[positions] = array
+            return grown
+        self.nonnull, self.hi_sums, self.lo_sums = (grow(self.nonnull), grow(self.hi_sums),
+                                                    grow(self.lo_sums))
+        self.categories = merged
+
+    def _add_hi(self, j, hi_sums, scale):
+        # Leva o acumulador e as somas do chunk para a grade mais fina das duas
+        if self.scales[j] is None or scale > self.scales[j]:
+            if self.scales[j] is not None:
+                self.hi_sums[:, j] *= 1 << (scale - self.scales[j])
+            self.scales[j] = scale
+        shift = 1 << (self.scales[j] - scale)
+        self.hi_sums[:, j] += np.array([int(h) * shift for h in hi_sums], dtype=object)
+
+    def update(self, keys, values):
+        if self.categories is None:
+            self.categories = np.empty(0, dtype=np.asarray(keys).dtype)
+        merged, positions = merge_categories(self.categories, keys)
+        if len(merged) != len(self.categories):
+            self._grow(merged, positions)
+        codes = pd.Categorical(keys, categories=self.categories).codes
+        n_groups = len(self.categories)
+
+        # Grades em que a soma das partes inteiras do chunk é exata em float64
+        bits = 52 - int(np.ceil(np.log2(len(values) + 1)))
+        for j in range(len(self.columns)):
+            valid = (codes >= 0) & ~np.isnan(values[:, j])
+            column_codes, v = codes[valid], values[valid, j]
+            scale = int(bits - np.frexp(max_abs(v))[1])
+            levels, lo_sums = grid_sums(column_codes, v, n_groups, scale, bits)
+            for k, level in enumerate(levels):
+                self._add_hi(j, level, scale + k * bits)
+            self.lo_sums[:, j] += lo_sums
+            self.nonnull[:, j] += np.bincount(column_codes, minlength=n_groups)
+
+    def means(self, name=None):
+        """
+        Equivalente a `df.groupby(chave)[columns].mean()`
+        """
+        means = np.full(self.nonnull.shape, np.nan)
+        for (g, j), count in np.ndenumerate(self.nonnull):
+            if count == 0:
+                continue
+            if self.lo_sums[g, j] != 0:
+                means[g, j] = self.lo_sums[g, j]
+                continue
+            # Um único arredondamento da soma exata
+            means[g, j] = float(grid_total([self.hi_sums[g, j]], self.scales[j], 0)) / count
+        categories = self.categories if self.categories is not None else []
+        return pd.DataFrame(means, index=pd.Index(categories, name=name), columns=self.columns)
+
+
+class StreamingReport:
+    """
+    Acumuladores de um passe pelo CSV. Depois de `analyze`, os resultados
+    saem de `nulls`, `duplicates`, `ranges()`, `describe()`, `corr()`,
+    `cov()` e `group_means()`. Só os hashes das linhas (para as
+    duplicatas) crescem com o CSV.
+    """
+
+    def __init__(self, ranges=RANGES, drop=DROP_COLUMNS, group_by=GROUP_KEYS,
+                 group_columns=GROUP_COLUMNS):
+        self.expected = dict(ranges)
+        self.drop = list(drop)
+        self.n_rows = 0
+        self.null_counts = {}
+        self.columns = None
+        self.moments = None
+        self.comoments = None
+        self.below = None
+        self.above = None
+        self.group_by = list(group_by)
+        self.group_columns = list(group_columns)
+        self.groups = {}
+        self.duplicates = None
+        self._hashes = []
+
+    def update(self, chunk):
+        """
+        Acumula um chunk do CSV, com as colunas como foram lidas
+        """
+        self.n_rows += len(chunk)
+        for name, count in chunk.isna().sum().items():
+            self.null_counts[name] = self.null_counts.get(name, 0) + int(count)
+        self._hashes.append(row_hashes(chunk))
+
+        chunk = chunk.drop(columns=self.drop, errors='ignore')
+        if self.columns is None:
+            # Colunas numéricas do primeiro chunk, como no describe() do frame;
+            # as que vêm só com nulos nele podem ser texto e ficam de fora
+            self.columns = [name for name in chunk.columns
+                            if pd.api.types.is_numeric_dtype(chunk[name])
+                            and not pd.api.types.is_bool_dtype(chunk[name])
+                            and chunk[name].notna().any()]
+            self.below = np.zeros(len(self.columns), dtype=np.int64)
+            self.above = np.zeros(len(self.columns), dtype=np.int64)
+            self.group_columns = [c for c in self.group_columns if c in self.columns]
+            self.groups = {key: GroupMeans(self.group_columns) for key in self.group_by}
+        values = np.column_stack([
+            pd.to_numeric(chunk[name], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+            for name in self.columns]) if self.columns else np.empty((len(chunk), 0))
+
+        moments, comoments = ColumnMoments.from_values(values), Comoments.from_values(values)
+        if self.moments is None:
+            self.moments, self.comoments = moments, comoments
+        else:
+            self.moments.merge(moments)
+            self.comoments.merge(comoments)
+
+        for j, name in enumerate(self.columns):
+            low, high = self.expected.get(name, (None, None))
+            if low is not None:
+                self.below[j] += np.count_nonzero(values[:, j] < low)
+            if high is not None:
+                self.above[j] += np.count_nonzero(values[:, j] > high)
+
+        group_values = values[:, [self.columns.index(c) for c in self.group_columns]]
+        for key, groups in self.groups.items():
+            groups.update(group_keys(chunk, key), group_values)
+
+    def candidate_hashes(self):
+        """
+        Hashes de mais de uma linha: as únicas que podem ser duplicatas
+        """
+        hashes = np.sort(np.concatenate(self._hashes)) if self._hashes else np.empty(0, np.uint64)
+        return np.unique(hashes[1:][hashes[1:] == hashes[:-1]])
+
+    def count_duplicates(self, chunks):
+        """
+        Conta as duplicatas comparando só as linhas candidatas. `chunks`
+        percorre o CSV de novo, na mesma ordem; não é lido se nenhum hash
+        se repete.
+        """
+        candidates = self.candidate_hashes()
+        if not len(candidates):
+            self.duplicates = 0
+            return self.duplicates
+        rows = []
+        for chunk, hashes in zip(chunks, self._hashes):
+            selected = np.isin(hashes, candidates)
+            if selected.any():
+                rows.append(chunk[selected].apply(_normalized))
+        self.duplicates = int(pd.concat(rows, ignore_index=True).duplicated().sum())
+        return self.duplicates
+
+    @property
+    def nulls(self):
+        """
+        Equivalente a `df.isnull().sum()`
+        """
+        return pd.Series(self.null_counts, dtype=np.int64)
+
+    def describe(self):
+        """
+        count, mean, std, min, max, skew e kurt das colunas numéricas
+        """
+        return self.moments.table(self.columns)
+
+    def corr(self, columns=CORR_COLUMNS):
+        """
+        Equivalente a `df[columns].corr()`
+        """
+        idx = [self.columns.index(c) for c in columns]
+        return self.comoments.corr(self.columns).iloc[idx, idx]
+
+    def cov(self, columns=CORR_COLUMNS):
+        idx = [self.columns.index(c) for c in columns]
+        return self.comoments.cov(self.columns).iloc[idx, idx]
+
+    def group_means(self, key, columns=None):
+        """
+        Equivalente a `df.groupby(key)[columns].mean()`
+        """
+        means = self.groups[key].means(key)
+        return means[list(columns)] if columns is not None else means
+
+    def ranges(self):
+        """
+        Range esperado, encontrado e quantos valores ficam fora dele, para
+        as colunas de `RANGES` que existem no CSV
+        """
+        stats = self.describe()
+        rows = []
+        for name, (low, high) in self.expected.items():
+            if name in self.columns:
+                j = self.columns.index(name)
+                rows.append({'column': name, 'expected_min': low, 'expected_max': high,
+                             'min': stats.at['min', name], 'max': stats.at['max', name],
+                             'below': int(self.below[j]), 'above': int(self.above[j])})
+        return pd.DataFrame(rows).set_index('column')
+
+    def quality_text(self):
+        """
+        Relatório no formato de `verificar_qualidade_dados`
+        """
+        lines = ["=" * 80, "RELATÓRIO DE QUALIDADE DE DADOS".center(80), "=" * 80]
+        problems = []
+        ranges = self.ranges()
+        for name, row in ranges[ranges['expected_max'].notna()].iterrows():
+            row = {**row, 'below': int(row['below']), 'above': int(row['above'])}
+            lines += [f"\n📊 {name.upper()}",
+                      f"   Range esperado: [{row['expected_min']:g}, {row['expected_max']:g}]",
+                      f"   Range encontrado: [{row['min']:.3f}, {row['max']:.3f}]"]
+            if row['below']:
+                lines.append(f"   ⚠️  {row['below']} valores ABAIXO do mínimo esperado")
+                problems.append(f"{name}: {row['below']} valores < {row['expected_min']:g}")
+            if row['above']:
+                lines.append(f"   ⚠️  {row['above']} valores ACIMA do máximo esperado")
+                problems.append(f"{name}: {row['above']} valores > {row['expected_max']:g}")
+            if not row['below'] and not row['above']:
+                lines.append("   ✅ Todos os valores dentro do range esperado")
+
+        lines += [f"\n\n{'=' * 80}", "FEATURES TEMÁTICAS".center(80), "=" * 80]
+        for name, row in ranges[ranges['expected_max'].isna()].iterrows():
+            row = {**row, 'below': int(row['below'])}
+            status = "✅" if row['below'] == 0 else "⚠️"
+            line = f"{status} {name}: [{row['min']:.3f}, {row['max']:.3f}]"
+            if row['below']:
+                line += f" - {row['below']} VALORES NEGATIVOS!"
+                problems.append(f"{name}: {row['below']} valores negativos")
+            lines.append(line)
+
+        lines += [f"\n\n{'=' * 80}", "RESUMO".center(80), f"{'=' * 80}\n"]
+        if problems:
+            lines.append(f"⚠️  {len(problems)} problema(s) encontrado(s):\n")
+            lines += [f"   {i}. {problem}" for i, problem in enumerate(problems, 1)]
+        else:
+            lines.append("🎉 PARABÉNS! Nenhum problema encontrado nos dados!")
+        lines.append(f"\n{'=' * 80}\n")
+        return '\n'.join(lines)
+
+
+def analyze(csv_path, chunksize=CHUNKSIZE, **options):
+    """
+    Um passe pelo CSV em chunks de `chunksize` linhas (e um segundo, só das
+    linhas candidatas, se algum hash de linha se repete)
+    """
+    report = StreamingReport(**options)
+    with pd.read_csv(csv_path, chunksize=chunksize) as chunks:
+        for chunk in chunks:
+            report.update(chunk)
+    with pd.read_csv(csv_path, chunksize=chunksize) as chunks:
+        report.count_duplicates(chunks)
+    return report
+
+
+def compare(report, df):
+    """
+    Maior diferença absoluta de cada resultado para o pandas com `df`
+    inteiro em memória (o CSV lido de uma vez)
+    """
+    raw_nulls = df.isnull().sum()
+    diffs = {'nulls': (report.nulls - raw_nulls).abs().max(),
+             'duplicates': abs(report.duplicates - int(df.duplicated().sum()))}
+    df = df.drop(columns=report.drop, errors='ignore')
+    expected = df[report.columns].describe().loc[['count', 'mean', 'std', 'min', 'max']]
+    ours = report.describe()
+    diffs['describe'] = (ours.loc[expected.index] - expected).abs().max().max()
+    diffs['skew'] = (ours.loc['skew'] - df[report.columns].skew()).abs().max()
+    diffs['kurt'] = (ours.loc['kurt'] - df[report.columns].kurt()).abs().max()
+    diffs['corr'] = (report.corr(report.columns) - df[report.columns].corr()).abs().max().max()
+    for key in report.groups:
+        keys = pd.Series(group_keys(df, key), index=df.index, name=key)
+        expected = df[report.group_columns].groupby(keys).mean()
+        ours = report.group_means(key)
+        ours.index = ours.index.astype(expected.index.dtype)
+        diffs[f'means_by_{key}'] = (ours - expected).abs().max().max()
+    return pd.Series(diffs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relatório de qualidade e estatísticas do CSV em chunks")
+    parser.add_argument('csv', nargs='?', default='music.csv')
+    parser.add_argument('--chunksize', type=int, default=CHUNKSIZE)
+    parser.add_argument('--verify', action='store_true',
+                        help="Compara com o pandas lendo o CSV inteiro (só se ele cabe em memória)")
+    args = parser.parse_args()
+
+    report = analyze(args.csv, args.chunksize)
+    print(report.quality_text())
+    nulls = report.nulls[report.nulls > 0]
+    with pd.option_context('display.width', 160, 'display.max_columns', 40):
+        print(f"{report.n_rows:,} linhas, {report.duplicates:,} duplicadas\n")
+        print(f"Nulos por coluna:\n{nulls.to_string()}\n" if len(nulls) else "Nenhum valor nulo\n")
+        print(report.describe().round(3).to_string() + "\n")
+        print(f"Correlação das características de áudio:\n{report.corr().round(3).to_string()}\n")
+        for key in report.groups:
+            means = report.group_means(key, ['danceability', 'energy', 'valence'])
+            print(f"Médias por {key}:\n{means.round(3).to_string()}\n")
+
+    if args.verify:
+        diffs = compare(report, pd.read_csv(args.csv))
+        print("Maior diferença para o pandas em memória:\n" + diffs.to_string())
+
+
+if __name__ == '__main__':
+    main()
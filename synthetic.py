@@ -0,0 +1,131 @@
+"""
+Dataset sintético com o mesmo schema de `music_com_decade.csv`.
+
+Gera músicas de 1950 a 2019 com gêneros, artistas (poucos artistas com
+muitas músicas), características de áudio entre 0 e 1 e os 16 temas das
+letras como proporções que somam 1, com as tendências do dataset real
+(romance caindo, obscenidade e violência subindo). Serve para medir o
+dashboard em tamanhos que o dataset real não tem.
+
+Uso:
+    python synthetic.py 1000000 musicas_1m.csv
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+from data_cache import TEMAS
+
+GENRES = ['pop', 'country', 'blues', 'rock', 'jazz', 'reggae', 'hip hop']
+GENRE_WEIGHTS = [0.25, 0.19, 0.16, 0.14, 0.13, 0.08, 0.05]
+TOPICS = ['sadness', 'violence', 'world/life', 'obscene', 'music', 'night/time',
+          'romantic', 'feelings']
+FIRST_YEAR, LAST_YEAR = 1950, 2019
+
+# Peso relativo de cada tema na primeira e na última década
+THEME_TRENDS = {
+    'romantic': (2.0, 0.45),
+    'obscene': (0.6, 1.7),
+    'violence': (0.7, 1.7),
+    'music': (1.6, 0.6),
+    'sadness': (1.3, 1.0),
+}
+
+WORDS = np.array(['love', 'baby', 'night', 'heart', 'dance', 'fire', 'road',
+                  'time', 'rain', 'gold', 'soul', 'blue'], dtype=object)
+
+CHUNK_ROWS = 500_000
+
+
+def make_dataset(n_rows, seed=0, first_row=0, n_artists=None):
+    """
+    DataFrame com `n_rows` músicas. `first_row` e `n_artists` permitem
+    gerar um dataset grande em pedaços consistentes entre si.
+    """
+    rng = np.random.default_rng([seed, first_row])
+    n_artists = n_artists or max(n_rows // 5, 10)
+
+    # Mais músicas nas décadas recentes, como no dataset real
+    years = (FIRST_YEAR + (LAST_YEAR - FIRST_YEAR + 1) * rng.beta(1.6, 1.0, n_rows)).astype(np.int64)
+    years = np.minimum(years, LAST_YEAR)
+    decades = years // 10 * 10
+    t = (years - FIRST_YEAR) / (LAST_YEAR - FIRST_YEAR)
+
+    # Poucos artistas concentram muitas músicas
+    artist_ids = np.minimum((rng.random(n_rows) ** 2 * n_artists).astype(np.int64), n_artists - 1)
+    artist_names = np.char.add('artist ', artist_ids.astype(str)).astype(object)
+    track_names = np.char.add('track ', np.arange(first_row, first_row + n_rows).astype(str)).astype(object)
+
+    words = WORDS[rng.integers(0, len(WORDS), (n_rows, 4))]
+    lyrics = words[:, 0] + ' ' + words[:, 1] + ' ' + words[:, 2] + ' ' + words[:, 3]
+
+    # Temas: proporções de uma Dirichlet cujo alpha segue as tendências
+    alpha = np.full((n_rows, len(TEMAS)), 0.35)
+    for tema, (start, end) in THEME_TRENDS.items():
+        alpha[:, TEMAS.index(tema)] *= start + (end - start) * t
+    temas = rng.gamma(alpha)
+    temas /= np.maximum(temas.sum(axis=1, keepdims=True), 1e-12)
+
+    energy = np.clip(rng.beta(4, 3, n_rows) + 0.12 * (t - 0.5), 0, 1)
+    danceability = np.clip(rng.beta(5, 4, n_rows) + 0.08 * (t - 0.5), 0, 1)
+
+    data = {
+        'Unnamed: 0': np.arange(first_row, first_row + n_rows),
+        'artist_name': artist_names,
+        'track_name': track_names,
+        'release_date': years,
+        'genre': rng.choice(GENRES, n_rows, p=GENRE_WEIGHTS),
+        'lyrics': lyrics,
+        'len': rng.integers(20, 700, n_rows),
+    }
+    data.update({tema: temas[:, j] for j, tema in enumerate(TEMAS)})
+    data.update({
+        'danceability': danceability,
+        'loudness': np.clip(rng.beta(6, 3, n_rows) + 0.1 * (t - 0.5), 0, 1),
+        'acousticness': np.clip(rng.beta(1.2, 2.0, n_rows) - 0.25 * (t - 0.5), 0, 1),
+        'instrumentalness': rng.beta(0.4, 6, n_rows),
+        'valence': rng.beta(3, 3, n_rows),
+        'energy': energy,
+        'topic': rng.choice(TOPICS, n_rows),
+        'age': (LAST_YEAR - years) / (LAST_YEAR - FIRST_YEAR),
+        'decade': decades,
+    })
+    return pd.DataFrame(data)
+
+
+def write_csv(n_rows, path, seed=0, chunk_rows=CHUNK_ROWS):
+    """
+    Escreve o dataset sintético em `path` em pedaços, sem montar o frame
+    inteiro em memória (o writer do Arrow é bem mais rápido que o to_csv)
+    """
+    n_artists = max(n_rows // 5, 10)
+    writer = None
+    try:
+        for first_row in range(0, n_rows, chunk_rows):
+            chunk = make_dataset(min(chunk_rows, n_rows - first_row), seed, first_row, n_artists)
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pa_csv.CSVWriter(path, table.schema,
+                                          write_options=pa_csv.WriteOptions(quoting_style='needed'))
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera um CSV sintético com o schema do dashboard")
+    parser.add_argument('rows', type=int)
+    parser.add_argument('path')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    write_csv(args.rows, args.path, args.seed)
+    print(f"✅ {args.rows:,} músicas em {args.path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Distintos e top-k por célula contra as contagens exatas do pandas.
+"""
+import numpy as np
+import pytest
+
+import synthetic
+from count_sketches import EXACT_LIMIT, CountSketches
+from data_cache import add_derived_columns
+
+SELECTIONS = [None, {'genre': ['pop']}, {'decade': [2010], 'mood_category': ['Sad/Calm']}]
+
+
+@pytest.fixture(scope='module')
+def df():
+    return add_derived_columns(synthetic.make_dataset(200_000, seed=5))
+
+
+def _selected(df, selection):
+    mask = np.ones(len(df), dtype=bool)
+    for dim, values in (selection or {}).items():
+        mask &= df[dim].isin(values).to_numpy()
+    return df[mask]
+
+
+def _check(sketches, df):
+    for selection in SELECTIONS:
+        rows = _selected(df, selection)
+        exact = rows['artist_name'].nunique()
+        # Erro padrão do HyperLogLog com p = 14 é 0,8%
+        assert sketches.n_distinct('artist_name', selection) == pytest.approx(exact, rel=0.04)
+        assert sketches.n_distinct('topic', selection) == rows['topic'].nunique()
+        top = sketches.top('topic', 3, selection)
+        assert sketches.top_error('topic', selection) == 0
+        assert top.tolist() == rows['topic'].value_counts().head(3).tolist()
+
+
+def test_registers_only_for_sketched_cells(df):
+    sketches = CountSketches.from_frame(df.iloc[:120_000])
+    sketches.append(df.iloc[120_000:])
+    offsets, hashes, hll_cells, registers = sketches.distinct['artist_name']
+    sizes = np.diff(offsets)
+    assert 0 < len(hll_cells) < len(sizes)
+    assert registers.shape == (len(hll_cells), 2 ** sketches.precision)
+    assert np.all(sizes[hll_cells] == 0) and sizes.max() <= EXACT_LIMIT
+    _check(sketches, df)
@@ -0,0 +1,93 @@
+"""
+Ingestão de lotes: a década derivada no lote tem que bater com os anos
+das séries temporais.
+"""
+import numpy as np
+import pandas as pd
+
+import data_cache
+import synthetic
+from dataset import Dataset, load_cube, load_years
+from ingest import append_batch
+
+
+def _decades_from_years(years):
+    # Contagem por década a partir das somas por ano do YearCube
+    per_year = years.counts.reshape(len(years.counts), -1).sum(axis=1)
+    counts = pd.Series(per_year, index=years.years // 10 * 10).groupby(level=0).sum()
+    return counts[counts > 0]
+
+
+def _write_base(tmp_path, n_rows=3000):
+    csv_path = str(tmp_path / 'base.csv')
+    synthetic.make_dataset(n_rows, seed=0).to_csv(csv_path, index=False)
+    return csv_path
+
+
+def test_add_decade_numeric_year():
+    df = pd.DataFrame({'release_date': [1959, 2019, None]})
+    data_cache.add_decade(df)
+    np.testing.assert_array_equal(df['decade'], [1950, 2010, np.nan])
+
+    df = pd.DataFrame({'release_date': ['1987-05-01', '2003-01-31']})
+    data_cache.add_decade(df)
+    assert df['decade'].tolist() == [1980, 2000]
+
+
+def test_append_batch_integer_years(tmp_path):
+    csv_path = _write_base(tmp_path)
+    cache_dir = str(tmp_path / 'cache')
+    dataset = Dataset(csv_path, cache_dir)
+
+    # Lote no formato do CSV: ano inteiro em release_date, sem decade nem humor
+    batch = synthetic.make_dataset(2000, seed=1, first_row=3000)
+    batch = batch.drop(columns=['decade'])
+    assert pd.api.types.is_integer_dtype(batch['release_date'])
+    append_batch(batch, csv_path, cache_dir)
+
+    expected = batch['release_date'] // 10 * 10
+    assert dataset.refresh()
+    for cube, years in ((dataset.cube, dataset.years),
+                        (load_cube(csv_path, cache_dir), load_years(csv_path, cache_dir))):
+        by_decade = cube.counts_by('decade')
+        pd.testing.assert_series_equal(by_decade, _decades_from_years(years),
+                                       check_names=False, check_index_type=False)
+        assert by_decade.sum() == 5000
+
+    # O índice dos filtros também vê as músicas novas nas décadas certas
+    new_rows = np.arange(3000, 5000)
+    for decade, count in expected.value_counts().items():
+        rows = dataset.filter_index.select({'decade': [decade]})
+        assert np.isin(new_rows, rows).sum() == count
+
+
+def test_refresh_keeps_published_version(tmp_path):
+    csv_path = _write_base(tmp_path)
+    cache_dir = str(tmp_path / 'cache')
+    dataset = Dataset(csv_path, cache_dir)
+    old = dataset.snapshot()
+    old_similarity = old.similarity
+    old_counts = old.cube.counts_by('genre')
+    old_distinct = old.counts.n_distinct('artist_name')
+    old_quantile = old.digests.quantile('valence', 0.5)
+
+    batch = synthetic.make_dataset(1000, seed=2, first_row=3000)
+    batch['genre'] = 'samba'
+    append_batch(batch, csv_path, cache_dir)
+    assert dataset.refresh()
+
+    # A versão que uma sessão já tinha em mãos continua inteira
+    assert len(old.df) == 3000 and old.filter_index.n_rows == 3000
+    assert len(old.filter_index.select({'genre': ['samba']})) == 0
+    pd.testing.assert_series_equal(old.cube.counts_by('genre'), old_counts)
+    assert old.counts.n_distinct('artist_name') == old_distinct
+    assert old.digests.quantile('valence', 0.5) == old_quantile
+    assert old_similarity.n_rows == 3000
+
+    new = dataset.snapshot()
+    assert new is not old and new.version[1] == 1
+    assert len(new.df) == 4000 and new.filter_index.n_rows == 4000
+    np.testing.assert_array_equal(new.filter_index.select({'genre': ['samba']}),
+                                  np.arange(3000, 4000))
+    assert new.cube.counts_by('genre')['samba'] == 1000
+    assert new.similarity.n_rows == 4000
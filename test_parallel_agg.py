@@ -0,0 +1,50 @@
+"""
+Médias por grupo e crosstabs do pool de processos contra o pandas, com
+valores nulos, chaves nulas e colunas de escalas bem diferentes.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import synthetic
+from data_cache import TEMAS, add_derived_columns
+from parallel_agg import ParallelAggregator
+
+COLUMNS = TEMAS[:4] + ['loudness', 'len']
+
+
+@pytest.fixture(scope='module')
+def df():
+    df = add_derived_columns(synthetic.make_dataset(20_000, seed=7))
+    rng = np.random.default_rng(7)
+    df['len'] = df['len'].astype(np.float64)
+    for column in COLUMNS:
+        df.loc[rng.random(len(df)) < 0.05, column] = np.nan
+    df.loc[rng.random(len(df)) < 0.02, 'genre'] = None
+    df['decade'] = df['decade'].astype(np.float64)
+    df.loc[rng.random(len(df)) < 0.02, 'decade'] = np.nan
+    # Um gênero só com nulos na feature e um valor muito maior que os demais
+    df.loc[df['genre'] == 'reggae', 'sadness'] = np.nan
+    df.loc[df.index[3], 'loudness'] = 1e12
+    return df
+
+
+@pytest.mark.parametrize('workers', [1, 2, 3])
+def test_group_means_match_pandas(df, workers):
+    with ParallelAggregator(df, ['decade', 'genre'], COLUMNS, workers) as agg:
+        for by in ('decade', 'genre'):
+            expected = df.groupby(by)[COLUMNS].mean()
+            pd.testing.assert_frame_equal(agg.group_means(by, COLUMNS), expected,
+                                          check_exact=False, rtol=1e-15, atol=0,
+                                          check_index_type=False, check_names=False)
+
+
+@pytest.mark.parametrize('workers', [1, 2, 3])
+def test_crosstab_matches_pandas(df, workers):
+    with ParallelAggregator(df, ['decade', 'genre', 'mood_category'], (), workers) as agg:
+        for index, columns in (('decade', 'genre'), ('genre', 'mood_category')):
+            for normalize in (False, 'index', 'columns', 'all'):
+                expected = pd.crosstab(df[index], df[columns], normalize=normalize)
+                pd.testing.assert_frame_equal(agg.crosstab(index, columns, normalize), expected,
+                                              check_dtype=False, check_index_type=False,
+                                              check_column_type=False, check_names=False)
@@ -0,0 +1,86 @@
+"""
+Quantis dos t-digests por célula contra os exatos do pandas, dentro do
+limite de erro de rank documentado em `sketches` (π/δ das músicas da
+seleção).
+"""
+import numpy as np
+import pytest
+
+import synthetic
+from data_cache import add_derived_columns
+from sketches import DEFAULT_DELTA, CellDigests
+
+QUANTILES = (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99)
+SELECTIONS = [
+    {},
+    {'genre': ['pop']},
+    {'genre': ['rock', 'jazz'], 'mood_category': ['Happy/Energetic']},
+    {'decade': [1990, 2000, 2010]},
+    {'decade': [1950], 'genre': ['hip hop', 'reggae']},
+    {'mood_category': ['Sad/Calm', 'Peaceful/Content'], 'decade': [1970, 1980]},
+]
+
+
+@pytest.fixture(scope='module')
+def df():
+    return add_derived_columns(synthetic.make_dataset(60_000, seed=3))
+
+
+def _selected(df, selection):
+    mask = np.ones(len(df), dtype=bool)
+    for dim, values in selection.items():
+        mask &= df[dim].isin(values).to_numpy()
+    return df[mask]
+
+
+def _rank_error(sorted_values, approx, q):
+    # Distância de q às posições (fração da seleção) que o valor aproximado ocupa
+    n = len(sorted_values)
+    low = np.searchsorted(sorted_values, approx, side='left') / n
+    high = np.searchsorted(sorted_values, approx, side='right') / n
+    return max(low - q, q - high, 0.0)
+
+
+def _check(digests, df, delta=DEFAULT_DELTA):
+    bound = np.pi / delta
+    for selection in SELECTIONS:
+        rows = _selected(df, selection)
+        for feature in digests.features:
+            values = np.sort(rows[feature].dropna().to_numpy())
+            assert len(values) > 0
+            for q in QUANTILES:
+                approx = digests.quantile(feature, q, selection)
+                # A mais um valor, pela interpolação entre vizinhos
+                assert _rank_error(values, approx, q) <= bound + 1 / len(values), (selection, feature, q)
+            median = rows[feature].median()
+            assert abs(digests.median(feature, selection) - median) < 0.05
+
+
+def test_quantiles_within_bound(df):
+    _check(CellDigests.from_frame(df), df)
+
+
+def test_quantiles_within_bound_after_append(df):
+    digests = CellDigests.from_frame(df.iloc[:20_000])
+    digests.append(df.iloc[20_000:40_000])
+    # Lote com um gênero novo: o grid cresce
+    batch = df.iloc[40_000:].copy()
+    batch.loc[batch.index[:2000], 'genre'] = 'samba'
+    digests.append(batch)
+
+    full = df.copy()
+    full.loc[batch.index[:2000], 'genre'] = 'samba'
+    _check(digests, full)
+    samba = full.loc[full['genre'] == 'samba', 'valence']
+    assert abs(digests.median('valence', {'genre': ['samba']}) - samba.median()) < 0.05
+
+
+def test_small_cells_are_exact(df):
+    # Células com poucos valores guardam cada valor como centróide
+    small = df.iloc[:300]
+    digests = CellDigests.from_frame(small)
+    selection = {'genre': ['pop'], 'decade': [2010]}
+    values = _selected(small, selection)['energy']
+    assert 0 < len(values) < DEFAULT_DELTA / np.pi
+    for q in QUANTILES:
+        assert digests.quantile('energy', q, selection) == pytest.approx(values.quantile(q))
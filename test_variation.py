@@ -0,0 +1,102 @@
+"""
+Variação dos temas por recorte contra um groupby por década do pandas,
+com um gênero que não existe na primeira década do corpus.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import synthetic
+from cube import AggregateCube
+from data_cache import TEMAS, add_derived_columns
+from variation import ALL, ThemeChanges, highlights
+
+KEYS = ['dimension', 'value', 'theme']
+
+
+@pytest.fixture(scope='module')
+def df():
+    df = add_derived_columns(synthetic.make_dataset(20_000, seed=11))
+    # Gênero que só aparece a partir dos anos 80
+    late = (df['decade'] >= 1980) & (np.arange(len(df)) % 7 == 0)
+    df['genre'] = df['genre'].astype(object)
+    df.loc[late, 'genre'] = 'samba'
+    return df
+
+
+@pytest.fixture(scope='module')
+def changes(df):
+    return ThemeChanges.from_cube(AggregateCube.from_frame(df))
+
+
+def _slices(df):
+    yield ALL, ALL, df
+    for dim in ('genre', 'mood_category'):
+        for value, rows in df.groupby(dim):
+            yield dim, value, rows
+
+
+def _expected_table(df):
+    rows = []
+    for dim, value, part in _slices(df):
+        means = part.groupby('decade')[TEMAS].mean()
+        counts = part.groupby('decade').size()
+        first, last = means.index.min(), means.index.max()
+        for theme in TEMAS:
+            start, end = means.loc[first, theme], means.loc[last, theme]
+            rows.append({'dimension': dim, 'value': value, 'theme': theme,
+                         'first_decade': first, 'last_decade': last,
+                         'first_songs': counts[first], 'last_songs': counts[last],
+                         'first': start, 'last': end, 'change_pct': (end - start) / start * 100})
+    return pd.DataFrame(rows)
+
+
+def _expected_pairwise(df):
+    rows = []
+    for dim, value, part in _slices(df):
+        means = part.groupby('decade')[TEMAS].mean()
+        for i, start in enumerate(means.index):
+            for end in means.index[i + 1:]:
+                for theme in TEMAS:
+                    a, b = means.loc[start, theme], means.loc[end, theme]
+                    rows.append({'dimension': dim, 'value': value, 'theme': theme,
+                                 'from_decade': start, 'to_decade': end,
+                                 'from': a, 'to': b, 'change_pct': (b - a) / a * 100})
+    return pd.DataFrame(rows)
+
+
+def _compare(actual, expected, keys):
+    actual = actual.astype({'value': str}).sort_values(keys).reset_index(drop=True)
+    expected = expected.astype({'value': str}).sort_values(keys).reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual[expected.columns], expected,
+                                  check_dtype=False, rtol=1e-9)
+
+
+def test_table_matches_groupby(df, changes):
+    table = changes.table()
+    _compare(table, _expected_table(df), KEYS)
+    samba = table[table['value'] == 'samba']
+    assert (samba['first_decade'] == 1980).all() and (samba['last_decade'] == 2010).all()
+
+
+def test_pairwise_matches_groupby(df, changes):
+    pairwise = changes.pairwise()
+    _compare(pairwise, _expected_pairwise(df), KEYS + ['from_decade', 'to_decade'])
+    # Nenhum par com uma década em que o gênero não tem músicas
+    assert pairwise.loc[pairwise['value'] == 'samba', 'from_decade'].min() == 1980
+
+
+def test_highlights_are_disjoint(changes):
+    table = changes.table()
+    # Poucos recortes confiáveis: menos que 2n linhas no total
+    few = table[(table['dimension'] == 'genre') & table['value'].isin(['pop', 'rock'])
+                & (table['theme'] == 'romantic')]
+    growth, decline = highlights(few, n=5)
+    assert (growth['change_pct'] > 0).all() and (decline['change_pct'] < 0).all()
+    assert not set(growth.index) & set(decline.index)
+    assert len(growth) + len(decline) <= len(few)
+
+    growth, decline = highlights(table, n=5)
+    assert len(growth) == len(decline) == 5
+    assert growth['change_pct'].is_monotonic_decreasing
+    assert decline['change_pct'].is_monotonic_increasing
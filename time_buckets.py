@@ -0,0 +1,183 @@
+"""
+Séries temporais em qualquer granularidade a partir de somas por ano.
+
+`YearCube` guarda, para cada ano × gênero × humor, a contagem de músicas e
+as somas e não nulos de cada feature, acumulados ao longo dos anos
+(prefix sums, com uma linha de zeros no início). A soma de um intervalo
+de anos é a diferença de duas linhas, então buckets de qualquer largura
+(ano, 5 anos, década) e janelas móveis saem em O(#buckets) depois de
+somar as células de gênero × humor selecionadas, sem reler as músicas.
+
+Os buckets de largura w começam nos múltiplos de w (`ano // w * w`), como
+a coluna `decade`: com w = 10 as médias são as de
+`AggregateCube.means_by('decade', ...)`.
+"""
+import numpy as np
+import pandas as pd
+
+from cube import cell_codes, merge_categories
+from data_cache import AUDIO_FEATURES, TEMAS, years_of
+
+DIMS = ('genre', 'mood_category')
+
+
+class YearCube:
+    """
+    Prefix sums por ano (contínuos de `first_year` em diante) × células
+    de `dims`
+    """
+
+    def __init__(self, dims, categories, features, first_year, counts, sums, nonnull):
+        self.dims = tuple(dims)
+        self.categories = [np.asarray(c) for c in categories]
+        self.features = list(features)
+        self.first_year = int(first_year)
+        # Somas por ano: (anos, *células) e (anos, *células, features)
+        self.counts = counts
+        self.sums = sums
+        self.nonnull = nonnull
+        self._accumulate()
+
+    @property
+    def years(self):
+        return np.arange(self.first_year, self.first_year + len(self.counts))
+
+    @classmethod
+    def empty(cls, dims, categories, features, first_year, n_years):
+        shape = (n_years,) + tuple(len(c) for c in categories)
+        return cls(dims, categories, features, first_year, np.zeros(shape, dtype=np.int64),
+                   np.zeros(shape + (len(features),)), np.zeros(shape + (len(features),)))
+
+    @classmethod
+    def from_frame(cls, df, dims=DIMS, features=None):
+        if features is None:
+            features = [c for c in AUDIO_FEATURES + TEMAS if c in df.columns]
+        years = years_of(df)
+        known = years[~np.isnan(years)]
+        first, last = (int(known.min()), int(known.max())) if len(known) else (0, -1)
+        categories = [np.sort(df[dim].dropna().unique()) for dim in dims]
+        cube = cls.empty(dims, categories, features, first, last - first + 1)
+        cube._add(df, years)
+        cube._accumulate()
+        return cube
+
+    def _add(self, df, years):
+        # Soma as linhas nas células (anos e categorias já precisam existir)
+        n_years = len(self.counts)
+        cell_shape = self.counts.shape[1:]
+        size = n_years * int(np.prod(cell_shape))
+        cells = cell_codes(df, self.dims, self.categories)
+        valid = (cells >= 0) & ~np.isnan(years)
+        flat = (years[valid].astype(np.int64) - self.first_year) * int(np.prod(cell_shape)) + cells[valid]
+
+        shape = self.counts.shape
+        self.counts += np.bincount(flat, minlength=size).reshape(shape)
+        for i, feature in enumerate(self.features):
+            values = df[feature].to_numpy(dtype=np.float64)[valid]
+            present = ~np.isnan(values)
+            self.sums[..., i] += np.bincount(flat, weights=np.where(present, values, 0.0),
+                                             minlength=size).reshape(shape)
+            self.nonnull[..., i] += np.bincount(flat, weights=present, minlength=size).reshape(shape)
+
+    def _accumulate(self):
+        def prefix(array):
+            return np.concatenate([np.zeros((1,) + array.shape[1:], dtype=array.dtype),
+                                   np.cumsum(array, axis=0)])
+        self._prefix = (prefix(self.counts), prefix(self.sums), prefix(self.nonnull))
+
+    def append(self, batch):
+        """
+        Acrescenta um lote de músicas. Anos ou categorias novos realocam o
+        grid; as prefix sums são refeitas a partir das somas por ano, sem
+        reler linhas antigas.
+        """
+        years = years_of(batch)
+        known = years[~np.isnan(years)]
+        merged = [merge_categories(cats, batch[dim]) for dim, cats in zip(self.dims, self.categories)]
+        first = min([self.first_year] + ([int(known.min())] if len(known) else []))
+        last = max([self.first_year + len(self.counts) - 1] + ([int(known.max())] if len(known) else []))
+        grown = [len(cats) != len(old) for (cats, _), old in zip(merged, self.categories)]
+        if any(grown) or first != self.first_year or last - first + 1 != len(self.counts):
+            bigger = YearCube.empty(self.dims, [cats for cats, _ in merged], self.features,
+                                    first, last - first + 1)
+            offset = self.first_year - first
+            positions = np.ix_(np.arange(offset, offset + len(self.counts)),
+                               *[pos for _, pos in merged])
+            bigger.counts[positions] = self.counts
+            bigger.sums[positions] = self.sums
+            bigger.nonnull[positions] = self.nonnull
+            self.categories, self.first_year = bigger.categories, bigger.first_year
+            self.counts, self.sums, self.nonnull = bigger.counts, bigger.sums, bigger.nonnull
+        self._add(batch, years)
+        self._accumulate()
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            np.savez(f, dims=np.array(self.dims), features=np.array(self.features),
+                     first_year=self.first_year, counts=self.counts, sums=self.sums,
+                     nonnull=self.nonnull,
+                     **{f'categories_{i}': cats for i, cats in enumerate(self.categories)})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=True) as data:
+            dims = [str(d) for d in data['dims']]
+            categories = [data[f'categories_{i}'] for i in range(len(dims))]
+            return cls(dims, categories, [str(f) for f in data['features']],
+                       int(data['first_year']), data['counts'], data['sums'], data['nonnull'])
+
+    def _selected_prefix(self, features, selection):
+        # Prefix sums (anos + 1, ...) somadas nas células selecionadas
+        idx = [self.features.index(f) for f in features]
+        masks = []
+        for dim, cats in zip(self.dims, self.categories):
+            selected = (selection or {}).get(dim)
+            masks.append(np.ones(len(cats), dtype=bool) if selected is None
+                         else np.isin(cats, list(selected)))
+        cells = np.ix_(*masks)
+        counts, sums, nonnull = self._prefix
+        axes = tuple(range(1, 1 + len(self.dims)))
+        counts = counts[(slice(None),) + cells].sum(axis=axes)
+        sums = sums[(slice(None),) + cells][..., idx].sum(axis=axes)
+        nonnull = nonnull[(slice(None),) + cells][..., idx].sum(axis=axes)
+
+        decades = (selection or {}).get('decade')
+        if decades is not None:
+            # O filtro de década zera os anos fora dela: volta às somas por
+            # ano, aplica a máscara e acumula de novo (O(anos))
+            keep = np.isin(self.years // 10 * 10, list(decades))
+            counts, sums, nonnull = (
+                np.concatenate([np.zeros((1,) + a.shape[1:], dtype=a.dtype),
+                                np.cumsum(np.diff(a, axis=0) * keep.reshape((-1,) + (1,) * (a.ndim - 1)),
+                                          axis=0)])
+                for a in (counts, sums, nonnull))
+        return counts, sums, nonnull
+
+    def series(self, features, selection=None, width=10, window=None):
+        """
+        Média de cada feature por bucket de `width` anos (índice = primeiro
+        ano do bucket), ou, com `window`, média móvel de `window` buckets
+        terminando em cada bucket. Buckets sem músicas ficam de fora.
+        """
+        counts, sums, nonnull = self._selected_prefix(features, selection)
+        years = self.years
+        if len(years) == 0:
+            return pd.DataFrame(columns=pd.Index(features), index=pd.Index([], name='year'))
+
+        # Bordas dos buckets como posições nas prefix sums
+        starts = np.arange(years[0] // width * width, years[-1] + 1, width)
+        edges = np.clip(np.append(starts, starts[-1] + width) - self.first_year, 0, len(years))
+        if window:
+            lower = edges[np.maximum(np.arange(1, len(edges)) - window, 0)]
+        else:
+            lower = edges[:-1]
+        upper = edges[1:]
+
+        n = counts[upper] - counts[lower]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = (sums[upper] - sums[lower]) / (nonnull[upper] - nonnull[lower])
+        # Sem músicas no próprio bucket, ele não aparece nem na média móvel
+        present = (counts[edges[1:]] - counts[edges[:-1]]) > 0
+        present &= n > 0
+        return pd.DataFrame(means[present], index=pd.Index(starts[present], name='year'),
+                            columns=pd.Index(features))
@@ -0,0 +1,178 @@
+"""
+Variação dos temas entre décadas para todos os recortes de uma vez.
+
+A partir do cubo, `ThemeChanges` calcula num único passe vetorizado a
+média de cada tema por década no corpus inteiro e em cada gênero e cada
+humor (recortes × décadas × temas), a variação % da primeira para a
+última década com músicas de cada recorte e, sob demanda, a variação
+entre todos os pares de décadas. A tabela resultante alimenta os cards
+de insights do dashboard e pode ser gerada para o corpus pela linha de
+comando:
+
+    python variation.py music_com_decade.csv --output variacao_temas.csv
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from data_cache import TEMAS
+
+SLICE_DIMS = ('genre', 'mood_category')
+# Recorte do corpus inteiro na coluna `dimension`
+ALL = 'all'
+# Mínimo de músicas na primeira e na última década para um recorte entrar
+# nos destaques (abaixo disso a variação é ruído)
+MIN_SONGS = 30
+
+
+def percent_change(first, last):
+    """
+    Variação % de `first` para `last` (NaN quando `first` é 0)
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (last - first) / first * 100
+
+
+class ThemeChanges:
+    """
+    Médias dos temas por recorte × década e suas variações
+    """
+
+    def __init__(self, slices, decades, features, counts, means):
+        # DataFrame com `dimension` e `value` de cada recorte
+        self.slices = slices
+        self.decades = np.asarray(decades)
+        self.features = list(features)
+        # (recortes, décadas) e (recortes, décadas, temas)
+        self.counts = counts
+        self.means = means
+
+    @classmethod
+    def from_cube(cls, cube, features=TEMAS, selection=None, slice_dims=SLICE_DIMS):
+        idx = [cube.features.index(f) for f in features]
+        masks = []
+        for dim, cats in zip(cube.dims, cube.categories):
+            selected = (selection or {}).get(dim)
+            masks.append(np.ones(len(cats), dtype=bool) if selected is None
+                         else np.isin(cats, list(selected)))
+        cells = np.ix_(*masks)
+        # Década no primeiro eixo: (décadas, *outras dimensões[, temas])
+        decade_axis = cube.dims.index('decade')
+        counts = np.moveaxis(cube.counts[cells], decade_axis, 0)
+        sums = np.moveaxis(cube.sums[cells][..., idx], decade_axis, 0)
+        nonnull = np.moveaxis(cube.nonnull[cells][..., idx], decade_axis, 0)
+        others = [dim for dim in cube.dims if dim != 'decade']
+
+        # Cada recorte soma os eixos das outras dimensões: (recortes, décadas, ...)
+        names = [(ALL, ALL)]
+        parts = [(counts.sum(axis=tuple(range(1, counts.ndim)))[None],
+                  sums.sum(axis=tuple(range(1, counts.ndim)))[None],
+                  nonnull.sum(axis=tuple(range(1, counts.ndim)))[None])]
+        for dim in slice_dims:
+            axis = 1 + others.index(dim)
+            rest = tuple(a for a in range(1, counts.ndim) if a != axis)
+            parts.append(tuple(np.moveaxis(array.sum(axis=rest), 1, 0)
+                               for array in (counts, sums, nonnull)))
+            labels = cube.categories[cube.dims.index(dim)][masks[cube.dims.index(dim)]]
+            names += [(dim, value) for value in labels]
+
+        counts, sums, nonnull = (np.concatenate(arrays) for arrays in zip(*parts))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / nonnull
+        slices = pd.DataFrame(names, columns=['dimension', 'value'])
+        return cls(slices, cube.categories[decade_axis][masks[decade_axis]], features, counts, means)
+
+    def _ends(self):
+        # Primeira e última década com músicas de cada recorte
+        present = self.counts > 0
+        first = present.argmax(axis=1)
+        last = present.shape[1] - 1 - present[:, ::-1].argmax(axis=1)
+        return present.any(axis=1), first, last
+
+    def table(self):
+        """
+        Uma linha por recorte × tema: décadas, médias e músicas na primeira
+        e na última década e a variação % entre elas
+        """
+        has_songs, first, last = self._ends()
+        rows = np.arange(len(self.slices))
+        first_means = self.means[rows, first]
+        last_means = self.means[rows, last]
+        n_slices, n_features = first_means.shape
+
+        table = self.slices.loc[np.repeat(rows, n_features)].reset_index(drop=True)
+        table['theme'] = np.tile(self.features, n_slices)
+        table['first_decade'] = np.repeat(self.decades[first], n_features)
+        table['last_decade'] = np.repeat(self.decades[last], n_features)
+        table['first_songs'] = np.repeat(self.counts[rows, first], n_features)
+        table['last_songs'] = np.repeat(self.counts[rows, last], n_features)
+        table['first'] = first_means.ravel()
+        table['last'] = last_means.ravel()
+        table['change_pct'] = percent_change(table['first'], table['last'])
+        return table[np.repeat(has_songs, n_features)].reset_index(drop=True)
+
+    def pairwise(self):
+        """
+        Variação % de cada tema entre todos os pares de décadas com músicas,
+        em cada recorte: uma linha por recorte × de × para × tema
+        """
+        # (recortes, de, para, temas)
+        change = percent_change(self.means[:, :, None, :], self.means[:, None, :, :])
+        present = self.counts > 0
+        valid = present[:, :, None] & present[:, None, :]
+        valid &= self.decades[:, None] < self.decades[None, :]
+        s, i, j = np.nonzero(valid)
+        n_features = len(self.features)
+
+        table = self.slices.loc[np.repeat(s, n_features)].reset_index(drop=True)
+        table['theme'] = np.tile(self.features, len(s))
+        table['from_decade'] = np.repeat(self.decades[i], n_features)
+        table['to_decade'] = np.repeat(self.decades[j], n_features)
+        table['from'] = self.means[s, i].ravel()
+        table['to'] = self.means[s, j].ravel()
+        table['change_pct'] = change[s, i, j].ravel()
+        return table
+
+
+def highlights(table, n=5, min_songs=MIN_SONGS):
+    """
+    Maiores altas (variação > 0) e quedas (< 0) entre os recortes de gênero
+    e humor com pelo menos `min_songs` músicas nas duas pontas
+    """
+    reliable = table[(table['dimension'] != ALL) & (table['first_songs'] >= min_songs)
+                     & (table['last_songs'] >= min_songs) & np.isfinite(table['change_pct'])]
+    ranked = reliable.sort_values('change_pct', ascending=False)
+    growth = ranked[ranked['change_pct'] > 0].head(n)
+    decline = ranked[ranked['change_pct'] < 0].tail(n).iloc[::-1]
+    return growth, decline
+
+
+def main():
+    from dataset import load_cube
+
+    parser = argparse.ArgumentParser(description="Variação dos temas por gênero e humor")
+    parser.add_argument('csv', nargs='?', default='music_com_decade.csv')
+    parser.add_argument('--output', default='variacao_temas.csv',
+                        help="CSV com a variação da primeira para a última década")
+    parser.add_argument('--pairwise', help="CSV com a variação entre todos os pares de décadas")
+    args = parser.parse_args()
+
+    changes = ThemeChanges.from_cube(load_cube(args.csv))
+    table = changes.table()
+    table.to_csv(args.output, index=False)
+    print(f"✅ {len(table)} linhas ({len(changes.slices)} recortes × {len(changes.features)} temas) "
+          f"em {args.output}")
+    if args.pairwise:
+        changes.pairwise().to_csv(args.pairwise, index=False)
+        print(f"✅ Pares de décadas em {args.pairwise}")
+
+    growth, decline = highlights(table)
+    columns = ['dimension', 'value', 'theme', 'first_decade', 'last_decade', 'change_pct']
+    with pd.option_context('display.width', 160):
+        print("\nMaiores altas:\n" + growth[columns].round(1).to_string(index=False))
+        print("\nMaiores quedas:\n" + decline[columns].round(1).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
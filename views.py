@@ -0,0 +1,296 @@
+"""
+Dados de cada aba do dashboard, fora do script do Streamlit.
+
+Cada gráfico é registrado em `CHARTS` como (função de desenho, função de
+dados): a função de dados recebe o dataset, a seleção dos filtros e os
+row ids selecionados e devolve os argumentos da função de `charts`. Assim
+o dashboard, o benchmark e quem mais precisar gerar os gráficos fazem
+exatamente as mesmas agregações, e cada etapa pode ser medida sozinha.
+
+Os gráficos de `TIME_CHARTS` aceitam também uma granularidade de
+`TIME_VIEWS` (década, 5 anos, ano, média móvel), calculada pelas somas
+por ano do dataset; no cache eles entram com o id de `cache_id`.
+"""
+import os
+
+import numpy as np
+
+import charts
+import variation
+from data_cache import TEMAS
+from figure_cache import normalize_selection
+
+# Características mostradas na evolução da aba 1 e temas da aba 3
+EVOLUTION_FEATURES = ['danceability', 'energy', 'valence', 'acousticness']
+TEMAS_PRINCIPAIS = ['romantic', 'obscene', 'violence', 'sadness', 'family/spiritual']
+
+# Granularidade das séries: id -> (rótulo, largura do bucket em anos, janela móvel em buckets)
+TIME_VIEWS = {
+    'decade': ('Década', 10, None),
+    'lustrum': ('5 anos', 5, None),
+    'year': ('Ano', 1, None),
+    'rolling5': ('Média móvel de 5 anos', 1, 5),
+}
+DEFAULT_TIME_VIEW = 'decade'
+# Gráficos que seguem a granularidade escolhida
+TIME_CHARTS = {'features_evolution', 'theme_timeline'}
+
+# Gráficos interativos ligados por padrão
+INTERACTIVE_ENV_VAR = 'DASHBOARD_INTERACTIVE'
+_TRUE_VALUES = {'1', 'true', 'yes', 'on'}
+
+# Colunas de cada música na busca de músicas parecidas
+SONG_COLUMNS = ['track_name', 'artist_name', 'genre', 'decade', 'mood_category']
+
+
+def filter_options(dataset):
+    """
+    Valores de cada filtro da sidebar, em ordem: {dimensão: valores}. Vêm
+    das categorias do índice, sem percorrer as linhas.
+    """
+    return {dim: sorted(dataset.filter_index.categories[d])
+            for d, dim in enumerate(dataset.filter_index.dims)}
+
+
+def selection_key(dataset, selection):
+    """
+    Chave da seleção no cache de gráficos (a versão do dataset invalida
+    os gráficos quando chegam músicas novas)
+    """
+    return dataset.version, normalize_selection(selection)
+
+
+def time_views(dataset):
+    """
+    Granularidades disponíveis para o dataset: só a década quando ele não
+    tem ano de lançamento
+    """
+    if dataset.years is None:
+        return [DEFAULT_TIME_VIEW]
+    return list(TIME_VIEWS)
+
+
+def startup_metadata(dataset):
+    """
+    Versão, total de músicas, opções dos filtros e granularidades das
+    séries em tipos do JSON: o que o dashboard grava com `metadata` para
+    montar o header e a sidebar antes de carregar o dataset
+    """
+    return {
+        'version': list(dataset.version),
+        'n_rows': len(dataset.df),
+        'options': {dim: [value.item() if hasattr(value, 'item') else value for value in values]
+                    for dim, values in filter_options(dataset).items()},
+        'time_views': {view: TIME_VIEWS[view][0] for view in time_views(dataset)},
+    }
+
+
+def cache_id(chart_id, time_view=DEFAULT_TIME_VIEW):
+    """
+    Id do gráfico no cache: os de `TIME_CHARTS` levam a granularidade
+    """
+    if chart_id in TIME_CHARTS and time_view != DEFAULT_TIME_VIEW:
+        return f'{chart_id}@{time_view}'
+    return chart_id
+
+
+def time_series(dataset, features, selection, time_view=DEFAULT_TIME_VIEW):
+    """
+    Média das features por período da granularidade `time_view`
+    (índice = início do período) e o rótulo do eixo x
+    """
+    label, width, window = TIME_VIEWS[time_view]
+    if time_view == DEFAULT_TIME_VIEW or dataset.years is None:
+        return dataset.cube.means_by('decade', features, selection), TIME_VIEWS[DEFAULT_TIME_VIEW][0]
+    return dataset.years.series(features, selection, width, window), label
+
+
+def overview_metrics(dataset, selection, row_ids):
+    """
+    KPIs do topo da aba 1
+    """
+    decade_counts = dataset.cube.counts_by('decade', selection)
+    return {
+        'n_songs': len(row_ids),
+        'share': len(row_ids) / len(dataset.df) * 100 if len(dataset.df) else 0.0,
+        'n_artists': dataset.counts.n_distinct('artist_name', selection),
+        'n_genres': len(dataset.cube.counts_by('genre', selection)),
+        'period': (decade_counts.index.min(), decade_counts.index.max()),
+    }
+
+
+def theme_trends(dataset, selection, temas=TEMAS_PRINCIPAIS):
+    """
+    Média dos temas por década e variação % da primeira para a última
+    """
+    return _variation(dataset.cube.means_by('decade', temas, selection))
+
+
+def _variation(temas_por_decada):
+    variacao = variation.percent_change(temas_por_decada.iloc[0], temas_por_decada.iloc[-1])
+    return temas_por_decada, variacao.sort_values(ascending=False)
+
+
+def mood_shares(dataset, selection=None):
+    """
+    Participação (%) de cada humor na seleção, do maior para o menor
+    """
+    moods = dataset.cube.top('mood_category', selection=selection)
+    return moods / moods.sum() * 100 if moods.sum() else moods.astype(float)
+
+
+def theme_insights(dataset, temas=TEMAS):
+    """
+    Números dos insights da aba 4, sempre do corpus inteiro: variação de
+    cada tema da primeira para a última década, os temas que mais subiram
+    e caíram, a participação de cada humor e os destaques por gênero e humor
+    """
+    table = variation.ThemeChanges.from_cube(dataset.cube, temas).table()
+    corpus = table[table['dimension'] == variation.ALL].set_index('theme')
+    ranked = corpus['change_pct'].sort_values()
+    slice_growth, slice_decline = variation.highlights(table)
+    return {
+        'themes': corpus,
+        'growth': corpus.loc[ranked.index[-1]],
+        'decline': corpus.loc[ranked.index[0]],
+        'moods': mood_shares(dataset),
+        'slice_growth': slice_growth,
+        'slice_decline': slice_decline,
+    }
+
+
+def mood_points(dataset, row_ids):
+    """
+    (valence, energy) das linhas selecionadas, separados por humor
+    """
+    valence = dataset.df['valence'].to_numpy()
+    energy = dataset.df['energy'].to_numpy()
+    rows_by_mood = dataset.filter_index.group_rows(row_ids, 'mood_category')
+    return {mood: (valence[rows], energy[rows]) for mood, rows in rows_by_mood.items()}
+
+
+def find_songs(dataset, text, limit=50):
+    """
+    Até `limit` músicas cujo nome ou artista contém `text` (sem diferenciar
+    maiúsculas), indexadas pelo row id
+    """
+    df = dataset.df
+    found = (df['track_name'].str.contains(text, case=False, regex=False, na=False)
+             | df['artist_name'].str.contains(text, case=False, regex=False, na=False))
+    rows = np.flatnonzero(found.to_numpy())[:limit]
+    return df.iloc[rows][SONG_COLUMNS].set_axis(rows)
+
+
+def similar_songs(dataset, row, k=10, row_ids=None):
+    """
+    As `k` músicas mais parecidas com a do row id `row` pelo índice
+    aproximado, só entre `row_ids` quando dado, com a distância de cada uma
+    """
+    index = dataset.similarity
+    mask = None
+    if row_ids is not None and len(row_ids) < len(dataset.df):
+        mask = np.zeros(len(dataset.df), dtype=bool)
+        mask[row_ids] = True
+    query = index.vectorize(dataset.df.iloc[[row]])[0]
+    rows, distances = index.search(query, k, mask=mask, exclude=row)
+    songs = dataset.df.iloc[rows][SONG_COLUMNS].set_axis(rows)
+    songs['distance'] = distances
+    return songs
+
+
+def _decade_distribution(dataset, selection, row_ids):
+    return (dataset.cube.counts_by('decade', selection),)
+
+
+def _top_genres(dataset, selection, row_ids):
+    return (dataset.cube.top('genre', 10, selection),)
+
+
+def _features_evolution(dataset, selection, row_ids, time_view=DEFAULT_TIME_VIEW):
+    return time_series(dataset, EVOLUTION_FEATURES, selection, time_view)
+
+
+def _mood_scatter(dataset, selection, row_ids):
+    # Linhas de divisão: medianas vindas dos sketches das células
+    return (mood_points(dataset, row_ids),
+            dataset.digests.median('valence', selection),
+            dataset.digests.median('energy', selection))
+
+
+def _mood_pie(dataset, selection, row_ids):
+    return (dataset.cube.top('mood_category', selection=selection),)
+
+
+def _mood_by_decade(dataset, selection, row_ids):
+    return (dataset.cube.crosstab('decade', 'mood_category', selection, normalize='index') * 100,)
+
+
+def _theme_timeline(dataset, selection, row_ids, time_view=DEFAULT_TIME_VIEW):
+    # Variação do primeiro para o último período da própria série
+    temas, xlabel = time_series(dataset, TEMAS_PRINCIPAIS, selection, time_view)
+    return _variation(temas) + (xlabel,)
+
+
+def _theme_variation(dataset, selection, row_ids):
+    return (theme_trends(dataset, selection)[1],)
+
+
+def _theme_heatmap(dataset, selection, row_ids):
+    return (theme_trends(dataset, selection)[0],)
+
+
+# id do gráfico -> (função de charts, função que monta seus argumentos)
+CHARTS = {
+    'decade_distribution': (charts.decade_distribution, _decade_distribution),
+    'top_genres': (charts.top_genres, _top_genres),
+    'features_evolution': (charts.features_evolution, _features_evolution),
+    'mood_scatter': (charts.mood_scatter, _mood_scatter),
+    'mood_pie': (charts.mood_pie, _mood_pie),
+    'mood_by_decade': (charts.mood_by_decade, _mood_by_decade),
+    'theme_timeline': (charts.theme_timeline, _theme_timeline),
+    'theme_variation': (charts.theme_variation, _theme_variation),
+    'theme_heatmap': (charts.theme_heatmap, _theme_heatmap),
+}
+
+# Gráficos de cada aba, na ordem em que aparecem
+TABS = {
+    'overview': ['decade_distribution', 'top_genres', 'features_evolution'],
+    'mood': ['mood_scatter', 'mood_pie', 'mood_by_decade'],
+    'themes': ['theme_timeline', 'theme_variation', 'theme_heatmap'],
+}
+
+
+def chart_data(chart_id, dataset, selection, row_ids, time_view=DEFAULT_TIME_VIEW):
+    """
+    Argumentos da função de desenho do gráfico para a seleção (e para a
+    granularidade, nos gráficos de `TIME_CHARTS`)
+    """
+    data = CHARTS[chart_id][1]
+    if chart_id in TIME_CHARTS:
+        return data(dataset, selection, row_ids, time_view)
+    return data(dataset, selection, row_ids)
+
+
+def build_chart(chart_id, dataset, selection, row_ids, time_view=DEFAULT_TIME_VIEW):
+    """
+    Figure do gráfico para a seleção
+    """
+    return CHARTS[chart_id][0](*chart_data(chart_id, dataset, selection, row_ids, time_view))
+
+
+def interactive_default():
+    """
+    True se os gráficos interativos são o padrão (DASHBOARD_INTERACTIVE),
+    sem importar o Altair
+    """
+    return os.environ.get(INTERACTIVE_ENV_VAR, '').strip().lower() in _TRUE_VALUES
+
+
+def build_interactive_chart(chart_id, dataset, selection, row_ids, time_view=DEFAULT_TIME_VIEW):
+    """
+    Gráfico interativo (Altair) para a seleção, com os mesmos dados
+    """
+    # O Altair só é carregado na primeira vez que a chave está ligada
+    import interactive
+
+    return interactive.CHARTS[chart_id](*chart_data(chart_id, dataset, selection, row_ids, time_view))